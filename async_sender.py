@@ -0,0 +1,201 @@
+"""
+Модуль очереди отправки сообщений асинхронного бота.
+Та же очередь, что и в модуле sender.py (общие лимиты Telegram, повтор
+после ответа 429, приоритеты, порядок сообщений одного чата), но запросы
+выполняют задачи цикла событий, а не потоки.
+"""
+
+import asyncio
+import functools
+import time
+from typing import Any, Awaitable, Callable
+
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_helper import ApiTelegramException
+
+from config import SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_WORKERS, SEND_MAX_RETRIES
+import metrics
+from sender import BaseSendQueue, SendJob, INTERACTIVE
+
+
+class AsyncSendQueue(BaseSendQueue):
+    """
+    Очередь отправки асинхронного бота с теми же лимитами: запросы (корутины)
+    выполняют workers задач цикла событий, запускаемых методом start.
+    """
+
+    api_errors = (ApiTelegramException,)
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, workers: int = SEND_WORKERS,
+                 max_retries: int = SEND_MAX_RETRIES) -> None:
+        super().__init__(global_rate, chat_rate, chat_burst, max_retries)
+        self.workers = workers
+        self._changed = asyncio.Event()
+        self._tasks: list[asyncio.Task] = list()
+
+    def start(self) -> None:
+        """
+        Запускает задачи отправки (вызывается в работающем цикле событий).
+        """
+
+        self._tasks = [asyncio.create_task(self._work(), name='Sender-{}'.format(index))
+                       for index in range(self.workers)]
+
+    def submit(self, chat_id: Any, func: Callable[[], Awaitable], priority: int = INTERACTIVE,
+               cost: float = 1) -> asyncio.Future:
+        """
+        Ставит запрос в очередь отправки.
+
+        Args:
+            chat_id (Any): Принимает id чата, в который отправляется запрос
+            func (Callable): Принимает функцию без аргументов, возвращающую корутину запроса
+            priority (int): Принимает приоритет INTERACTIVE или BULK
+            cost (float): Принимает кол-во сообщений, которые отправляет запрос
+
+        Returns (asyncio.Future): результат запроса
+        """
+
+        job = SendJob(func, chat_id, priority, cost, next(self._seq),
+                      future=asyncio.get_running_loop().create_future())
+        with self._lock:
+            self._add(job)
+        self._changed.set()
+        return job.future
+
+    async def call(self, chat_id: Any, func: Callable[[], Awaitable], priority: int = INTERACTIVE,
+                   cost: float = 1) -> Any:
+        """
+        Ставит запрос в очередь и ждёт его результата (см. submit).
+        """
+
+        return await self.submit(chat_id, func, priority, cost)
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт отправки всех запросов из очереди (с учётом лимитов) и останавливает очередь.
+
+        Args:
+            timeout (float): Принимает время ожидания в секундах (None - без ограничения)
+
+        Returns (bool): True, если все запросы отправлены до истечения времени
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self._changed.clear()
+            with self._lock:
+                if not self._pending():
+                    break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        with self._lock:
+            drained = not self._pending()
+        self.stop()
+        return drained
+
+    def stop(self) -> None:
+        with self._lock:
+            self._stopped = True
+        for task in self._tasks:
+            task.cancel()
+
+    async def _next_job(self) -> SendJob:
+        """
+        Ждёт и возвращает следующий запрос, который можно отправить с учётом лимитов.
+        """
+
+        while True:
+            self._changed.clear()
+            with self._lock:
+                job, wait = self._select()
+            if job is not None:
+                return job
+            try:
+                await asyncio.wait_for(self._changed.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._next_job()
+
+            job.started = time.monotonic()
+            try:
+                result = await job.func()
+            except asyncio.CancelledError:
+                self._finish(job, error=ConnectionAbortedError('Очередь отправки остановлена'))
+                raise
+            except Exception as error:
+                retry_after = self._retry_after(job, error)
+                if retry_after:
+                    metrics.SEND_SECONDS.observe(time.monotonic() - job.started, method=job.method, status='retry')
+                    with self._lock:
+                        self._requeue(job, retry_after)
+                    self._changed.set()
+                    continue
+                self._finish(job, error=error)
+            else:
+                self._finish(job, result=result)
+
+    def _finish(self, job: SendJob, result: Any = None, error: Exception | None = None) -> None:
+        metrics.SEND_SECONDS.observe(time.monotonic() - job.started, method=job.method,
+                                     status='ok' if error is None else 'error')
+        with self._lock:
+            self._release(job, error)
+        self._changed.set()
+
+        # Обработчик, ожидавший результат, мог быть отменён (например, при остановке бота)
+        if job.future.done():
+            return
+        if error is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(error)
+
+
+class AsyncQueuedTeleBot(AsyncTeleBot):
+    """
+    AsyncTeleBot, методы отправки, изменения и удаления сообщений которого
+    проходят через очередь отправки AsyncSendQueue. Методы ждут отправки
+    и возвращают её результат, а дополнительный аргумент priority (INTERACTIVE
+    или BULK) задаёт порядок отправки относительно запросов других чатов.
+    Задачи отправки запускаются методом send_queue.start().
+    """
+
+    def __init__(self, token: str, send_queue: AsyncSendQueue | None = None, **kwargs) -> None:
+        super().__init__(token, **kwargs)
+        self.send_queue = send_queue or AsyncSendQueue()
+
+    async def _queued(self, chat_id: Any, func: Callable[[], Awaitable], priority: int, cost: float = 1) -> Any:
+        return await self.send_queue.call(chat_id, func, priority, cost)
+
+    async def send_message(self, chat_id, text, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return await self._queued(chat_id, functools.partial(super().send_message, chat_id, text, *args, **kwargs),
+                                  priority)
+
+    async def send_media_group(self, chat_id, media, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        # Telegram учитывает каждое фото альбома как отдельное сообщение
+        return await self._queued(chat_id,
+                                  functools.partial(super().send_media_group, chat_id, media, *args, **kwargs),
+                                  priority, cost=len(media))
+
+    async def edit_message_text(self, text, chat_id=None, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return await self._queued(chat_id,
+                                  functools.partial(super().edit_message_text, text, chat_id, *args, **kwargs),
+                                  priority)
+
+    async def edit_message_reply_markup(self, chat_id=None, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return await self._queued(chat_id,
+                                  functools.partial(super().edit_message_reply_markup, chat_id, *args, **kwargs),
+                                  priority)
+
+    async def delete_message(self, chat_id, message_id, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return await self._queued(chat_id,
+                                  functools.partial(super().delete_message, chat_id, message_id, *args, **kwargs),
+                                  priority)
@@ -0,0 +1,7 @@
+__all__ = [
+    'bench_db_backends',
+    'bench_callback_routing',
+    'bench_card_rendering',
+    'bench_startup',
+    'bench_search_cpu'
+]
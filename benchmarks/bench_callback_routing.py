@@ -0,0 +1,116 @@
+"""
+Бенчмарк выбора обработчика нажатия на InLine кнопку.
+Сравнивает обработчики с фильтрами-лямбдами, которые telebot проверяет
+по очереди (как было в боте: сравнение текста сообщения), и маршрутизатор
+router.CallbackRouter (поиск обработчика по префиксу callback_data в словаре)
+при разном кол-ве обработчиков. Нажимается кнопка последнего зарегистрированного
+обработчика (худший случай для перебора фильтров). Время выводится в микросекундах
+на одно нажатие: отдельно выбор обработчика и полная обработка через TeleBot.process_new_updates.
+
+Запуск из папки проекта:  python -m benchmarks.bench_callback_routing [-n 20000]
+"""
+
+import argparse
+import time
+from typing import Callable
+
+from telebot import TeleBot
+from telebot.types import CallbackQuery, Update
+
+from router import CallbackRouter, callback_data
+
+
+def make_update(data: str, text: str) -> Update:
+    """
+    Функция, которая создаёт обновление с нажатием на кнопку.
+
+    Args:
+        data (str): Принимает callback_data кнопки
+        text (str): Принимает текст сообщения с кнопкой
+
+    Returns (Update): обновление Telegram
+    """
+
+    chat = {'id': 1, 'type': 'private'}
+    return Update.de_json({'update_id': 1, 'callback_query': {
+        'id': '1', 'chat_instance': '1', 'data': data, 'from': {'id': 1, 'is_bot': False, 'first_name': 'a'},
+        'message': {'message_id': 1, 'date': 0, 'chat': chat, 'text': text}}})
+
+
+def measure(func: Callable, iterations: int) -> float:
+    """
+    Функция, которая возвращает среднее время одного вызова func() в микросекундах.
+    """
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def bench_lambdas(handlers: int, iterations: int) -> tuple[float, float]:
+    """
+    Функция, которая измеряет выбор обработчика перебором фильтров-лямбд.
+
+    Args:
+        handlers (int): Принимает кол-во обработчиков
+        iterations (int): Принимает кол-во итераций
+
+    Returns (tuple): время выбора обработчика и полной обработки нажатия (мкс)
+    """
+
+    bot = TeleBot('0:benchmark', threaded=False)
+    filters = []
+    for index in range(handlers):
+        text = 'Вопрос номер {}:'.format(index)
+        filters.append(lambda call, text=text: call.message.text == text)
+        bot.register_callback_query_handler(lambda call: None, func=filters[-1])
+
+    update = make_update(data='answer', text='Вопрос номер {}:'.format(handlers - 1))
+    call = update.callback_query
+
+    select = measure(lambda: next(check for check in filters if check(call)), iterations)
+    full = measure(lambda: bot.process_new_updates([update]), iterations)
+    return select, full
+
+
+def bench_router(handlers: int, iterations: int) -> tuple[float, float]:
+    """
+    Функция, которая измеряет выбор обработчика маршрутизатором CallbackRouter.
+
+    Args:
+        handlers (int): Принимает кол-во обработчиков
+        iterations (int): Принимает кол-во итераций
+
+    Returns (tuple): время выбора обработчика и полной обработки нажатия (мкс)
+    """
+
+    bot = TeleBot('0:benchmark', threaded=False)
+    router = CallbackRouter()
+    for index in range(handlers):
+        router.route('q{}'.format(index))(lambda call, *args: None)
+    router.register(bot)
+
+    update = make_update(data=callback_data('q{}'.format(handlers - 1), 'answer'), text='Вопрос')
+    call: CallbackQuery = update.callback_query
+
+    select = measure(lambda: router.match(call) and router.dispatch(call), iterations)
+    full = measure(lambda: bot.process_new_updates([update]), iterations)
+    return select, full
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк выбора обработчика нажатия на кнопку')
+    parser.add_argument('-n', '--iterations', type=int, default=20000, help='кол-во нажатий в каждом замере')
+    args = parser.parse_args()
+
+    print('{:>12} | {:>22} | {:>22}'.format('Обработчиков', 'Лямбды: выбор / всего', 'Словарь: выбор / всего'))
+    for handlers in (4, 16, 64, 256):
+        lambdas = bench_lambdas(handlers, args.iterations)
+        router = bench_router(handlers, args.iterations)
+        print('{:>12} | {:>9.2f} / {:>9.2f} | {:>9.2f} / {:>9.2f}'.format(handlers, *lambdas, *router))
+    print('Время одного нажатия, мкс')
+
+
+if __name__ == '__main__':
+    main()
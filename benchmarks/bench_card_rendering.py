@@ -0,0 +1,163 @@
+"""
+Бенчмарк формирования описаний найденных отелей (10 карточек на один вывод).
+Сравнивает прежний вывод resulting_function (на каждой карточке запросы к БД
+get_hotels_count и get_needed_photo и полный .format с эмодзи, star_rating и
+night_declension) и снимок параметров поиска messages.CardSnapshot с
+messages.render_cards (один запрос к БД и заранее подготовленный шаблон).
+Время выводится в микросекундах на один вывод: отдельно формирование текста
+и вместе с чтением параметров поиска из временной БД.
+
+Запуск из папки проекта:  python -m benchmarks.bench_card_rendering [-n 2000] [-c 10]
+"""
+
+import argparse
+import datetime as dt
+import os
+import tempfile
+import time
+from typing import Callable
+
+from loguru import logger
+
+import bot_db_pw
+from messages import CardSnapshot, render_cards
+from settings import emoji, star_rating, night_declension
+
+USER_ID = 1
+
+
+def make_hotels(count: int) -> list[dict]:
+    """
+    Функция, которая создаёт данные найденных отелей в формате commands/hilowprice.py.
+
+    Args:
+        count (int): Принимает кол-во отелей
+
+    Returns (list): данные отелей
+    """
+
+    return [{'id': 100000 + index,
+             'name': 'Отель номер {}'.format(index),
+             'stars': str(index % 6),
+             'address': {'streetAddress': 'Улица {}'.format(index), 'locality': 'Город',
+                         'postalCode': '10{:04}'.format(index), 'countryName': 'Страна'},
+             'landmarks': [{'label': 'Центр города', 'distance': '{}.5 km'.format(index % 7)},
+                           {'label': 'Аэропорт', 'distance': '1{} km'.format(index % 9)}],
+             'price': '{:,} RUB'.format(1000 + index * 137),
+             'coordinate': '55.75+37.6{}'.format(index)} for index in range(count)]
+
+
+def legacy_card(hotels: dict, total_days: int) -> str:
+    """
+    Функция, которая формирует описание отеля так, как это делал прежний messages.hotel_card.
+    """
+
+    cost, curr_value = hotels['price'].replace(',', '').split()
+
+    return ("""
+\n\n{e_hotel} <b>{name} </b>
+\n{e_star} Категория отеля:  <b>{stars}</b>
+\n\n{e_address} <a href='{address_link}'>{address}</a>
+\n\n{e_dist} Ближайшие ориентиры: <b>{distance}</b>
+\n\n{e_price} Цена за ночь:  <b>{price}</b>
+\n{e_total} Общая сумма за <b>{total_days}</b> {night}:  <b>{total_price} {curr_value}</b>
+\n\n{e_link} <a href='{link}'>Подробнее на hotels.com</a>""".format(
+        name=hotels['name'],
+        stars=star_rating(rating=hotels['stars']),
+        address=bot_db_pw.get_address(hotels=hotels),
+        distance=bot_db_pw.get_landmarks(hotels=hotels),
+        price=hotels['price'].replace(',', ''),
+        total_days=total_days,
+        night=night_declension(days=total_days),
+        total_price=int(cost) * total_days,
+        curr_value=curr_value,
+        e_hotel=emoji['hotel'],
+        e_star=emoji['star'],
+        e_address=emoji['address'],
+        e_dist=emoji['landmarks'],
+        e_price=emoji['price'],
+        e_total=emoji['total_price'],
+        e_link=emoji['link'],
+        link='https://hotels.com/ho' + str(hotels['id']),
+        address_link='https://google.com/maps/place/' + hotels['coordinate']
+        )
+    )
+
+
+def legacy_output(hotels_list: list[dict], total_days: int, with_db: bool) -> list[str]:
+    """
+    Функция, которая повторяет прежний цикл вывода отелей resulting_function.
+    """
+
+    cards = list()
+    for index, hotels in enumerate(hotels_list):
+        if with_db:
+            if index + 1 > bot_db_pw.get_hotels_count(user_id=USER_ID):
+                break
+            bot_db_pw.get_needed_photo(user_id=USER_ID)
+        cards.append(legacy_card(hotels=hotels, total_days=total_days))
+    return cards
+
+
+def snapshot_output(hotels_list: list[dict], snapshot: CardSnapshot | None) -> list[str]:
+    """
+    Функция, которая формирует вывод отелей по снимку параметров поиска
+    (при snapshot=None снимок читается из БД).
+    """
+
+    if snapshot is None:
+        snapshot = CardSnapshot.from_user_data(bot_db_pw.get_user_data(user_id=USER_ID))
+    return [text for _, text in render_cards(snapshot=snapshot, hotels_list=hotels_list)]
+
+
+def measure(func: Callable, iterations: int) -> float:
+    """
+    Функция, которая возвращает среднее время одного вызова func() в микросекундах.
+    """
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк формирования описаний найденных отелей')
+    parser.add_argument('-n', '--iterations', type=int, default=2000, help='кол-во выводов в каждом замере')
+    parser.add_argument('-c', '--cards', type=int, default=10, help='кол-во отелей в одном выводе')
+    args = parser.parse_args()
+
+    logger.remove()
+
+    hotels_list = make_hotels(args.cards)
+    date_in = dt.date(2026, 10, 19)
+    date_out = date_in + dt.timedelta(days=3)
+    total_days = (date_out - date_in).days
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bot_db_pw.db.init(os.path.join(tmp_dir, 'bot_db_pw.sqlite'))
+        bot_db_pw.init_db()
+        bot_db_pw.add_user(user_id=USER_ID, first_name='Имя', last_name='Фамилия', date=1650000000)
+        bot_db_pw.set_searching_function(user_id=USER_ID, user_searching_function='lowprice')
+        bot_db_pw.update_dates(user_id=USER_ID, date_in=date_in, date_out=date_out)
+        bot_db_pw.set_hotels_count(user_id=USER_ID, user_hotels_count=args.cards)
+        bot_db_pw.set_needed_photo(user_id=USER_ID, user_needed_photo=False)
+
+        snapshot = CardSnapshot.from_user_data(bot_db_pw.get_user_data(user_id=USER_ID))
+        if legacy_output(hotels_list, total_days, with_db=True) != snapshot_output(hotels_list, snapshot=None):
+            raise AssertionError('Описания отелей прежнего и нового вывода различаются')
+
+        results = {
+            'только текст': (measure(lambda: legacy_output(hotels_list, total_days, with_db=False), args.iterations),
+                             measure(lambda: snapshot_output(hotels_list, snapshot=snapshot), args.iterations)),
+            'текст и БД': (measure(lambda: legacy_output(hotels_list, total_days, with_db=True), args.iterations),
+                           measure(lambda: snapshot_output(hotels_list, snapshot=None), args.iterations)),
+        }
+
+    print('{:<16}{:>14}{:>14}{:>10}'.format('{} карточек, мкс'.format(args.cards), 'прежний', 'снимок', 'быстрее'))
+    for name, (legacy, snapshot_time) in results.items():
+        print('{:<16}{:>14.1f}{:>14.1f}{:>9.1f}x'.format(name, legacy, snapshot_time, legacy / snapshot_time))
+
+
+if __name__ == '__main__':
+    main()
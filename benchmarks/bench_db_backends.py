@@ -0,0 +1,148 @@
+"""
+Бенчмарк бэкендов БД: bot_db (sqlite3 + фабрика строк) и bot_db_pw (peewee).
+Выполняет одинаковые операции с таблицами users и search_sessions на временных БД и выводит
+время одной операции для каждого бэкенда. Хелперы bot_db_pw при сравнении работают через хранилище
+с кэшем нулевого размера (каждое чтение - запрос к БД), чтобы сравнивались запросы к БД; чтение
+через кэш (CachedStorage) измеряется отдельно и выводится в таблице хранилищ.
+
+Запуск из папки проекта:  python -m benchmarks.bench_db_backends [-n 2000]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from loguru import logger
+
+import bot_db
+import bot_db_pw
+from storage import CachedStorage, MemoryStorage
+
+
+def measure(func: Callable, iterations: int) -> float:
+    """
+    Функция, которая выполняет func(i) для i в range(iterations)
+    и возвращает среднее время одного вызова в микросекундах.
+
+    Args:
+        func (Callable): Принимает функцию от номера итерации
+        iterations (int): Принимает кол-во итераций
+
+    Returns (float): среднее время одного вызова (мкс)
+    """
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def measure_import(module: str) -> float:
+    """
+    Функция, которая измеряет время импорта модуля в отдельном процессе.
+
+    Args:
+        module (str): Принимает имя модуля
+
+    Returns (float): время импорта (мс)
+    """
+
+    code = 'import time; t = time.perf_counter(); import {m}; print(time.perf_counter() - t)'.format(m=module)
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1]) * 1000
+
+
+def run_backend(module, iterations: int) -> dict[str, float]:
+    """
+    Функция, которая выполняет набор операций для одного бэкенда.
+
+    Args:
+        module: Принимает модуль бэкенда (bot_db или bot_db_pw)
+        iterations (int): Принимает кол-во итераций каждой операции
+
+    Returns (dict): {название операции: среднее время (мкс)}
+    """
+
+    return {
+        'add_user': measure(lambda i: module.add_user(user_id=i, first_name='Имя', last_name='Фамилия',
+                                                      date=1650000000), iterations),
+        'user_exists': measure(lambda i: module.user_exists(user_id=i), iterations),
+        'set_searching_function': measure(lambda i: module.set_searching_function(user_id=i,
+                                                                                 user_searching_function='lowprice'),
+                                          iterations),
+        'set_hotels_count': measure(lambda i: module.set_hotels_count(user_id=i, user_hotels_count=5), iterations),
+        'get_hotels_count': measure(lambda i: module.get_hotels_count(user_id=i), iterations),
+        'get_user_data': measure(lambda i: module.get_user_data(user_id=i), iterations),
+    }
+
+
+def run_storages(iterations: int) -> dict[str, float]:
+    """
+    Функция, которая измеряет чтение строки пользователя через хранилища
+    (пользователи уже добавлены в БД функцией run_backend).
+
+    Args:
+        iterations (int): Принимает кол-во итераций
+
+    Returns (dict): {название хранилища: среднее время get_user (мкс)}
+    """
+
+    memory = MemoryStorage()
+    for i in range(iterations):
+        memory.add_user(i, 'Имя', 'Фамилия', '2022-04-15 00:00:00')
+
+    storages = {'SqliteStorage': bot_db.SqliteStorage(),
+                'PeeweeStorage': bot_db_pw.PeeweeStorage(),
+                'MemoryStorage': memory,
+                'CachedStorage(Peewee)': CachedStorage(bot_db_pw.PeeweeStorage(), maxsize=iterations)}
+
+    # Прогреваем кэш
+    for i in range(iterations):
+        storages['CachedStorage(Peewee)'].get_user(i)
+
+    return {name: measure(lambda i: storage.get_user(i), iterations) for name, storage in storages.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--iterations', type=int, default=1000, help='Кол-во итераций каждой операции')
+    args = parser.parse_args()
+
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bot_db.DATABASE = os.path.join(tmp_dir, 'bot_db.sqlite')
+        bot_db.init_db()
+        bot_db_pw.db.init(os.path.join(tmp_dir, 'bot_db_pw.sqlite'))
+        bot_db_pw.init_db()
+
+        # Попадания в кэш не сравниваются с запросами bot_db: хелперы bot_db_pw читают БД напрямую
+        cached, bot_db_pw.storage = bot_db_pw.storage, CachedStorage(bot_db_pw.PeeweeStorage(), maxsize=0)
+        try:
+            results = {'bot_db': run_backend(bot_db, args.iterations),
+                       'bot_db_pw': run_backend(bot_db_pw, args.iterations)}
+        finally:
+            bot_db_pw.storage = cached
+        storages = run_storages(args.iterations)
+
+    results['bot_db']['import (мс)'] = measure_import('bot_db')
+    results['bot_db_pw']['import (мс)'] = measure_import('bot_db_pw')
+
+    print('{:<20}{:>14}{:>14}{:>12}'.format('операция, мкс', 'bot_db', 'bot_db_pw', 'быстрее'))
+    for operation in results['bot_db']:
+        raw, orm = results['bot_db'][operation], results['bot_db_pw'][operation]
+        print('{:<20}{:>14.1f}{:>14.1f}{:>12}'.format(operation, raw, orm, 'bot_db' if raw < orm else 'bot_db_pw'))
+
+    print('\n{:<24}{:>14}'.format('get_user, мкс', ''))
+    for name, value in storages.items():
+        print('{:<24}{:>14.1f}'.format(name, value))
+
+    print('\npandas загружен: {}'.format('pandas' in sys.modules))
+
+
+if __name__ == '__main__':
+    main()
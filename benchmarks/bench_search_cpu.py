@@ -0,0 +1,223 @@
+"""
+Микробенчмарки работы процессора при одном поиске отелей: разбор ответов Hotels API
+и формирование вывода. Замеряются функции:
+- recurring.parse_locations (разбор ответа поиска городов) и регулярное выражение подписи города;
+- hilowprice.parse_hotels (разбор ответа и словарь найденных отелей /lowprice и /highprice);
+- bestdeal.filter_hotels и bestdeal.hotels_glossary (отбор по расстоянию и словарь отелей /bestdeal);
+- bot_db_pw.get_address, bot_db_pw.get_landmarks, settings.star_rating, settings.night_declension;
+- history.get_hotels_for_history (записи истории поиска);
+- messages.render_cards (описания отелей в resulting_function).
+Ответы Hotels API - данные tools/hotels_stub.py разного размера (кол-во отелей и городов,
+размер описаний) и, если указана папка --recorded, записанные ответы настоящего Hotels API
+(файлы locations.json и properties.json - тела ответов locations/v2/search и properties/list).
+Результаты выводятся таблицей и в формате JSON (--json), а --compare сравнивает их
+с результатами предыдущего запуска, чтобы оценить оптимизацию.
+
+Запуск из папки проекта:  python -m benchmarks.bench_search_cpu [-r 5] [--payloads small,large]
+                           [--only parse_hotels,render_cards] [--json results.json] [--compare old.json]
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import timeit
+from typing import Any, Callable
+
+from loguru import logger
+
+import bot_db_pw
+from commands import bestdeal, hilowprice, recurring
+from commands.history import get_hotels_for_history
+from messages import CardSnapshot, render_cards
+from settings import star_rating, night_declension
+from tools.hotels_stub import CITIES, Fixtures
+
+
+# Размеры данных: название -> (кол-во отелей в ответе, размер описания отеля, кол-во городов в ответе)
+PAYLOADS = {'small': (5, 0, 2),
+            'medium': (25, 0, 10),
+            'large': (25, 2000, 22),
+            'huge': (100, 2000, 50)}
+
+# Диапазон расстояний /bestdeal, в который попадают все отели (отбор проходит всю страницу)
+DIST_RANGE = '[0, 1000]'
+
+# Функции, которые разбирают ответ поиска городов (остальные - данные ответа properties/list)
+LOCATION_CASES = ('parse_locations', 'caption_regex')
+
+SEARCH_URL = 'https://hotels.com/search.do?destination-id=1426176'
+
+
+def dump(payload: dict) -> str:
+    # Компактный JSON, как в ответах Hotels API
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def synthetic_payload(hotels: int, padding: int, cities: int) -> dict[str, str]:
+    """
+    Функция, которая создаёт тела ответов Hotels API с данными tools/hotels_stub.py.
+
+    Args:
+        hotels (int): Принимает кол-во отелей в ответе properties/list
+        padding (int): Принимает размер описания каждого отеля (символов)
+        cities (int): Принимает кол-во городов в ответе locations/v2/search
+
+    Returns (dict): {'locations': тело ответа, 'properties': тело ответа}
+    """
+
+    fixtures = Fixtures(seed=0, hotels=hotels, padding=padding)
+    entities = [entity for query in CITIES for entity in fixtures.locations(query)['suggestions'][0]['entities']]
+    locations = fixtures.locations('париж')
+    locations['suggestions'][0]['entities'] = [entities[index % len(entities)] for index in range(cities)]
+
+    properties = fixtures.properties({'destinationId': '1426176', 'pageSize': str(hotels), 'currency': 'RUB',
+                                      'locale': 'ru_RU', 'sortOrder': 'PRICE'})
+    return {'locations': dump(locations), 'properties': dump(properties)}
+
+
+def recorded_payload(path: str) -> dict[str, str]:
+    """
+    Функция, которая читает записанные ответы Hotels API из папки.
+    """
+
+    payload = dict()
+    for name in ('locations', 'properties'):
+        with open(os.path.join(path, name + '.json'), encoding='utf-8') as file:
+            payload[name] = file.read()
+    return payload
+
+
+def make_cases(payload: dict[str, str]) -> dict[str, tuple[Callable[[], Any], int, str]]:
+    """
+    Функция, которая подготавливает замеряемые функции для одного набора данных.
+
+    Args:
+        payload (dict): Принимает тела ответов Hotels API
+
+    Returns (dict): {название: (функция без аргументов, кол-во обрабатываемых элементов,
+                     ответ Hotels API, из которого получены данные)}
+    """
+
+    locations, properties = payload['locations'], payload['properties']
+    entities = json.loads(locations)['suggestions'][0]['entities']
+    captions = [city['caption'] + '\n' for city in entities]
+    catalog = json.loads(properties)['data']['body']['searchResults']['results']
+    glossary, _ = hilowprice.parse_hotels(200, properties, SEARCH_URL)
+    # Отели без цены (Hotels API не вернул предложение) боту не выводятся
+    hotels = [hotel for hotel in glossary.values() if hotel['price'] != '-']
+    stars = [hotel['stars'] for hotel in hotels]
+    snapshot = CardSnapshot(hotels_count=len(hotels), needed_photo=False, photos_count=0, total_days=3)
+    user_data = {'city_name': 'Париж, Франция'}
+    caption_regex = re.compile('(\\w+)[\n<]')
+
+    cases = {
+        'parse_locations': (lambda: recurring.parse_locations(200, locations), len(entities)),
+        'caption_regex': (lambda: [caption_regex.findall(caption)[-1] for caption in captions], len(captions)),
+        'parse_hotels': (lambda: hilowprice.parse_hotels(200, properties, SEARCH_URL), len(catalog)),
+        'filter_hotels': (lambda: bestdeal.filter_hotels(200, properties, DIST_RANGE), len(catalog)),
+        'hotels_glossary': (lambda: bestdeal.hotels_glossary(catalog), len(catalog)),
+        'get_address': (lambda: [bot_db_pw.get_address(hotels=hotel) for hotel in hotels], len(hotels)),
+        'get_landmarks': (lambda: [bot_db_pw.get_landmarks(hotels=hotel) for hotel in hotels], len(hotels)),
+        'star_rating': (lambda: [star_rating(rating=rating) for rating in stars], len(stars)),
+        'night_declension': (lambda: [night_declension(days=days) for days in range(1, 31)], 30),
+        'get_hotels_for_history': (lambda: get_hotels_for_history(hotels_data=(glossary, SEARCH_URL),
+                                                                  user_data=user_data), len(glossary)),
+        'render_cards': (lambda: render_cards(snapshot=snapshot, hotels_list=hotels), len(hotels)),
+    }
+
+    return {name: (func, items, 'locations' if name in LOCATION_CASES else 'properties')
+            for name, (func, items) in cases.items()}
+
+
+def measure(func: Callable[[], Any], repeat: int) -> list[float]:
+    """
+    Функция, которая замеряет время одного вызова func: кол-во вызовов в серии подбирается
+    так, чтобы серия длилась не меньше 0.2 с, и выполняется repeat серий.
+
+    Returns (list): время одного вызова в каждой серии (мкс)
+    """
+
+    timer = timeit.Timer(func)
+    loops, _ = timer.autorange()
+    return [total / loops * 1_000_000 for total in timer.repeat(repeat=repeat, number=loops)]
+
+
+def git_commit() -> str:
+    """
+    Функция, которая возвращает текущий коммит git ('' - не удалось определить).
+    """
+
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Микробенчмарки разбора ответов Hotels API и вывода отелей')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='кол-во серий замера каждой функции')
+    parser.add_argument('--payloads', default=','.join(PAYLOADS),
+                        help='наборы данных: {}'.format(', '.join(PAYLOADS)))
+    parser.add_argument('--recorded', default='', help='папка с записанными ответами Hotels API '
+                                                       '(locations.json, properties.json)')
+    parser.add_argument('--only', default='', help='замерять только эти функции (через запятую)')
+    parser.add_argument('--json', default='', help='файл для результатов в формате JSON ("-" - вывод на экран)')
+    parser.add_argument('--compare', default='', help='файл JSON с результатами предыдущего запуска')
+    args = parser.parse_args()
+
+    logger.remove()
+
+    payloads = {name: synthetic_payload(*PAYLOADS[name]) for name in args.payloads.split(',') if name}
+    if args.recorded:
+        payloads['recorded'] = recorded_payload(args.recorded)
+    only = set(filter(None, args.only.split(',')))
+
+    results = list()
+    for payload_name, payload in payloads.items():
+        for name, (func, items, source) in make_cases(payload).items():
+            if only and name not in only:
+                continue
+            times = measure(func, args.repeat)
+            results.append({'name': name, 'payload': payload_name, 'items': items,
+                            'bytes': len(payload[source].encode('utf-8')),
+                            'best_us': round(min(times), 3), 'median_us': round(statistics.median(times), 3),
+                            'per_item_us': round(statistics.median(times) / max(items, 1), 3)})
+
+    previous = dict()
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            previous = {(result['name'], result['payload']): result['median_us']
+                        for result in json.load(file)['results']}
+
+    # При выводе JSON на экран таблица выводится в stderr, чтобы stdout можно было передать другой программе
+    table = sys.stderr if args.json == '-' else sys.stdout
+    print('{:<24}{:<10}{:>8}{:>10}{:>12}{:>12}{:>12}{:>10}'.format(
+        'Функция', 'данные', 'элем.', 'байт', 'мин., мкс', 'медиана', 'на элем.', 'было'), file=table)
+    for result in results:
+        old = previous.get((result['name'], result['payload']))
+        print('{:<24}{:<10}{:>8}{:>10}{:>12.2f}{:>12.2f}{:>12.3f}{:>10}'.format(
+            result['name'], result['payload'], result['items'], result['bytes'], result['best_us'],
+            result['median_us'], result['per_item_us'],
+            '{:+.1f}%'.format((result['median_us'] / old - 1) * 100) if old else '-'), file=table)
+
+    if args.json:
+        report = {'benchmark': 'bench_search_cpu', 'timestamp': dt.datetime.now().isoformat(timespec='seconds'),
+                  'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                  'repeat': args.repeat, 'results': results}
+        if args.json == '-':
+            json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            with open(args.json, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
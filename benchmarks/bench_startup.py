@@ -0,0 +1,143 @@
+"""
+Бенчмарк запуска бота: время от старта процесса до приёма первого обновления.
+Бот (besthoteloffers_bot.py) запускается в дочернем процессе в режиме webhook
+на свободном локальном порту без публичного адреса, и обновление отправляется
+POST-запросом, пока сервер не ответит 200. Замер выполняется с новой БД
+(таблицы создаются) и с уже созданной (init_db сверяет версию схемы и пропускает
+создание таблиц). Отдельно выводится время импорта модуля бота и время init_db.
+getMe выполняется в фоне, поэтому недоступность Telegram на замер не влияет.
+
+Запуск из папки проекта:  python -m benchmarks.bench_startup [-n 5]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from config import WEBHOOK_PATH, WEBHOOK_SECRET
+from webhook import with_secret
+
+# Максимальное время ожидания запуска бота (секунд)
+START_TIMEOUT = 30
+
+UPDATE = {'update_id': 1, 'message': {
+    'message_id': 1, 'date': 1650000000, 'chat': {'id': 1, 'type': 'private'},
+    'from': {'id': 1, 'is_bot': False, 'first_name': 'a'}, 'text': 'привет'}}
+
+
+def free_port() -> int:
+    """
+    Функция, которая возвращает свободный локальный порт.
+    """
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def post_update(url: str) -> bool:
+    """
+    Функция, которая отправляет обновление боту и возвращает True, если бот его принял.
+    """
+
+    request = urllib.request.Request(url, data=json.dumps(UPDATE).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request, timeout=1) as response:
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError, OSError):
+        return False
+
+
+def first_update(database: str) -> float:
+    """
+    Функция, которая запускает бота и возвращает время до приёма первого обновления (мс).
+
+    Args:
+        database (str): Принимает путь к файлу БД бота
+
+    Returns (float): время в миллисекундах
+    """
+
+    port = free_port()
+    env = dict(os.environ, BOT_MODE='webhook', WEBHOOK_LISTEN='127.0.0.1', WEBHOOK_PORT=str(port),
+               WEBHOOK_URL='', WEBHOOK_SECRET=WEBHOOK_SECRET, DATABASE=database, BOT_WORKERS='1', WORKER_INDEX='0',
+               STATE_SNAPSHOT='')
+    url = with_secret('http://127.0.0.1:{}{}'.format(port, WEBHOOK_PATH))
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'besthoteloffers_bot.py'], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while not post_update(url):
+            if process.poll() is not None:
+                raise RuntimeError('Бот завершился с кодом {}'.format(process.returncode))
+            if time.perf_counter() - start > START_TIMEOUT:
+                raise TimeoutError('Бот не запустился за {} с'.format(START_TIMEOUT))
+            time.sleep(0.005)
+        return (time.perf_counter() - start) * 1000
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def python_time(code: str, database: str) -> float:
+    """
+    Функция, которая возвращает время выполнения кода в новом процессе Python (мс).
+    """
+
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], env=dict(os.environ, DATABASE=database), check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - start) * 1000
+
+
+def median(values: list[float]) -> float:
+    return sorted(values)[len(values) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк запуска бота')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='кол-во запусков в каждом замере')
+    args = parser.parse_args()
+
+    init_code = ('import time, bot_db_pw; start = time.perf_counter(); bot_db_pw.init_db(); '
+                 'print(time.perf_counter() - start)')
+    results = dict()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        warm_db = os.path.join(tmp_dir, 'warm.sqlite')
+
+        results['интерпретатор'] = median([python_time('pass', warm_db) for _ in range(args.runs)])
+        results['импорт бота'] = median([python_time('import besthoteloffers_bot', warm_db)
+                                         for _ in range(args.runs)])
+
+        cold_init, warm_init = list(), list()
+        for index in range(args.runs):
+            cold_db = os.path.join(tmp_dir, 'init{}.sqlite'.format(index))
+            for database, times in ((cold_db, cold_init), (cold_db, warm_init)):
+                output = subprocess.run([sys.executable, '-c', init_code], env=dict(os.environ, DATABASE=database),
+                                        check=True, capture_output=True, text=True).stdout
+                times.append(float(output.split()[-1]) * 1000)
+        results['init_db, новая БД'] = median(cold_init)
+        results['init_db, готовая БД'] = median(warm_init)
+
+        results['первое обновление, новая БД'] = median(
+            [first_update(os.path.join(tmp_dir, 'cold{}.sqlite'.format(index))) for index in range(args.runs)])
+        first_update(warm_db)
+        results['первое обновление, готовая БД'] = median([first_update(warm_db) for _ in range(args.runs)])
+
+    print('{:<32}{:>10}'.format('Запуск (медиана), мс', 'время'))
+    for name, value in results.items():
+        print('{:<32}{:>10.1f}'.format(name, value))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,58 @@
 """
 Главный скрипт бота besthoteloffers_bot.py
 Содержит основную логику работы бота.
+Импорт модуля только регистрирует обработчики и не запускает потоков: подготовка к работе
+(потоки очереди отправки, проверка схемы БД, задача очистки, проверка подключения к Telegram
+в фоне) выполняется функцией create_app, а получение обновлений - функцией main.
 """
 
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from datetime import date
+import re
+import threading
 
 import telebot
-from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InlineQuery
 
 from bot_db_pw import *
 from commands.calendar import MyStyleCalendar, STEPS
-from config import BOT_TOKEN
-from settings import emoji, star_rating, night_declension
-
-logger.add('Log/debug.log', encoding='utf-8')
-
-# Подключение к Telegram Bot API
-bot = telebot.TeleBot(BOT_TOKEN)
-
-# Проверка корректного подключения к Telegram Bot API
-bot_info = bot.get_me()
-logger.info((f"""
-    ID бота: {bot_info.id}, 
-    Название бота: {bot_info.first_name}, 
-    Пользователь: {bot_info.username}, 
-    Подключение: {bot_info.is_bot}"""))
-
-# Инициализируем БД
-init_db()
+from config import BOT_TOKEN, BOT_MODE, TELEGRAM_API_URL, WORKER_INDEX, PHOTO_LOOKUP_WORKERS, INLINE_CACHE_TIME
+from dialog import (CITY, CITY_CHOICE, PRICE_RANGE, DISTANCE_RANGE, DATE_IN, DATE_OUT, HOTELS_COUNT, NEED_PHOTOS,
+                    PHOTOS_COUNT)
+from dispatcher import Dispatcher
+from inline import inline_search
+import metrics
+from query_log import install_dump_signal
+from sender import QueuedTeleBot, EditThrottle, BULK
+from router import CallbackRouter, callback_data
+from messages import (NOTHING_FOUND, NO_CITIES_FOUND, PARTIAL_RESULT, CardSnapshot, render_cards, search_progress,
+                      search_footer, history_page)
+from settings import emoji
+from shutdown import GracefulShutdown, ShutdownRequested, STOP_INTAKE, DRAIN, FLUSH, SAVE, load_snapshot, save_snapshot
+
+# Подключение к Telegram Bot API.
+# Обработчики выполняются в рабочих потоках диспетчера (dispatcher.py), а не в пуле потоков telebot,
+# а сообщения отправляются через очередь отправки с лимитами Telegram (sender.py)
+telebot.apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+bot = QueuedTeleBot(BOT_TOKEN, threaded=False)
+dispatcher = Dispatcher(bot)
+
+# Нажатия на InLine кнопки передаются обработчикам по префиксу callback_data (router.py)
+router = CallbackRouter()
+router.register(bot)
+
+# Потоки, в которых одновременно запрашиваются фотографии найденных отелей
+# (пул создаёт потоки при первом запросе, а не при импорте модуля)
+photo_lookup_executor = ThreadPoolExecutor(max_workers=PHOTO_LOOKUP_WORKERS, thread_name_prefix='photo-lookup')
+
+# Шаги плавной остановки бота (добавляются в create_app, выполняются в main)
+shutdown = GracefulShutdown()
+
+# Длины очередей обработки обновлений и отправки сообщений в метриках (metrics.py)
+metrics.registry.callback('bot_update_queue_depth', 'Кол-во обновлений в очереди рабочего потока диспетчера',
+                          lambda: dict(enumerate(dispatcher.queue_depths())), ('worker',))
+metrics.registry.callback('telegram_send_queued', 'Кол-во запросов в очереди отправки',
+                          lambda: bot.send_queue.metrics()['queued'])
 
 
 @bot.message_handler(commands=['start'])
@@ -58,15 +83,14 @@ def command_start(message: Message) -> None:
 
     logger.info('Пользователь: {user_id}  | Команда: "/start"'.format(user_id=message.from_user.id))
 
+    dialog_machine.finish(chat_id=message.chat.id)
+
     if not user_exists(user_id=message.from_user.id):
         # Добавляем пользователя в БД
-        with db:
-            User(
-                user_id=message.from_user.id,
-                first_name=message.from_user.first_name,
-                last_name=message.from_user.last_name,
-                date=convert_data(value=message.date)
-            ).save(force_insert=True)
+        add_user(user_id=message.from_user.id,
+                 first_name=message.from_user.first_name,
+                 last_name=message.from_user.last_name,
+                 date=message.date)
 
         # Отправляем первое стартовое сообщение
         bot.send_message(chat_id=message.chat.id, text=send_message_first_start, parse_mode='HTML')
@@ -117,7 +141,8 @@ def command_reset(message: Message) -> None:
     logger.info('Пользователь: {user_id}  | Команда: "/reset"'.format(user_id=message.from_user.id))
 
     History.delete_history_data(user_id=message.from_user.id)
-    User.reset_to_default_search_data(user_id=message.from_user.id)
+    reset_search_data(user_id=message.from_user.id)
+    dialog_machine.finish(chat_id=message.chat.id)
 
     bot.send_message(chat_id=message.chat.id,
                      text='Все параметры сброшены!\nИстория команд удалена!\n\nХочешь продолжить? /help',
@@ -149,24 +174,25 @@ def search_commands(message: Message) -> None:
 
     match message.text:
         case '/lowprice' | '/highprice' | '/bestdeal':
-            User.reset_to_default_search_data(user_id=message.from_user.id)
+            # Новый поиск - это новая сессия поиска с параметрами по умолчанию
             set_searching_function(
                 user_id=message.from_user.id,
                 user_searching_function=re.search(r'\w+', message.text).group()
             )
+            dialog_machine.start(chat_id=message.chat.id)
             bot.send_message(chat_id=message.chat.id, text='В какой город планируем выезд?')
-            bot.register_next_step_handler(message=message, callback=search_city)
 
         case '/history':
             markup = InlineKeyboardMarkup(keyboard=[
-                [InlineKeyboardButton(text='Последний поиск', callback_data='history_last')],
-                [InlineKeyboardButton(text='За последний день', callback_data='history_day')],
-                [InlineKeyboardButton(text='За последнюю неделю', callback_data='history_week')]
+                [InlineKeyboardButton(text='Последний поиск', callback_data=callback_data('hist', 'last'))],
+                [InlineKeyboardButton(text='За последний день', callback_data=callback_data('hist', 'day'))],
+                [InlineKeyboardButton(text='За последнюю неделю', callback_data=callback_data('hist', 'week'))]
                 ])
 
             bot.send_message(message.chat.id, 'Какую историю выводить?', reply_markup=markup)
 
 
+@bot.message_handler(func=dialog_machine.in_state(CITY), content_types=['text'])
 @logger.catch
 def search_city(message: Message) -> None:
     """
@@ -186,19 +212,17 @@ def search_city(message: Message) -> None:
     keyboard = InlineKeyboardMarkup()
 
     if not cities:
+        dialog_machine.move(chat_id=message.chat.id, state=None)
         bot.edit_message_text(
             chat_id=message.chat.id,
             message_id=temp.id,
-            text=("""
-К сожалению, я ничего подходящего не нашёл {sad}...
-(Российские города всё ещё недоступны)
-
-Может попробуешь ещё раз?  /help""").format(sad=emoji['sadness']),
+            text=NO_CITIES_FOUND,
             parse_mode='HTML'
         )
     else:
+        dialog_machine.move(chat_id=message.chat.id, state=CITY_CHOICE)
         for city_name, city_id in cities.items():
-            keyboard.add(InlineKeyboardButton(text=city_name, callback_data=city_id))
+            keyboard.add(InlineKeyboardButton(text=city_name, callback_data=callback_data('city', city_id)))
         bot.edit_message_text(
             chat_id=message.chat.id,
             message_id=temp.id,
@@ -207,26 +231,29 @@ def search_city(message: Message) -> None:
         )
 
 
-@bot.callback_query_handler(func=lambda call: call.message.text == 'Куда именно из этих:')
+@router.route('city', func=dialog_machine.in_state(CITY_CHOICE))
 @logger.catch
-def city_handler(call: CallbackQuery) -> None:
+def city_handler(call: CallbackQuery, city_id: str) -> None:
     """
     Функция-обработчик нажатия на кнопку нужного города
     и переход к следующему действию по сценарию.
 
     Args:
         call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        city_id (str): Принимает id выбранного города
     """
 
     logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
                                                                     btn=call.data))
 
-    set_city_id(user_id=call.message.chat.id, user_city=call.data)
+    set_city_id(user_id=call.message.chat.id, user_city=city_id)
     bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.id)
 
     if get_advanced_question_flag(user_id=call.message.chat.id):
+        dialog_machine.move(chat_id=call.message.chat.id, state=PRICE_RANGE)
         ask_for_price_range(call.message)
     else:
+        dialog_machine.move(chat_id=call.message.chat.id, state=DATE_IN)
         ask_for_date_in(call.message)
 
 
@@ -248,9 +275,8 @@ def ask_for_price_range(message: Message) -> None:
                                                                      smile=emoji['smile']),
                      parse_mode='HTML')
 
-    bot.register_next_step_handler(message=message, callback=ask_for_distance_range)
-
 
+@bot.message_handler(func=dialog_machine.in_state(PRICE_RANGE), content_types=['text'])
 @logger.catch
 def ask_for_distance_range(message: Message) -> None:
     """
@@ -267,19 +293,20 @@ def ask_for_distance_range(message: Message) -> None:
     price_range = list(set(map(int, map(lambda string: string.replace(',', '.'),
                                         re.findall(r'\d+[.,\d+]?\d?', message.text)))))
     if len(price_range) != 2:
+        dialog_machine.finish(chat_id=message.chat.id)
         bot.send_message(chat_id=message.chat.id, text='Ошибка диапазона!\nМожет попробуешь заново?  /help')
         raise ValueError('Ошибка диапазона!')
     else:
         set_price_range(user_id=message.chat.id, price_range=price_range)
+        dialog_machine.move(chat_id=message.chat.id, state=DISTANCE_RANGE)
         bot.send_message(chat_id=message.chat.id,
                          text="""
 Как далеко (в км) от центра должен находится отель?:
 (Например: "от 1 до 3", "1-3", "1 3")""",
                          parse_mode='HTML')
 
-        bot.register_next_step_handler(message=message, callback=ask_for_date_in)
-
 
+@bot.message_handler(func=dialog_machine.in_state(DISTANCE_RANGE), content_types=['text'])
 @logger.catch
 def ask_for_date_in(message: Message) -> None:
     """
@@ -297,14 +324,15 @@ def ask_for_date_in(message: Message) -> None:
         distance_range = list(set(map(float, map(lambda string: string.replace(',', '.'),
                                                  re.findall(r'\d+[.,\d+]?\d?', message.text)))))
         if len(distance_range) != 2:
+            dialog_machine.finish(chat_id=message.chat.id)
             bot.send_message(chat_id=message.chat.id, text='Ошибка расстояния!\nМожет попробуешь заново?  /help')
             raise ValueError('Ошибка расстояния!')
         else:
             set_distance_range(user_id=message.chat.id, dist_range=distance_range)
+            dialog_machine.move(chat_id=message.chat.id, state=DATE_IN)
 
     # Сбрасываем даты заезда и выезда в БД
-    with db:
-        User(id=User.get_pk_id(message.chat.id), date_in=None, date_out=None).save()
+    update_dates(user_id=message.chat.id, date_in=None, date_out=None)
 
     # Создаём и выводим календарь для выбора года заезда
     calendar, step = MyStyleCalendar(calendar_id=1, locale='ru', min_date=date.today()).build()
@@ -312,26 +340,24 @@ def ask_for_date_in(message: Message) -> None:
 
 
 @logger.catch
-def ask_for_date_out(message: Message) -> None:
+def ask_for_date_out(message: Message, min_date: date) -> None:
     """
     Функция создаёт календарь для даты выезда из отеля и запрашивает год даты.
 
     Args:
         message (Message): Принимает объект-сообщение от Telegram
+        min_date (date): Принимает дату заезда (минимальную дату выезда)
     """
 
     # Создаём и выводим календарь для выбора года выезда
-    with db:
-        min_date = User.get(User.user_id == message.chat.id).date_in
-
     calendar, step = MyStyleCalendar(calendar_id=2, locale='ru', min_date=min_date).build()
 
     bot.send_message(chat_id=message.chat.id, text=f'Выберите {STEPS[step]} выезда', reply_markup=calendar)
 
 
-@bot.callback_query_handler(func=MyStyleCalendar.func(calendar_id=1))
+@router.route(MyStyleCalendar.prefix(calendar_id=1), func=dialog_machine.in_state(DATE_IN))
 @logger.catch
-def set_date_in(call: CallbackQuery) -> None:
+def set_date_in(call: CallbackQuery, min_date: str, call_data: str) -> None:
     """
     Функция - обработчик нажатий на кнопки календаря.
     Запрашивает месяц и день даты заезда, записывает дату заезда в БД
@@ -339,13 +365,20 @@ def set_date_in(call: CallbackQuery) -> None:
 
     Args:
         call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        min_date (str): Принимает минимальную дату календаря из данных кнопки
+        call_data (str): Принимает данные нажатой кнопки календаря
     """
 
-    # Выводим календарь для выбора месяца и дня заезда
-    result, key, step = MyStyleCalendar(calendar_id=1,
-                                        locale='ru',
-                                        min_date=date.today()
-                                        ).process(call_data=call.data)
+    # Выводим календарь для выбора месяца и дня заезда (клавиатура берётся из кэша календаря).
+    # Дата заезда не может быть раньше сегодняшней, даже если календарь построен раньше
+    min_date = max(MyStyleCalendar.decode_date(min_date), date.today())
+    result, key, step = MyStyleCalendar(calendar_id=1, locale='ru', min_date=min_date).process(call_data=call_data)
+    if result and result < min_date:
+        # Календарь построен раньше (например, вчера): день уже недоступен, календарь остаётся на экране
+        bot.answer_callback_query(callback_query_id=call.id,
+                                  text='Дата заезда не может быть раньше {}'.format(min_date))
+        return
+
     if not result and key:
         bot.edit_message_text(text=f'Выберите {STEPS[step]} заезда',
                               chat_id=call.message.chat.id,
@@ -360,15 +393,15 @@ def set_date_in(call: CallbackQuery) -> None:
                               )
 
         # Записываем дату заезда в БД и запрашиваем год выезда
-        with db:
-            User(id=User.get_pk_id(call.from_user.id), date_in=result).save()
+        update_dates(user_id=call.from_user.id, date_in=result)
+        dialog_machine.move(chat_id=call.message.chat.id, state=DATE_OUT)
 
-        ask_for_date_out(call.message)
+        ask_for_date_out(call.message, min_date=result)
 
 
-@bot.callback_query_handler(func=MyStyleCalendar.func(calendar_id=2))
+@router.route(MyStyleCalendar.prefix(calendar_id=2), func=dialog_machine.in_state(DATE_OUT))
 @logger.catch
-def set_date_out(call: CallbackQuery) -> None:
+def set_date_out(call: CallbackQuery, min_date: str, call_data: str) -> None:
     """
     Функция - обработчик нажатий на кнопки календаря.
     Запрашивает месяц и день даты выезда, записывает дату выезда в БД
@@ -376,13 +409,19 @@ def set_date_out(call: CallbackQuery) -> None:
 
     Args:
         call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        min_date (str): Принимает минимальную дату календаря (дату заезда) из данных кнопки
+        call_data (str): Принимает данные нажатой кнопки календаря
     """
 
-    # Выводим календарь для выбора месяца и дня выезда
-    with db:
-        min_date = User.get(User.user_id == call.from_user.id).date_in
-
-    result, key, step = MyStyleCalendar(calendar_id=2, locale='ru', min_date=min_date).process(call_data=call.data)
+    # Выводим календарь для выбора месяца и дня выезда: дата заезда передаётся в данных кнопки,
+    # поэтому переходы по календарю не читают БД (дата заезда из БД проверяется только при выборе дня)
+    min_date = MyStyleCalendar.decode_date(min_date)
+    result, key, step = MyStyleCalendar(calendar_id=2, locale='ru', min_date=min_date).process(call_data=call_data)
+    date_in = get_dates(user_id=call.from_user.id)[0] if result else None
+    if result and result < date_in:
+        bot.answer_callback_query(callback_query_id=call.id,
+                                  text='Дата выезда не может быть раньше даты заезда ({})'.format(date_in))
+        return
 
     if not result and key:
         bot.edit_message_text(text=f'Выберите {STEPS[step]} выезда',
@@ -398,8 +437,8 @@ def set_date_out(call: CallbackQuery) -> None:
                               )
 
         # Записываем дату выезда в БД и запрашиваем кол-во отелей
-        with db:
-            User(id=User.get_pk_id(call.from_user.id), date_out=result).save()
+        update_dates(user_id=call.from_user.id, date_out=result)
+        dialog_machine.move(chat_id=call.message.chat.id, state=HOTELS_COUNT)
 
         ask_for_hotels_count(call.message)
 
@@ -414,9 +453,9 @@ def ask_for_hotels_count(message: Message) -> None:
     """
 
     bot.send_message(chat_id=message.chat.id, text='Сколько отелей вывести?\n(в цифрах, но не более 10)')
-    bot.register_next_step_handler(message=message, callback=photo_needed)
 
 
+@bot.message_handler(func=dialog_machine.in_state(HOTELS_COUNT), content_types=['text'])
 @logger.catch
 def photo_needed(message: Message) -> None:
     """
@@ -432,23 +471,28 @@ def photo_needed(message: Message) -> None:
     if not message.text.isalpha():
         user_hotels_count = abs(int(re.search(r'\d+', message.text).group()))
         if user_hotels_count > 10:
+            dialog_machine.finish(chat_id=message.chat.id)
             bot.send_message(chat_id=message.chat.id, text='Ошибка! Кол-во больше 10!\nМожет попробуешь заново?  /help')
             raise ValueError('Ошибка! Пользователь ввёл цифру больше 10.')
         else:
             set_hotels_count(user_id=message.chat.id, user_hotels_count=user_hotels_count)
     else:
+        dialog_machine.finish(chat_id=message.chat.id)
         bot.send_message(chat_id=message.chat.id, text='Ошибка! Не вижу цифр!\nМожет попробуешь заново?  /help')
         raise ValueError('Ошибка кол-ва отелей! Пользователь не ввёл цифры.')
 
+    dialog_machine.move(chat_id=message.chat.id, state=NEED_PHOTOS)
+
     keyboard = InlineKeyboardMarkup()
-    [keyboard.add(InlineKeyboardButton(x, callback_data=x)) for x in ['Да', 'Нет']]
+    [keyboard.add(InlineKeyboardButton(text, callback_data=callback_data('photo', answer)))
+     for text, answer in [('Да', 'yes'), ('Нет', 'no')]]
 
     bot.send_message(chat_id=message.chat.id, text='Фотографии отелей нужны?', reply_markup=keyboard)
 
 
-@bot.callback_query_handler(func=lambda call: call.message.text == 'Фотографии отелей нужны?')
+@router.route('photo', func=dialog_machine.in_state(NEED_PHOTOS))
 @logger.catch
-def set_photo_needed(call: CallbackQuery) -> None:
+def set_photo_needed(call: CallbackQuery, answer: str) -> None:
     """
     Функция обрабатывает ответ пользователя о необходимости вывода
     фотографий отелей и в зависимости от этого выбирает следующее
@@ -456,17 +500,20 @@ def set_photo_needed(call: CallbackQuery) -> None:
 
     Args:
         call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        answer (str): Принимает ответ yes (Да) или no (Нет)
     """
 
     logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
                                                                     btn=call.data))
 
     bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.id)
-    if call.data == 'Да':
+    if answer == 'yes':
         set_needed_photo(user_id=call.message.chat.id, user_needed_photo=True)
+        dialog_machine.move(chat_id=call.message.chat.id, state=PHOTOS_COUNT)
         numbers_of_photo(call.message)
     else:
         set_needed_photo(user_id=call.message.chat.id, user_needed_photo=False)
+        dialog_machine.move(chat_id=call.message.chat.id, state=None)
         resulting_function(call.message)
 
 
@@ -481,9 +528,28 @@ def numbers_of_photo(message: Message) -> None:
     """
 
     bot.send_message(chat_id=message.chat.id, text='Сколько фотографий выводить по каждому отелю?')
-    bot.register_next_step_handler(message=message, callback=resulting_function)
 
 
+def report_failed_sends(chat_id: int, futures: list[Future]) -> None:
+    """
+    Функция, которая сообщает пользователю, что часть результатов поиска не отправлена
+    (ошибки запросов записывает в лог очередь отправки). Вызывается в потоке отправки,
+    когда отправлено завершающее сообщение, поэтому сама не ждёт отправки.
+
+    Args:
+        chat_id (int): Принимает id чата
+        futures (list): Принимает результаты отправки карточек отелей и завершающего сообщения
+    """
+
+    # Запросы чата выполняются по порядку: остальные результаты уже готовы или вот-вот будут записаны
+    wait(futures, timeout=1)
+    failed = sum(1 for future in futures if future.done() and future.exception() is not None)
+    if failed:
+        logger.warning('Не отправлено сообщений с результатами поиска в чат {}: {}'.format(chat_id, failed))
+        bot.send_message(chat_id=chat_id, text=PARTIAL_RESULT, priority=BULK)
+
+
+@bot.message_handler(func=dialog_machine.in_state(PHOTOS_COUNT), content_types=['text'])
 @logger.catch
 def resulting_function(message: Message) -> None:
     """
@@ -503,91 +569,73 @@ def resulting_function(message: Message) -> None:
         if not message.text.isalpha():
             set_photos_count(user_id=message.chat.id,
                              user_photos_count=abs(int(re.search(r'\d+', message.text).group())))
+            dialog_machine.move(chat_id=message.chat.id, state=None)
         else:
+            dialog_machine.finish(chat_id=message.chat.id)
             bot.send_message(chat_id=message.chat.id, text='Ошибка! Не вижу цифр!\nМожет попробуешь заново?  /help')
             raise ValueError('Ошибка кол-ва фото! Пользователь не ввёл цифры.')
 
     temp = bot.send_message(chat_id=message.chat.id, text='Выполняю поиск...')
 
-    with db:
-        date_in = User.get(User.user_id == message.chat.id).date_out
-        date_out = User.get(User.user_id == message.chat.id).date_in
-
-    total_days = date_out - date_in
-    hotels_glossary, search_link = get_hotels(user_id=message.chat.id)
+    # Параметры поиска читаются из БД один раз на весь вывод
+    user_data = get_user_data(user_id=message.chat.id)
+    snapshot = CardSnapshot.from_user_data(user_data)
+    hotels_glossary, search_link = get_hotels(user_id=message.chat.id, user_data=user_data)
 
     if hotels_glossary:
-        bot.edit_message_text(chat_id=message.chat.id,
-                              message_id=temp.id, text='УРА!!!\nКажется, я кое-что нашёл для тебя. Вывожу...')
-        for index, hotels in enumerate(hotels_glossary.values()):
-            if index + 1 > get_hotels_count(user_id=message.chat.id):
-                break
-            cost, curr_value = hotels['price'].replace(',', '').split()
-            output_text = ("""
-\n\n{e_hotel} <b>{name} </b>
-\n{e_star} Категория отеля:  <b>{stars}</b>
-\n\n{e_address} <a href='{address_link}'>{address}</a>
-\n\n{e_dist} Ближайшие ориентиры: <b>{distance}</b>
-\n\n{e_price} Цена за ночь:  <b>{price}</b>
-\n{e_total} Общая сумма за <b>{total_days}</b> {night}:  <b>{total_price} {curr_value}</b>
-\n\n{e_link} <a href='{link}'>Подробнее на hotels.com</a>""".format(
-                name=hotels['name'],
-                stars=star_rating(rating=hotels['stars']),
-                address=get_address(hotels=hotels),
-                distance=get_landmarks(hotels=hotels),
-                price=hotels['price'].replace(',', ''),
-                total_days=abs(total_days.days),
-                night=night_declension(days=abs(total_days.days)),
-                total_price=int(cost) * abs(total_days.days),
-                curr_value=curr_value,
-                e_hotel=emoji['hotel'],
-                e_star=emoji['star'],
-                e_address=emoji['address'],
-                e_dist=emoji['landmarks'],
-                e_price=emoji['price'],
-                e_total=emoji['total_price'],
-                e_link=emoji['link'],
-                link='https://hotels.com/ho' + str(hotels['id']),
-                address_link='https://google.com/maps/place/' + hotels['coordinate']
-                )
-            )
-
-            if get_needed_photo(user_id=message.chat.id):
-                photos = get_photos(user_id=message.chat.id, hotel_id=int(hotels['id']), text=output_text)
-                for size in ['z', 'y', 'd', 'n', '_']:
-                    try:
-                        bot.send_media_group(chat_id=message.chat.id, media=photos)
-                        break
-                    except telebot.apihelper.ApiTelegramException:
-                        photos = [InputMediaPhoto(caption=obj.caption,
-                                                  media=obj.media[:-5] + f'{size}.jpg',
-                                                  parse_mode=obj.parse_mode)
-                                  for obj in photos]
-            else:
-                bot.send_message(chat_id=message.chat.id,
-                                 text=output_text,
-                                 parse_mode='HTML',
-                                 disable_web_page_preview=True
-                                 )
-        bot.send_message(chat_id=message.chat.id,
-                         text=("""
-Не подошли эти варианты?  Почемууу? {ask}
-
-Ладно, шучу\\. {smile}
-Ещё больше отелей по твоему запросу [смотри здесь]({link})
-
-Хочешь заново?  /help""").format(ask=emoji['ask'],
-                                 smile=emoji['smile'],
-                                 link=search_link),
-                         parse_mode='MarkdownV2',
-                         disable_web_page_preview=True
-                         )
+        cards = render_cards(snapshot=snapshot, hotels_list=hotels_glossary.values())
+        progress = EditThrottle()
+        progress_text = search_progress(sent=0, total=len(cards))
+        if progress.ready(progress_text, force=True):
+            bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=progress_text)
+
+        # Фотографии всех отелей запрашиваются одновременно, а каждый отель отправляется, как только
+        # готовы его фотографии и выведены предыдущие отели (порядок отелей сохраняется)
+        lookups = [photo_lookup_executor.submit(get_photos, user_id=message.chat.id, hotel_id=int(hotels['id']),
+                                                text=output_text, user_data=user_data) if snapshot.needed_photo
+                   else None for hotels, output_text in cards]
+
+        # Карточки отелей и завершающее сообщение отправляются без ожидания (BULK),
+        # их результаты проверяются после отправки завершающего сообщения (см. report_failed_sends)
+        sends = list()
+
+        for sent, ((hotels, output_text), lookup) in enumerate(zip(cards, lookups), start=1):
+            photos = lookup.result() if lookup else None
+            if photos:
+                try:
+                    messages = bot.send_media_group(chat_id=message.chat.id, media=photos, priority=BULK).result()
+                except telebot.apihelper.ApiTelegramException as error:
+                    # Альбом всё же отклонён: file_id и выбор размеров забываются, отель выводится без фотографий
+                    logger.warning('Telegram отклонил фотографии отеля {}: {}'.format(hotels['id'], error))
+                    forget_photo_files(media=photos)
+                    photos = None
+                else:
+                    save_photo_files(media=photos, messages=messages)
+            if not photos:
+                sends.append(bot.send_message(chat_id=message.chat.id,
+                                              text=output_text,
+                                              parse_mode='HTML',
+                                              disable_web_page_preview=True,
+                                              priority=BULK
+                                              ))
+
+            # Ход вывода меняется не чаще раза в PROGRESS_EDIT_INTERVAL секунд (последнее изменение - всегда)
+            progress_text = search_progress(sent=sent, total=len(cards))
+            if progress.ready(progress_text, force=sent == len(cards)):
+                bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=progress_text,
+                                      priority=BULK)
+        footer = bot.send_message(chat_id=message.chat.id,
+                                  text=search_footer(search_link=search_link),
+                                  parse_mode='MarkdownV2',
+                                  disable_web_page_preview=True,
+                                  priority=BULK
+                                  )
+        sends.append(footer)
+        footer.add_done_callback(lambda future: report_failed_sends(chat_id=message.chat.id, futures=sends))
     else:
         bot.edit_message_text(chat_id=message.chat.id,
                               message_id=temp.id,
-                              text=("""
-К сожалению, я ничего подходящего не нашёл {sad}...
-Может попробуешь заново?  /help""").format(sad=emoji['sadness']),
+                              text=NOTHING_FOUND,
                               parse_mode='HTML'
                               )
 
@@ -617,29 +665,66 @@ def get_text_messages(message: Message) -> None:
                          )
 
 
-@bot.callback_query_handler(func=lambda call: call.message.text == 'Какую историю выводить?')
+@bot.inline_handler(func=lambda query: True)
+@logger.catch
+def inline_query(query: InlineQuery) -> None:
+    """
+    Функция, которая отвечает на inline-запрос ("@бот Париж") отелями и вариантами
+    городов из кэшей inline-режима (inline.py).
+
+    Args:
+        query (InlineQuery): Принимает объект inline-запроса от Telegram
+    """
+
+    bot.answer_inline_query(inline_query_id=query.id, results=inline_search.answer(query.query),
+                            cache_time=INLINE_CACHE_TIME)
+
+
+@router.route('hist')
 @logger.catch
-def create_history(call: CallbackQuery) -> None:
+def create_history(call: CallbackQuery, within: str) -> None:
     """
     Функция обрабатывает ответ пользователя о выводе истории
     и вызывает функцию показа истории с соответствующими параметрами.
 
     Args:
         call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        within (str): Принимает значения last(последний), day(день), week(неделя)
     """
 
     logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
                                                                     btn=call.data))
 
-    match call.data:
-        case 'history_last':
+    match within:
+        case 'last':
             show_history(message=call.message, text='Последний поиск:', within='last')
-        case 'history_day':
+        case 'day':
             show_history(message=call.message, text='История за последний день:', within='day')
-        case 'history_week':
+        case 'week':
             show_history(message=call.message, text='История за последнюю неделю:', within='week')
 
 
+@router.route('hmore')
+@logger.catch
+def more_history(call: CallbackQuery, within: str, timestamp: str, last_id: str) -> None:
+    """
+    Функция-обработчик нажатия на кнопку "Ещё" под страницей истории.
+    Убирает кнопку с предыдущей страницы и выводит следующую страницу.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        within (str): Принимает значения last(последний), day(день), week(неделя)
+        timestamp (str): Принимает timestamp последней выведенной записи
+        last_id (str): Принимает id последней выведенной записи
+    """
+
+    logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
+                                                                    btn=call.data))
+
+    bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id)
+    send_history_page(chat_id=call.message.chat.id, within=within, cursor=(int(timestamp), int(last_id)))
+
+
 @logger.catch
 def show_history(message: Message, text: str, within: str) -> None:
     """
@@ -653,37 +738,140 @@ def show_history(message: Message, text: str, within: str) -> None:
     """
 
     bot.edit_message_text(chat_id=message.chat.id, message_id=message.message_id, text=text)
+    send_history_page(chat_id=message.chat.id, within=within)
 
-    # Получаем историю из БД
-    histories = get_history(user_id=message.chat.id, within=within)
-
-    # Выводим историю
-    if histories:
-        for record in histories:
-            output_text = ("""
-Дата:  <b>{dt}</b>
-Команда:  <b>{cmd}</b>
-Город:  <b>{req}</b>
-
-Найденные отели:
-<b>{ans}</b>""").format(dt=record['date'],
-                        cmd=record['commands'],
-                        req=record['requests'],
-                        ans='\n'.join(json.loads(record['answers']))
-                        )
-
-            bot.send_message(chat_id=message.chat.id, text=output_text,
-                             parse_mode='HTML', disable_web_page_preview=True)
-        else:
-            bot.send_message(chat_id=message.chat.id,
-                             text='Хочешь продолжить?  /help',
-                             parse_mode='HTML',
-                             disable_web_page_preview=True
-                             )
+
+@logger.catch
+def send_history_page(chat_id: int, within: str, cursor: tuple | None = None) -> None:
+    """
+    Функция, которая выводит одну страницу истории одним сообщением.
+    Если записей больше, чем помещается на страницу, то под сообщением
+    выводится кнопка "Ещё" с курсором следующей страницы.
+
+    Args:
+        chat_id (int): Принимает id чата пользователя
+        within (str): Принимает значения last(последний), day(день), week(неделя),
+                        за которые нужно выводить историю
+        cursor (tuple | None): Курсор (timestamp, id) последней выведенной записи
+    """
+
+    # Получаем страницу истории из БД
+    histories, next_cursor = get_history_page(user_id=chat_id, within=within, cursor=cursor)
+
+    if not histories:
+        bot.send_message(chat_id=chat_id,
+                         text='Поисков пока не было.\n\nХочешь продолжить?  /help' if cursor is None
+                         else 'Больше поисков не было.\n\nХочешь продолжить?  /help')
+        return
+
+    output_text = history_page(histories=histories)
+
+    if next_cursor:
+        markup = InlineKeyboardMarkup(keyboard=[[InlineKeyboardButton(
+            text='Ещё',
+            callback_data=callback_data('hmore', within, *next_cursor)
+        )]])
     else:
-        bot.send_message(chat_id=message.chat.id,
-                         text='Поисков пока не было.\n\nХочешь продолжить?  /help')
+        markup = None
+        output_text += '\n\nХочешь продолжить?  /help'
+
+    bot.send_message(chat_id=chat_id, text=output_text, parse_mode='HTML',
+                     disable_web_page_preview=True, reply_markup=markup)
+
+
+def check_connection() -> None:
+    """
+    Функция, которая проверяет подключение к Telegram Bot API (getMe) и выводит данные бота в лог.
+    Выполняется в фоновом потоке и не задерживает получение обновлений.
+    """
+
+    try:
+        bot_info = bot.get_me()
+    except Exception as error:
+        logger.error('Ошибка подключения к Telegram Bot API: {}'.format(error))
+        return
+
+    logger.info((f"""
+    ID бота: {bot_info.id}, 
+    Название бота: {bot_info.first_name}, 
+    Пользователь: {bot_info.username}, 
+    Подключение: {bot_info.is_bot}"""))
+
+
+def create_app() -> QueuedTeleBot:
+    """
+    Фабрика приложения: подготавливает бота к работе и возвращает его.
+    Проверка подключения к Telegram выполняется в фоне, а таблицы БД
+    проверяются, только если изменилась схема (см. init_db).
+    Шаги остановки бота добавляются в shutdown.
+
+    Returns (QueuedTeleBot): объект бота
+    """
+
+    bot.send_queue.start()
+    threading.Thread(target=check_connection, name='CheckConnection', daemon=True).start()
+
+    # Инициализируем БД
+    init_db()
+
+    # Кэши, сохранённые при предыдущей остановке бота
+    loaded = load_snapshot()
+    if loaded:
+        logger.info('Загружен снимок кэшей: записей - {}'.format(loaded))
+
+    # Запускаем периодическую очистку истории поиска
+    # (при нескольких процессах бота, см. supervisor.py, - только в одном из них)
+    if WORKER_INDEX == 0:
+        retention = RetentionScheduler()
+        retention.start()
+        shutdown.add(STOP_INTAKE, 'очистка истории', lambda remaining: retention.stop())
+
+    # Статистика запросов к БД выводится в лог по сигналу SIGUSR1 (kill -USR1 <pid бота>)
+    install_dump_signal()
+
+    # Метрики: время обработчиков и попадания в кэши (сервер метрик запускается, если задан METRICS_PORT)
+    metrics.instrument_handlers(bot, router)
+    metrics.register_bot_caches()
+    metrics_server = metrics.start_server()
+    if metrics_server is not None:
+        shutdown.add(SAVE, 'сервер метрик', lambda remaining: metrics_server.stop())
+
+    shutdown.add(STOP_INTAKE, 'приём обновлений', lambda remaining: dispatcher.stop_intake())
+    shutdown.add(DRAIN, 'обработка обновлений', dispatcher.stop)
+    shutdown.add(FLUSH, 'очередь отправки', bot.send_queue.drain)
+    shutdown.add(FLUSH, 'поиск фотографий',
+                 lambda remaining: photo_lookup_executor.shutdown(wait=False, cancel_futures=True))
+    shutdown.add(SAVE, 'снимок кэшей', lambda remaining: logger.info('Записей в снимке кэшей: {}'.format(
+        save_snapshot())))
+
+    return bot
+
+
+def main() -> None:
+    """
+    Главная функция бота: подготавливает бота и запускает получение
+    обновлений (long polling или webhook, см. BOT_MODE) до сигнала остановки.
+    """
+
+    logger.add('Log/debug.log', encoding='utf-8')
+    create_app()
+    shutdown.install()
+
+    logger.info('Бот в работе')
+    try:
+        if BOT_MODE == 'webhook':
+            # Модуль HTTP-сервера загружается только в режиме webhook
+            from webhook import run_webhook
+            run_webhook(bot, dispatcher)
+        else:
+            # getUpdates не работает, пока в Telegram зарегистрирован webhook
+            bot.remove_webhook()
+            dispatcher.infinity_polling()
+    except ShutdownRequested:
+        pass
+    finally:
+        shutdown.run()
 
 
-logger.info('Бот в работе')
-bot.infinity_polling()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1048 @@
+"""
+Асинхронный скрипт бота besthoteloffers_bot_async.py
+Содержит ту же логику работы бота, что и besthoteloffers_bot.py, но на
+асинхронном AsyncTeleBot: обработчики - корутины, запросы к Hotels API
+выполняются асинхронным клиентом (commands/async_recurring.py), а работа
+с БД - в небольшом пуле потоков. Один процесс обслуживает тысячи диалогов
+одновременно без тысяч потоков.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import functools
+import hmac
+import re
+import signal
+from typing import Any, Callable
+
+from aiohttp import web
+from telebot import asyncio_filters, asyncio_helper
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import (Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, InlineQuery,
+                           Update)
+
+from async_sender import AsyncQueuedTeleBot
+from bot_db_pw import *
+from commands.async_recurring import HotelsClient
+from commands.calendar import MyStyleCalendar, STEPS
+from config import (BOT_TOKEN, BOT_MODE, DB_EXECUTOR_WORKERS, NETWORK_EXECUTOR_WORKERS, WEBHOOK_LISTEN, WEBHOOK_PORT,
+                    WEBHOOK_PATH, WEBHOOK_URL, WORKER_INDEX, INLINE_CACHE_TIME, SHUTDOWN_TIMEOUT, TELEGRAM_API_URL)
+from dialog import CITY, PRICE_RANGE, DISTANCE_RANGE, HOTELS_COUNT, PHOTOS_COUNT, AsyncStateStorage, update_scope
+from inline import inline_search
+import metrics
+from router import CallbackRouter, callback_data
+from messages import (NOTHING_FOUND, NO_CITIES_FOUND, CardSnapshot, render_cards, search_progress, search_footer,
+                      history_page)
+from photo_sizes import negotiator
+from query_log import install_dump_signal
+from sender import EditThrottle, BULK
+from settings import emoji
+from shutdown import SHUTDOWN_SIGNALS, load_snapshot, save_snapshot
+from webhook import with_secret
+
+# Подключение к Telegram Bot API.
+# Шаги диалога поиска хранятся в состояниях пользователя (вместо register_next_step_handler)
+# в том же хранилище, что и у синхронного бота (dialog_machine, см. DIALOG_STORE в config.py).
+# Сообщения отправляются через очередь отправки с лимитами Telegram (async_sender.py)
+asyncio_helper.API_URL = TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+bot = AsyncQueuedTeleBot(BOT_TOKEN, state_storage=AsyncStateStorage(store=dialog_machine.store))
+
+# Нажатия на InLine кнопки передаются обработчикам по префиксу callback_data (router.py)
+router = CallbackRouter()
+router.register(bot)
+bot.add_custom_filter(asyncio_filters.StateFilter(bot))
+
+# Асинхронный клиент Hotels API
+hotels_client = HotelsClient()
+
+# Пул потоков для работы с БД: функции bot_db_pw синхронные и не должны блокировать цикл событий
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+
+# Пул потоков для синхронных сетевых запросов (inline-режим, HEAD-запросы к фотографиям):
+# медленные ответы внешних сервисов не должны занимать потоки работы с БД
+network_executor = ThreadPoolExecutor(max_workers=NETWORK_EXECUTOR_WORKERS, thread_name_prefix='network')
+
+# Фоновые задачи (ссылки хранятся, чтобы задачи не были удалены сборщиком мусора до завершения)
+background_tasks: set[asyncio.Task] = set()
+
+# Задачи обработки обновлений: при остановке бот ждёт их завершения (см. shutdown_app)
+update_tasks: set[asyncio.Task] = set()
+
+# Событие остановки бота (сигнал SIGTERM или SIGINT) и update_id, начиная с которого
+# обновления ещё не переданы обработчикам (режим long polling)
+shutdown_event = asyncio.Event()
+polling_offset: int | None = None
+
+# Периодическая очистка истории поиска (запускается в create_app)
+retention: RetentionScheduler | None = None
+
+# Сервер метрик (запускается в create_app, если задан METRICS_PORT)
+metrics_server: metrics.MetricsServer | None = None
+
+# Длина очереди отправки сообщений в метриках (metrics.py)
+metrics.registry.callback('telegram_send_queued', 'Кол-во запросов в очереди отправки',
+                          lambda: bot.send_queue.metrics()['queued'])
+
+
+async def run_db(func: Callable, *args, **kwargs) -> Any:
+    """
+    Функция, которая выполняет синхронную функцию работы с БД в пуле потоков db_executor.
+
+    Args:
+        func (Callable): Принимает функцию работы с БД
+
+    Returns (Any): результат функции
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_network(func: Callable, *args, **kwargs) -> Any:
+    """
+    Функция, которая выполняет синхронную функцию с сетевыми запросами в пуле потоков network_executor.
+
+    Args:
+        func (Callable): Принимает функцию с сетевыми запросами
+
+    Returns (Any): результат функции
+    """
+
+    return await asyncio.get_running_loop().run_in_executor(network_executor,
+                                                            functools.partial(func, *args, **kwargs))
+
+
+@bot.message_handler(commands=['start'])
+@logger.catch
+async def command_start(message: Message) -> None:
+    """
+    Функция-обработчик команды /start.
+    Выводит приветственное сообщение, затем вызывает команду /help.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    send_message_first_start = (f"""
+<b>Приветствую  {message.from_user.first_name} {message.from_user.last_name}!
+
+Я - Best Hotel Offers Bot.</b>
+Я умею находить и выводить лучшие отели мира, в любом городе, по твоим запросам.
+А ещё я запоминаю все отели, которые ты искал, и при необходимости могу их вывести.
+
+Итак, давай начнём.""")
+
+    send_message_next_starts = (f"""
+<b>С возвращением  {message.from_user.first_name} {message.from_user.last_name}!</b>
+
+Похоже, ты решил начать заново?
+Что ж, давай начнём.""")
+
+    logger.info('Пользователь: {user_id}  | Команда: "/start"'.format(user_id=message.from_user.id))
+
+    if not await run_db(user_exists, user_id=message.from_user.id):
+        # Добавляем пользователя в БД
+        await run_db(add_user,
+                     user_id=message.from_user.id,
+                     first_name=message.from_user.first_name,
+                     last_name=message.from_user.last_name,
+                     date=message.date)
+
+        # Отправляем первое стартовое сообщение
+        await bot.send_message(chat_id=message.chat.id, text=send_message_first_start, parse_mode='HTML')
+    else:
+        # Отправляем второе стартовое сообщение
+        await bot.send_message(chat_id=message.chat.id, text=send_message_next_starts, parse_mode='HTML')
+
+    await command_help(message=message)
+
+
+@bot.message_handler(commands=['help'])
+@logger.catch
+async def command_help(message: Message) -> None:
+    """
+    Функция-обработчик команды /help.
+    Выводит команды и краткую справку по ним.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    help_text = ("""
+Выбери команду:
+
+/lowprice - топ самых дешёвых отелей
+/highprice - топ самых дорогих отелей
+/bestdeal - лучшие отели по твоим запросам
+
+/history - вывод истории поиска отелей
+/reset - сброс параметров и удаление истории поиска""")
+
+    logger.info('Пользователь: {user_id}  | Команда: "/help"'.format(user_id=message.from_user.id))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+    await bot.send_message(chat_id=message.chat.id, text=help_text, parse_mode='HTML')
+
+
+@bot.message_handler(commands=['reset'])
+@logger.catch
+async def command_reset(message: Message) -> None:
+    """
+    Функция-обработчик команды /reset.
+    Сбрасывает все параметры пользователя и удаляет историю его команд.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Команда: "/reset"'.format(user_id=message.from_user.id))
+
+    await run_db(History.delete_history_data, user_id=message.from_user.id)
+    await run_db(reset_search_data, user_id=message.from_user.id)
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    await bot.send_message(chat_id=message.chat.id,
+                           text='Все параметры сброшены!\nИстория команд удалена!\n\nХочешь продолжить? /help',
+                           parse_mode='HTML',
+                           disable_web_page_preview=True
+                           )
+
+
+@bot.message_handler(commands=['settings'])
+@logger.catch
+async def command_settings(message: Message) -> None:
+    logger.info('Пользователь: {user_id}  | Команда: "/settings"'.format(user_id=message.from_user.id))
+    await bot.send_message(message.chat.id, 'Извини, но данная команда пока в разработке.')
+
+
+@bot.message_handler(commands=['lowprice', 'highprice', 'bestdeal', 'history'])
+@logger.catch
+async def search_commands(message: Message) -> None:
+    """
+    Функция-обработчик команд /lowprice, /highprice, /bestdeal, /history.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Команда: "{cmd}"'.format(user_id=message.from_user.id,
+                                                                     cmd=message.text))
+
+    match message.text:
+        case '/lowprice' | '/highprice' | '/bestdeal':
+            # Новый поиск - это новая сессия поиска с параметрами по умолчанию
+            await run_db(set_searching_function,
+                         user_id=message.from_user.id,
+                         user_searching_function=re.search(r'\w+', message.text).group())
+            await bot.set_state(user_id=message.from_user.id, state=CITY, chat_id=message.chat.id)
+            await bot.send_message(chat_id=message.chat.id, text='В какой город планируем выезд?')
+
+        case '/history':
+            await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+            markup = InlineKeyboardMarkup(keyboard=[
+                [InlineKeyboardButton(text='Последний поиск', callback_data=callback_data('hist', 'last'))],
+                [InlineKeyboardButton(text='За последний день', callback_data=callback_data('hist', 'day'))],
+                [InlineKeyboardButton(text='За последнюю неделю', callback_data=callback_data('hist', 'week'))]
+                ])
+
+            await bot.send_message(message.chat.id, 'Какую историю выводить?', reply_markup=markup)
+
+
+@bot.message_handler(state=CITY)
+@logger.catch
+async def search_city(message: Message) -> None:
+    """
+    Функция поиска города.
+    Выполняет поиск введённого пользователем города и выводит InLine
+    клавиатуру с вариантами найденных городов.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    temp = await bot.send_message(chat_id=message.chat.id, text='Выполняю поиск...', parse_mode='HTML')
+    cities = await hotels_client.search_location(message.text)
+    await run_db(set_cities, user_id=message.from_user.id, cities=cities)
+    keyboard = InlineKeyboardMarkup()
+
+    if not cities:
+        await bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=NO_CITIES_FOUND,
+                                    parse_mode='HTML')
+    else:
+        for city_name, city_id in cities.items():
+            keyboard.add(InlineKeyboardButton(text=city_name, callback_data=callback_data('city', city_id)))
+        await bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text='Куда именно из этих:',
+                                    reply_markup=keyboard)
+
+
+@router.route('city')
+@logger.catch
+async def city_handler(call: CallbackQuery, city_id: str) -> None:
+    """
+    Функция-обработчик нажатия на кнопку нужного города
+    и переход к следующему действию по сценарию.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        city_id (str): Принимает id выбранного города
+    """
+
+    logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
+                                                                    btn=call.data))
+
+    await run_db(set_city_id, user_id=call.message.chat.id, user_city=city_id)
+    await bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.id)
+
+    if await run_db(get_advanced_question_flag, user_id=call.message.chat.id):
+        await ask_for_price_range(call)
+    else:
+        await ask_for_date_in(call.message)
+
+
+@logger.catch
+async def ask_for_price_range(call: CallbackQuery) -> None:
+    """
+    Функция запрашивает диапазон цен у пользователя
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+    """
+
+    currency = await run_db(get_currency, user_id=call.message.chat.id)
+    await bot.set_state(user_id=call.from_user.id, state=PRICE_RANGE, chat_id=call.message.chat.id)
+    await bot.send_message(chat_id=call.message.chat.id,
+                           text="""
+Сколько денег у тебя в кармане? Шучу {smile}.
+
+Укажи диапазон стоимости номера за ночь в ({cur}):
+(Например: "от 1000 до 50000", "1000-50000", "1000 50000")""".format(cur=currency, smile=emoji['smile']),
+                           parse_mode='HTML')
+
+
+@bot.message_handler(state=PRICE_RANGE)
+@logger.catch
+async def ask_for_distance_range(message: Message) -> None:
+    """
+    Функция обрабатывает введённый пользователем диапазон цен и
+    запрашивает максимальное расстояние, на котором находится отель от центра.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    price_range = list(set(map(int, map(lambda string: string.replace(',', '.'),
+                                        re.findall(r'\d+[.,\d+]?\d?', message.text)))))
+    if len(price_range) != 2:
+        await bot.send_message(chat_id=message.chat.id, text='Ошибка диапазона!\nМожет попробуешь заново?  /help')
+        raise ValueError('Ошибка диапазона!')
+
+    await run_db(set_price_range, user_id=message.chat.id, price_range=price_range)
+    await bot.set_state(user_id=message.from_user.id, state=DISTANCE_RANGE, chat_id=message.chat.id)
+    await bot.send_message(chat_id=message.chat.id,
+                           text="""
+Как далеко (в км) от центра должен находится отель?:
+(Например: "от 1 до 3", "1-3", "1 3")""",
+                           parse_mode='HTML')
+
+
+@bot.message_handler(state=DISTANCE_RANGE)
+@logger.catch
+async def set_distance(message: Message) -> None:
+    """
+    Функция обрабатывает введённое пользователем расстояние до центра
+    и переходит к выбору даты заезда.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    distance_range = list(set(map(float, map(lambda string: string.replace(',', '.'),
+                                             re.findall(r'\d+[.,\d+]?\d?', message.text)))))
+    if len(distance_range) != 2:
+        await bot.send_message(chat_id=message.chat.id, text='Ошибка расстояния!\nМожет попробуешь заново?  /help')
+        raise ValueError('Ошибка расстояния!')
+
+    await run_db(set_distance_range, user_id=message.chat.id, dist_range=distance_range)
+    await ask_for_date_in(message)
+
+
+@logger.catch
+async def ask_for_date_in(message: Message) -> None:
+    """
+    Функция создаёт календарь для даты заезда в отель и запрашивает год даты.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    # Сбрасываем даты заезда и выезда в БД
+    await run_db(update_dates, user_id=message.chat.id, date_in=None, date_out=None)
+
+    # Создаём и выводим календарь для выбора года заезда
+    calendar, step = MyStyleCalendar(calendar_id=1, locale='ru', min_date=date.today()).build()
+    await bot.send_message(chat_id=message.chat.id, text=f'Выберите {STEPS[step]} заезда', reply_markup=calendar)
+
+
+@logger.catch
+async def ask_for_date_out(message: Message, min_date: date) -> None:
+    """
+    Функция создаёт календарь для даты выезда из отеля и запрашивает год даты.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+        min_date (date): Принимает дату заезда (минимальную дату выезда)
+    """
+
+    # Создаём и выводим календарь для выбора года выезда
+    calendar, step = MyStyleCalendar(calendar_id=2, locale='ru', min_date=min_date).build()
+
+    await bot.send_message(chat_id=message.chat.id, text=f'Выберите {STEPS[step]} выезда', reply_markup=calendar)
+
+
+@router.route(MyStyleCalendar.prefix(calendar_id=1))
+@logger.catch
+async def set_date_in(call: CallbackQuery, min_date: str, call_data: str) -> None:
+    """
+    Функция - обработчик нажатий на кнопки календаря.
+    Запрашивает месяц и день даты заезда, записывает дату заезда в БД
+    и вызывает функцию создания календаря для даты выезда из отеля.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        min_date (str): Принимает минимальную дату календаря из данных кнопки
+        call_data (str): Принимает данные нажатой кнопки календаря
+    """
+
+    # Выводим календарь для выбора месяца и дня заезда (клавиатура берётся из кэша календаря).
+    # Дата заезда не может быть раньше сегодняшней, даже если календарь построен раньше
+    min_date = max(MyStyleCalendar.decode_date(min_date), date.today())
+    result, key, step = MyStyleCalendar(calendar_id=1, locale='ru', min_date=min_date).process(call_data=call_data)
+    if result and result < min_date:
+        # Календарь построен раньше (например, вчера): день уже недоступен, календарь остаётся на экране
+        await bot.answer_callback_query(callback_query_id=call.id,
+                                        text='Дата заезда не может быть раньше {}'.format(min_date))
+        return
+
+    if not result and key:
+        await bot.edit_message_text(text=f'Выберите {STEPS[step]} заезда',
+                                    chat_id=call.message.chat.id,
+                                    message_id=call.message.message_id,
+                                    reply_markup=key)
+    elif result:
+        logger.info('Пользователь: {user_id}  | Дата заезда: "{date}"'.format(user_id=call.message.chat.id,
+                                                                              date=result))
+        await bot.edit_message_text(text=f'Выбрана дата заезда:  {result}',
+                                    chat_id=call.message.chat.id,
+                                    message_id=call.message.message_id
+                                    )
+
+        # Записываем дату заезда в БД и запрашиваем год выезда
+        await run_db(update_dates, user_id=call.from_user.id, date_in=result)
+
+        await ask_for_date_out(call.message, min_date=result)
+
+
+@router.route(MyStyleCalendar.prefix(calendar_id=2))
+@logger.catch
+async def set_date_out(call: CallbackQuery, min_date: str, call_data: str) -> None:
+    """
+    Функция - обработчик нажатий на кнопки календаря.
+    Запрашивает месяц и день даты выезда, записывает дату выезда в БД
+    и вызывает функцию запроса кол-ва отелей.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        min_date (str): Принимает минимальную дату календаря (дату заезда) из данных кнопки
+        call_data (str): Принимает данные нажатой кнопки календаря
+    """
+
+    # Выводим календарь для выбора месяца и дня выезда: дата заезда передаётся в данных кнопки,
+    # поэтому переходы по календарю не читают БД (дата заезда из БД проверяется только при выборе дня)
+    min_date = MyStyleCalendar.decode_date(min_date)
+    result, key, step = MyStyleCalendar(calendar_id=2, locale='ru', min_date=min_date).process(call_data=call_data)
+    date_in = (await run_db(get_dates, user_id=call.from_user.id))[0] if result else None
+    if result and result < date_in:
+        await bot.answer_callback_query(callback_query_id=call.id,
+                                        text='Дата выезда не может быть раньше даты заезда ({})'.format(date_in))
+        return
+
+    if not result and key:
+        await bot.edit_message_text(text=f'Выберите {STEPS[step]} выезда',
+                                    chat_id=call.message.chat.id,
+                                    message_id=call.message.message_id,
+                                    reply_markup=key)
+    elif result:
+        logger.info('Пользователь: {user_id}  | Дата выезда: "{date}"'.format(user_id=call.message.chat.id,
+                                                                              date=result))
+        await bot.edit_message_text(text=f'Выбрана дата выезда:  {result}',
+                                    chat_id=call.message.chat.id,
+                                    message_id=call.message.message_id
+                                    )
+
+        # Записываем дату выезда в БД и запрашиваем кол-во отелей
+        await run_db(update_dates, user_id=call.from_user.id, date_out=result)
+
+        await bot.set_state(user_id=call.from_user.id, state=HOTELS_COUNT, chat_id=call.message.chat.id)
+        await bot.send_message(chat_id=call.message.chat.id, text='Сколько отелей вывести?\n(в цифрах, но не более 10)')
+
+
+@bot.message_handler(state=HOTELS_COUNT)
+@logger.catch
+async def photo_needed(message: Message) -> None:
+    """
+    Функция запрашивает необходимость вывода фотографий отелей в виде InLine клавиатуры.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    if not message.text.isalpha():
+        user_hotels_count = abs(int(re.search(r'\d+', message.text).group()))
+        if user_hotels_count > 10:
+            await bot.send_message(chat_id=message.chat.id,
+                                   text='Ошибка! Кол-во больше 10!\nМожет попробуешь заново?  /help')
+            raise ValueError('Ошибка! Пользователь ввёл цифру больше 10.')
+        else:
+            await run_db(set_hotels_count, user_id=message.chat.id, user_hotels_count=user_hotels_count)
+    else:
+        await bot.send_message(chat_id=message.chat.id, text='Ошибка! Не вижу цифр!\nМожет попробуешь заново?  /help')
+        raise ValueError('Ошибка кол-ва отелей! Пользователь не ввёл цифры.')
+
+    keyboard = InlineKeyboardMarkup()
+    [keyboard.add(InlineKeyboardButton(text, callback_data=callback_data('photo', answer)))
+     for text, answer in [('Да', 'yes'), ('Нет', 'no')]]
+
+    await bot.send_message(chat_id=message.chat.id, text='Фотографии отелей нужны?', reply_markup=keyboard)
+
+
+@router.route('photo')
+@logger.catch
+async def set_photo_needed(call: CallbackQuery, answer: str) -> None:
+    """
+    Функция обрабатывает ответ пользователя о необходимости вывода
+    фотографий отелей и в зависимости от этого выбирает следующее
+    действию по сценарию.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        answer (str): Принимает ответ yes (Да) или no (Нет)
+    """
+
+    logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
+                                                                    btn=call.data))
+
+    await bot.delete_message(chat_id=call.message.chat.id, message_id=call.message.id)
+    if answer == 'yes':
+        await run_db(set_needed_photo, user_id=call.message.chat.id, user_needed_photo=True)
+        await bot.set_state(user_id=call.from_user.id, state=PHOTOS_COUNT, chat_id=call.message.chat.id)
+        await bot.send_message(chat_id=call.message.chat.id, text='Сколько фотографий выводить по каждому отелю?')
+    else:
+        await run_db(set_needed_photo, user_id=call.message.chat.id, user_needed_photo=False)
+        await resulting_function(call.message)
+
+
+@bot.message_handler(state=PHOTOS_COUNT)
+@logger.catch
+async def set_photos(message: Message) -> None:
+    """
+    Функция обрабатывает кол-во фотографий отелей и выполняет поиск отелей.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    await bot.delete_state(user_id=message.from_user.id, chat_id=message.chat.id)
+
+    if message.text.isalpha():
+        await bot.send_message(chat_id=message.chat.id, text='Ошибка! Не вижу цифр!\nМожет попробуешь заново?  /help')
+        raise ValueError('Ошибка кол-ва фото! Пользователь не ввёл цифры.')
+
+    await run_db(set_photos_count, user_id=message.chat.id,
+                 user_photos_count=abs(int(re.search(r'\d+', message.text).group())))
+    await resulting_function(message)
+
+
+async def hotel_media(user_data: dict, hotels: dict, text: str) -> list | None:
+    """
+    Функция, которая запрашивает фотографии отеля и формирует из них альбом (см. photos_media).
+
+    Args:
+        user_data (dict): Принимает данные пользователя и его текущего поиска
+        hotels (dict): Принимает данные отеля
+        text (str): Принимает описание отеля (подпись к первой фотографии)
+
+    Returns (list | None): альбом фотографий отеля или None, если фотографий нет
+    """
+
+    photos = await hotels_client.search_photos(user_data, int(hotels['id']))
+    if not photos:
+        return None
+
+    # file_id уже отправленных фотографий читаются в пуле потоков БД,
+    # а размеры остальных выбираются HEAD-запросами в пуле сетевых запросов
+    templates = [photo['baseUrl'] for photo in photos]
+    file_ids = await run_db(get_photo_files, templates=templates)
+    sizes = await run_network(negotiator.sizes, [template for template in templates if template not in file_ids])
+
+    return album_media(templates=templates, file_ids=file_ids, sizes=sizes, text=text)
+
+
+@logger.catch
+async def resulting_function(message: Message) -> None:
+    """
+    Результирующая функция, которая выполняет поиск отелей, формирует
+    и отправляет результат пользователю в Telegram.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    temp = await bot.send_message(chat_id=message.chat.id, text='Выполняю поиск...')
+
+    user_data = await run_db(get_user_data, user_id=message.chat.id)
+    snapshot = CardSnapshot.from_user_data(user_data)
+
+    hotels_data = await hotels_client.search_hotels(user_data)
+    hotels_glossary, search_link = await run_db(save_search, user_id=message.chat.id, user_data=user_data,
+                                                hotels_data=hotels_data)
+
+    if not hotels_glossary:
+        await bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=NOTHING_FOUND,
+                                    parse_mode='HTML')
+        return
+
+    cards = render_cards(snapshot=snapshot, hotels_list=hotels_glossary.values())
+    progress = EditThrottle()
+    progress_text = search_progress(sent=0, total=len(cards))
+    if progress.ready(progress_text, force=True):
+        await bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=progress_text)
+
+    # Фотографии всех отелей запрашиваются одновременно, а каждый отель отправляется, как только
+    # готовы его фотографии и выведены предыдущие отели (порядок отелей сохраняется)
+    lookups = [asyncio.create_task(hotel_media(user_data, hotels, output_text)) if snapshot.needed_photo else None
+               for hotels, output_text in cards]
+
+    for sent, ((hotels, output_text), lookup) in enumerate(zip(cards, lookups), start=1):
+        media = await lookup if lookup else None
+        if media:
+            try:
+                messages = await bot.send_media_group(chat_id=message.chat.id, media=media, priority=BULK)
+            except ApiTelegramException as error:
+                # Альбом всё же отклонён: file_id и выбор размеров забываются, отель выводится без фотографий
+                logger.warning('Telegram отклонил фотографии отеля {}: {}'.format(hotels['id'], error))
+                await run_db(forget_photo_files, media=media)
+                media = None
+            else:
+                await run_db(save_photo_files, media=media, messages=messages)
+        if not media:
+            await bot.send_message(chat_id=message.chat.id,
+                                   text=output_text,
+                                   parse_mode='HTML',
+                                   disable_web_page_preview=True,
+                                   priority=BULK
+                                   )
+
+        # Ход вывода меняется не чаще раза в PROGRESS_EDIT_INTERVAL секунд (последнее изменение - всегда)
+        progress_text = search_progress(sent=sent, total=len(cards))
+        if progress.ready(progress_text, force=sent == len(cards)):
+            await bot.edit_message_text(chat_id=message.chat.id, message_id=temp.id, text=progress_text,
+                                        priority=BULK)
+
+    await bot.send_message(chat_id=message.chat.id,
+                           text=search_footer(search_link=search_link),
+                           parse_mode='MarkdownV2',
+                           disable_web_page_preview=True,
+                           priority=BULK
+                           )
+
+
+@bot.message_handler(content_types=['text'])
+@logger.catch
+async def get_text_messages(message: Message) -> None:
+    """
+    Функция get_text_message, выполняет различные действия в зависимости
+    от сообщения пользователя.
+
+    Args:
+        message (Message): Принимает объект-сообщение от Telegram
+    """
+
+    logger.info('Пользователь: {user_id}  | Сообщение: "{msg}"'.format(user_id=message.chat.id,
+                                                                       msg=message.text))
+
+    if message.text.lower() == 'привет':
+        await bot.send_message(chat_id=message.chat.id, text='Привет! 👋\nНужна помощь?  /help')
+    else:
+        await bot.send_message(chat_id=message.chat.id,
+                               text="""
+Я тебя не понял. 🤷
+Может попробуешь заново?  /help
+Или введи команду\\."""
+                               )
+
+
+@bot.inline_handler(func=lambda query: True)
+@logger.catch
+async def inline_query(query: InlineQuery) -> None:
+    """
+    Функция, которая отвечает на inline-запрос ("@бот Париж") отелями и вариантами
+    городов из кэшей inline-режима (inline.py).
+
+    Args:
+        query (InlineQuery): Принимает объект inline-запроса от Telegram
+    """
+
+    # Ответ из кэша формируется сразу, иначе запросы к Hotels API выполняются в пуле сетевых запросов
+    results = inline_search.cached(query.query)
+    if results is None:
+        results = await run_network(inline_search.answer, query.query)
+
+    await bot.answer_inline_query(inline_query_id=query.id, results=results, cache_time=INLINE_CACHE_TIME)
+
+
+@router.route('hist')
+@logger.catch
+async def create_history(call: CallbackQuery, within: str) -> None:
+    """
+    Функция обрабатывает ответ пользователя о выводе истории
+    и вызывает функцию показа истории с соответствующими параметрами.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        within (str): Принимает значения last(последний), day(день), week(неделя)
+    """
+
+    logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
+                                                                    btn=call.data))
+
+    texts = {'last': 'Последний поиск:',
+             'day': 'История за последний день:',
+             'week': 'История за последнюю неделю:'}
+
+    if within in texts:
+        await bot.edit_message_text(chat_id=call.message.chat.id, message_id=call.message.message_id, text=texts[within])
+        await send_history_page(chat_id=call.message.chat.id, within=within)
+
+
+@router.route('hmore')
+@logger.catch
+async def more_history(call: CallbackQuery, within: str, timestamp: str, last_id: str) -> None:
+    """
+    Функция-обработчик нажатия на кнопку "Ещё" под страницей истории.
+    Убирает кнопку с предыдущей страницы и выводит следующую страницу.
+
+    Args:
+        call (CallbackQuery): Принимает объект-CallbackQuery от Telegram
+        within (str): Принимает значения last(последний), day(день), week(неделя)
+        timestamp (str): Принимает timestamp последней выведенной записи
+        last_id (str): Принимает id последней выведенной записи
+    """
+
+    logger.info('Пользователь: {user_id}  | Кнопка: "{btn}"'.format(user_id=call.message.chat.id,
+                                                                    btn=call.data))
+
+    await bot.edit_message_reply_markup(chat_id=call.message.chat.id, message_id=call.message.message_id)
+    await send_history_page(chat_id=call.message.chat.id, within=within, cursor=(int(timestamp), int(last_id)))
+
+
+@logger.catch
+async def send_history_page(chat_id: int, within: str, cursor: tuple | None = None) -> None:
+    """
+    Функция, которая выводит одну страницу истории одним сообщением
+    (см. besthoteloffers_bot.send_history_page).
+
+    Args:
+        chat_id (int): Принимает id чата пользователя
+        within (str): Принимает значения last(последний), day(день), week(неделя),
+                        за которые нужно выводить историю
+        cursor (tuple | None): Курсор (timestamp, id) последней выведенной записи
+    """
+
+    histories, next_cursor = await run_db(get_history_page, user_id=chat_id, within=within, cursor=cursor)
+
+    if not histories:
+        await bot.send_message(chat_id=chat_id,
+                               text='Поисков пока не было.\n\nХочешь продолжить?  /help' if cursor is None
+                               else 'Больше поисков не было.\n\nХочешь продолжить?  /help')
+        return
+
+    output_text = history_page(histories=histories)
+
+    if next_cursor:
+        markup = InlineKeyboardMarkup(keyboard=[[InlineKeyboardButton(
+            text='Ещё',
+            callback_data=callback_data('hmore', within, *next_cursor)
+        )]])
+    else:
+        markup = None
+        output_text += '\n\nХочешь продолжить?  /help'
+
+    await bot.send_message(chat_id=chat_id, text=output_text, parse_mode='HTML',
+                           disable_web_page_preview=True, reply_markup=markup)
+
+
+async def run_webhook() -> None:
+    """
+    Функция, которая запускает HTTP-сервер aiohttp, принимающий обновления
+    Telegram (асинхронный аналог webhook.run_webhook).
+    """
+
+    # Обновления принимаются только на путь с секретом webhook (см. webhook.with_secret)
+    path = with_secret(WEBHOOK_PATH).encode('utf-8')
+
+    async def handle(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.raw_path.encode('utf-8', 'replace'), path):
+            return web.Response(status=403)
+
+        try:
+            update = Update.de_json(await request.json())
+        except (ValueError, KeyError, TypeError) as error:
+            logger.error('Некорректное обновление: {}'.format(error))
+            return web.Response(status=400)
+
+        if shutdown_event.is_set():
+            # Бот останавливается: Telegram повторит обновление позже
+            return web.Response(status=503)
+
+        # Обновление обрабатывается в отдельной задаче, ответ отправляется сразу
+        process_updates([update])
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post('/{path:.*}', handle)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_LISTEN, WEBHOOK_PORT).start()
+
+    if WEBHOOK_URL:
+        await bot.set_webhook(url=with_secret(WEBHOOK_URL))
+
+    logger.info('Webhook-сервер запущен на {}:{}{}'.format(WEBHOOK_LISTEN, WEBHOOK_PORT,
+                                                           with_secret(WEBHOOK_PATH, '<секрет>')))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def process_updates(updates: list[Update]) -> None:
+    """
+    Функция, которая запускает обработку обновлений отдельной задачей,
+    ссылка на которую хранится в update_tasks до её завершения.
+    Задача получает свой кэш состояний диалога (см. dialog.update_scope):
+    фильтры StateFilter всех обработчиков читают состояние чата из хранилища один раз.
+
+    Args:
+        updates (list): Принимает обновления Telegram
+    """
+
+    with update_scope():
+        task = asyncio.create_task(bot.process_new_updates(updates))
+    update_tasks.add(task)
+    task.add_done_callback(update_tasks.discard)
+
+
+async def polling(timeout: int = 20) -> None:
+    """
+    Функция, которая получает обновления методом getUpdates до отмены задачи или остановки бота
+    (аналог bot.infinity_polling, задачи обработки которого не отслеживаются).
+
+    Args:
+        timeout (int): Принимает таймаут long polling
+    """
+
+    global polling_offset
+    while True:
+        try:
+            updates = await bot.get_updates(offset=polling_offset, timeout=timeout, request_timeout=timeout + 5)
+        except Exception as error:
+            # AsyncTeleBot превращает отмену запроса getUpdates в RequestTimeout: при остановке бота выходим
+            if shutdown_event.is_set():
+                break
+            logger.error('Ошибка получения обновлений: {}'.format(error))
+            await asyncio.sleep(3)
+            continue
+
+        if updates:
+            process_updates(updates)
+            polling_offset = updates[-1].update_id + 1
+
+
+async def check_connection() -> None:
+    """
+    Корутина, которая проверяет подключение к Telegram Bot API (getMe) и выводит данные бота в лог.
+    Выполняется отдельной задачей и не задерживает получение обновлений.
+    """
+
+    try:
+        bot_info = await bot.get_me()
+    except Exception as error:
+        logger.error('Ошибка подключения к Telegram Bot API: {}'.format(error))
+        return
+
+    logger.info((f"""
+    ID бота: {bot_info.id},
+    Название бота: {bot_info.first_name},
+    Пользователь: {bot_info.username},
+    Подключение: {bot_info.is_bot}"""))
+
+
+async def create_app() -> AsyncQueuedTeleBot:
+    """
+    Фабрика приложения: подготавливает бота к работе и возвращает его
+    (проверка подключения к Telegram выполняется в фоне, таблицы БД
+    проверяются, только если изменилась схема, см. init_db).
+
+    Returns (AsyncQueuedTeleBot): объект бота
+    """
+
+    global retention, metrics_server
+    bot.send_queue.start()
+    task = asyncio.create_task(check_connection())
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+    # Инициализируем БД
+    await run_db(init_db)
+
+    # Кэши, сохранённые при предыдущей остановке бота
+    loaded = await run_db(load_snapshot)
+    if loaded:
+        logger.info('Загружен снимок кэшей: записей - {}'.format(loaded))
+
+    # Запускаем периодическую очистку истории поиска
+    # (при нескольких процессах бота, см. supervisor.py, - только в одном из них)
+    if WORKER_INDEX == 0:
+        retention = RetentionScheduler()
+        retention.start()
+
+    # Статистика запросов к БД выводится в лог по сигналу SIGUSR1 (kill -USR1 <pid бота>)
+    install_dump_signal()
+
+    # Метрики: время обработчиков и попадания в кэши
+    metrics.instrument_handlers(bot, router)
+    metrics.register_bot_caches()
+    metrics_server = metrics.start_server()
+
+    return bot
+
+
+def request_shutdown(signum: int) -> None:
+    """
+    Обработчик сигнала остановки: устанавливает shutdown_event.
+    """
+
+    if shutdown_event.is_set():
+        logger.warning('Бот уже останавливается (сигнал {})'.format(signal.Signals(signum).name))
+        return
+
+    logger.info('Получен сигнал {}, бот останавливается (не дольше {:.0f} с)'.format(
+        signal.Signals(signum).name, SHUTDOWN_TIMEOUT))
+    shutdown_event.set()
+
+
+async def shutdown_app(intake: asyncio.Task, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+    """
+    Плавная остановка асинхронного бота (аналог shutdown.GracefulShutdown синхронного бота):
+    останавливает получение обновлений, ждёт завершения задач обработки обновлений
+    и отправки сообщений из очереди не дольше timeout секунд, закрывает HTTP-сессии
+    и сохраняет снимок кэшей.
+
+    Args:
+        intake (asyncio.Task): Принимает задачу получения обновлений (polling или run_webhook)
+        timeout (float): Принимает время ожидания задач обработки обновлений в секундах
+    """
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    shutdown_event.set()
+    if retention is not None:
+        retention.stop()
+
+    intake.cancel()
+    for result in await asyncio.gather(intake, return_exceptions=True):
+        if isinstance(result, Exception):
+            logger.error('Ошибка получения обновлений: {}'.format(result))
+
+    pending = set()
+    if update_tasks:
+        _, pending = await asyncio.wait(set(update_tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning('Остановка: не завершено задач обработки обновлений - {}'.format(len(pending)))
+
+    if polling_offset is not None and not pending:
+        try:
+            # Обновления с update_id < polling_offset считаются полученными
+            await bot.get_updates(offset=polling_offset, limit=1, timeout=0)
+        except Exception as error:
+            logger.error('Ошибка подтверждения обновлений: {}'.format(error))
+
+    if not await bot.send_queue.drain(max(0.0, timeout - (loop.time() - start))):
+        logger.warning('Остановка: не отправлено запросов из очереди отправки - {}'.format(
+            bot.send_queue.metrics()['queued']))
+
+    await hotels_client.close()
+    await bot.close_session()
+    logger.info('Записей в снимке кэшей: {}'.format(await run_db(save_snapshot)))
+    db_executor.shutdown()
+    network_executor.shutdown(wait=False, cancel_futures=True)
+    if metrics_server is not None:
+        metrics_server.stop()
+    logger.info('Бот остановлен за {:.1f} с'.format(loop.time() - start))
+
+
+async def main() -> None:
+    """
+    Главная корутина асинхронного бота: подготавливает бота и получает
+    обновления (long polling или webhook, см. BOT_MODE) до сигнала остановки.
+    """
+
+    await create_app()
+
+    loop = asyncio.get_running_loop()
+    for signum in SHUTDOWN_SIGNALS:
+        loop.add_signal_handler(signum, request_shutdown, signum)
+
+    logger.info('Бот в работе')
+    if BOT_MODE == 'webhook':
+        intake = asyncio.create_task(run_webhook())
+    else:
+        # getUpdates не работает, пока в Telegram зарегистрирован webhook
+        await bot.remove_webhook()
+        intake = asyncio.create_task(polling())
+
+    stop = asyncio.create_task(shutdown_event.wait())
+    await asyncio.wait({intake, stop}, return_when=asyncio.FIRST_COMPLETED)
+    stop.cancel()
+    await shutdown_app(intake)
+
+
+if __name__ == '__main__':
+    logger.add('Log/debug.log', encoding='utf-8')
+    asyncio.run(main())
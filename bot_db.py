@@ -5,18 +5,19 @@
 
 import argparse
 import json
-from datetime import datetime
+from datetime import date, datetime
 import functools
 import sqlite3
-from sqlite3 import Connection
+from sqlite3 import Connection, Cursor
 from typing import Callable, Any
 
 from loguru import logger
-import pandas as pd
 from telebot.types import Message, InputMediaPhoto
 
 from commands import recurring, hilowprice
 from config import DATABASE
+from query_log import TimedConnection
+from storage import DEFAULT_SESSION_DATA, DEFAULT_USER_SETTINGS, UserStorage
 
 
 searching_functions = {
@@ -24,6 +25,49 @@ searching_functions = {
     'highprice': hilowprice.highprice
 }
 
+# Столбцы таблиц users и search_sessions, которые можно изменять
+# через update_user_data и update_session_data
+USER_COLUMNS = ('first_name', 'last_name', *DEFAULT_USER_SETTINGS)
+SESSION_COLUMNS = tuple(DEFAULT_SESSION_DATA)
+
+# Подзапрос, возвращающий id текущей (последней) сессии поиска пользователя
+CURRENT_SESSION = '(SELECT MAX(id) FROM search_sessions WHERE user_id=:{param})'
+
+
+def dict_factory(cursor: Cursor, row: tuple) -> dict[str, Any]:
+    """
+    Фабрика строк для sqlite3, которая возвращает строку результата
+    запроса в виде словаря {имя столбца: значение}.
+
+    Args:
+        cursor (Cursor): Принимает курсор, выполнивший запрос
+        row (tuple): Принимает строку результата в виде кортежа
+
+    Returns (dict): строка результата в виде словаря
+    """
+
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+def rows_to_frame(rows: list[dict[str, Any]]) -> Any:
+    """
+    Функция, которая преобразует строки результата в pandas.DataFrame
+    (например, для анализа истории). Библиотека pandas необязательна и
+    импортируется только при вызове данной функции.
+
+    Args:
+        rows (list): Принимает список строк результата в виде словарей
+
+    Returns (DataFrame): таблица pandas.DataFrame
+    """
+
+    try:
+        import pandas as pd
+    except ImportError as exc:
+        raise ImportError('Для получения DataFrame установите pandas: pip install pandas') from exc
+
+    return pd.DataFrame(rows)
+
 
 @logger.catch
 def ensure_connection(func: Callable) -> Callable:
@@ -38,7 +82,10 @@ def ensure_connection(func: Callable) -> Callable:
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs) -> Callable:
-        with sqlite3.connect(DATABASE) as connect:
+        # Время запросов учитывается в журнале медленных запросов (модуль query_log.py)
+        with sqlite3.connect(DATABASE, factory=TimedConnection) as connect:
+            # Строки результата возвращаются в виде словарей
+            connect.row_factory = dict_factory
             # Добавляем подключение к БД "connect" в начало кортежа
             # аргументов и передаём аргументы в декорируемую функцию
             my_args = (connect,) + args
@@ -91,6 +138,7 @@ def init_db(connect: Connection, force: bool = False) -> None:
     # Удаление всех таблиц, если аргумент force = True
     if force:
         cursor.execute('DROP TABLE IF EXISTS users')
+        cursor.execute('DROP TABLE IF EXISTS search_sessions')
         cursor.execute('DROP TABLE IF EXISTS user_messages')
 
     # Создание таблицы для информации о пользователях
@@ -103,22 +151,35 @@ def init_db(connect: Connection, force: bool = False) -> None:
             last_name               VARCHAR(64),
             join_date               DATETIME        NOT NULL
                                                     DEFAULT ((DATETIME('now'))),
-            cities                  TEXT            DEFAULT None,
-            city_id                 INTEGER         DEFAULT None,
-            city_name               VARCHAR (50)    DEFAULT None,
-            hotels_count            INTEGER         DEFAULT None,
-            needed_photo            BOOLEAN         DEFAULT None,
-            photos_count            INTEGER         DEFAULT None,
-            price_range             VARCHAR (30)    DEFAULT None,
-            dist_range              VARCHAR (10)    DEFAULT None,
             language                VARCHAR (8)     DEFAULT ('ru_RU'),
             lang_flag               BOOLEAN         DEFAULT (False),
             currency                VARCHAR (6)     DEFAULT ('RUB'),
-            cur_flag                BOOLEAN         DEFAULT (False),
+            cur_flag                BOOLEAN         DEFAULT (False)
+        )
+    """)
+
+    # Создание таблицы для параметров поиска (одна строка на каждую команду поиска)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS search_sessions(
+            id                      INTEGER         PRIMARY KEY AUTOINCREMENT,
+            user_id                 INTEGER         NOT NULL,
+            created                 DATETIME        NOT NULL
+                                                    DEFAULT ((DATETIME('now'))),
+            cities                  TEXT,
+            city_id                 INTEGER,
+            city_name               VARCHAR (50),
+            date_in                 DATE,
+            date_out                DATE,
+            hotels_count            INTEGER,
+            needed_photo            BOOLEAN         DEFAULT (False),
+            photos_count            INTEGER,
+            price_range             VARCHAR (30),
+            dist_range              VARCHAR (10),
             advanced_question_flag  BOOLEAN         DEFAULT (False),
-            searching_function      VARCHAR (22)    DEFAULT None
+            searching_function      VARCHAR (22)
         )
     """)
+    cursor.execute('CREATE INDEX IF NOT EXISTS search_sessions_user_id ON search_sessions (user_id)')
 
     # Создание таблицы для команд и сообщений пользователей,
     # а также запросов и ответов от сервера
@@ -164,7 +225,7 @@ def user_exists(connect: Connection, user_id: int) -> bool:
 
 @ensure_connection
 @logger.catch
-def add_user(connect: Connection, user_id: int, first_name: str, last_name: str, date: int) -> None:
+def add_user(connect: Connection, user_id: int, first_name: str, last_name: str, date: int | str) -> None:
     """
     Функция, которая добавляет пользователя в БД.
 
@@ -175,13 +236,14 @@ def add_user(connect: Connection, user_id: int, first_name: str, last_name: str,
         user_id (int): Принимает id пользователя из его команды или сообщения
         first_name (str): Принимает имя пользователя из его команды или сообщения
         last_name (str): Принимает фамилию пользователя из его команды или сообщения
-        date (int): Принимает дату команды или сообщения в формате Timestamp
+        date (int | str): Принимает дату команды или сообщения в формате Timestamp
+                            (либо уже в формате Y-M-D H:M:S)
     """
 
     cursor = connect.cursor()
 
     # Конвертация даты
-    join_date = convert_timestamp(date)
+    join_date = convert_timestamp(date) if isinstance(date, int) else date
 
     # Добавление пользователя в БД
     cursor.execute("""
@@ -219,8 +281,8 @@ def get_cities(connect: Connection, message: Message) -> dict[str, str]:
 
     cursor = connect.cursor()
     cursor.execute("""
-        UPDATE users SET cities=:1 WHERE user_id=:2
-        """, {
+        UPDATE search_sessions SET cities=:1 WHERE id={current}
+        """.format(current=CURRENT_SESSION.format(param=2)), {
             '1': json.dumps(cities, indent=4),
             '2': message.from_user.id
         }
@@ -247,15 +309,14 @@ def set_city_id(connect: Connection, user_id: int, user_city: str) -> None:
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT cities FROM users WHERE user_id=:1', {'1': user_id})  # TODO Подключить peewee
-    cities = json.load(cursor.fetchone())
-    # cities = cursor.fetchone()
+    cursor.execute('SELECT cities FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    cities = json.loads(cursor.fetchone()['cities'])
 
     for city_name, city_data in cities.items():
         if city_data == user_city:
             cursor.execute("""
-                UPDATE users SET (city_id=:1, city_name=:2) WHERE user_id=:3
-                """, {
+                UPDATE search_sessions SET city_id=:1, city_name=:2 WHERE id={current}
+                """.format(current=CURRENT_SESSION.format(param=3)), {
                 '1': user_city,
                 '2': city_name,
                 '3': user_id
@@ -282,19 +343,17 @@ def get_city_id(connect: Connection, user_id: int) -> str:
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT city_id FROM users WHERE user_id=:1', {'1': user_id})
-    city_id = cursor.fetchone()
+    cursor.execute('SELECT city_id FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    city_id = cursor.fetchone()['city_id']
 
     return city_id
 
 
 @ensure_connection
 @logger.catch
-def get_hotels(connect: Connection, user_id: int) -> tuple[dict[str, dict[str, str | None]] | None, str | None]:
+def get_user_row(connect: Connection, user_id: int) -> dict[str, Any] | None:
     """
-    Данная функция запрашивает словарь с вариантами отелей у функции
-    search_hotels, записывает его в БД и возвращает либо кортеж,
-    содержащий словарь с найденными отелями, либо ничего.
+    Геттер для получения строки пользователя из таблицы users.
 
     Args:
         connect (Connection): Принимает объект Connection, который по сути
@@ -302,16 +361,202 @@ def get_hotels(connect: Connection, user_id: int) -> tuple[dict[str, dict[str, s
                                 подключение к файлу БД SQLite
         user_id (int): Принимает id пользователя из его команды или сообщения
 
-    Returns (tuple): кортеж, содержащий словарь с найденными отелями,
-                        либо ничего.
+    Returns (dict | None): строка пользователя в виде словаря
     """
 
     cursor = connect.cursor()
+    cursor.execute('SELECT * FROM users WHERE user_id=:1', {'1': user_id})
 
-    query = cursor.execute('SELECT * FROM users WHERE user_id=:1', {'1': user_id})
+    return cursor.fetchone()
 
-    data_frame = pd.read_sql(query, connect)
-    user_data = data_frame.to_dict("user_data")[0]
+
+@ensure_connection
+@logger.catch
+def get_session_data(connect: Connection, user_id: int) -> dict[str, Any] | None:
+    """
+    Геттер для получения текущей (последней) сессии поиска пользователя.
+
+    Args:
+        connect (Connection): Принимает объект Connection, который по сути
+                                является менеджером контекста, обеспечивающим
+                                подключение к файлу БД SQLite
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (dict | None): строка сессии поиска в виде словаря
+    """
+
+    cursor = connect.cursor()
+    cursor.execute('SELECT * FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+
+    return cursor.fetchone()
+
+
+def get_user_data(user_id: int) -> dict[str, Any]:
+    """
+    Геттер для получения данных пользователя вместе с параметрами
+    его текущей сессии поиска.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (dict): данные пользователя и его текущего поиска в виде словаря
+    """
+
+    return {**(get_session_data(user_id) or DEFAULT_SESSION_DATA), **get_user_row(user_id)}
+
+
+@ensure_connection
+@logger.catch
+def update_user_data(connect: Connection, user_id: int, fields: dict[str, Any]) -> None:
+    """
+    Сеттер для записи произвольных столбцов таблицы users.
+
+    Args:
+        connect (Connection): Принимает объект Connection, который по сути
+                                является менеджером контекста, обеспечивающим
+                                подключение к файлу БД SQLite
+        user_id (int): Принимает id пользователя из его команды или сообщения
+        fields (dict): Принимает словарь {имя столбца: значение}
+    """
+
+    unknown = set(fields) - set(USER_COLUMNS)
+    if unknown:
+        raise ValueError('Неизвестные столбцы таблицы users: {}'.format(', '.join(sorted(unknown))))
+
+    cursor = connect.cursor()
+    cursor.execute('UPDATE users SET {columns} WHERE user_id=:user_id'.format(
+        columns=', '.join('{name}=:{name}'.format(name=name) for name in fields)),
+        {**SqliteStorage.to_db_values(fields), 'user_id': user_id}
+    )
+
+    # Сохранить изменения
+    connect.commit()
+
+
+@ensure_connection
+@logger.catch
+def start_session(connect: Connection, user_id: int, fields: dict[str, Any]) -> dict[str, Any]:
+    """
+    Функция, которая создаёт новую сессию поиска пользователя.
+
+    Args:
+        connect (Connection): Принимает объект Connection, который по сути
+                                является менеджером контекста, обеспечивающим
+                                подключение к файлу БД SQLite
+        user_id (int): Принимает id пользователя из его команды или сообщения
+        fields (dict): Принимает словарь {имя столбца: значение} (остальные - по умолчанию)
+
+    Returns (dict): строка новой сессии поиска в виде словаря
+    """
+
+    session = {**DEFAULT_SESSION_DATA, **fields}
+
+    unknown = set(session) - set(SESSION_COLUMNS)
+    if unknown:
+        raise ValueError('Неизвестные столбцы таблицы search_sessions: {}'.format(', '.join(sorted(unknown))))
+
+    session = {'user_id': user_id, 'created': convert_timestamp(int(datetime.now().timestamp())), **session}
+
+    cursor = connect.cursor()
+    cursor.execute('INSERT INTO search_sessions ({columns}) VALUES ({values})'.format(
+        columns=', '.join(session), values=', '.join(':' + name for name in session)),
+        SqliteStorage.to_db_values(session)
+    )
+
+    # Сохранить изменения
+    connect.commit()
+
+    return {'id': cursor.lastrowid, **SqliteStorage.to_db_values(session)}
+
+
+@ensure_connection
+@logger.catch
+def update_session_data(connect: Connection, session_id: int, fields: dict[str, Any]) -> None:
+    """
+    Сеттер для записи произвольных столбцов сессии поиска.
+
+    Args:
+        connect (Connection): Принимает объект Connection, который по сути
+                                является менеджером контекста, обеспечивающим
+                                подключение к файлу БД SQLite
+        session_id (int): Принимает id сессии поиска
+        fields (dict): Принимает словарь {имя столбца: значение}
+    """
+
+    unknown = set(fields) - set(SESSION_COLUMNS)
+    if unknown:
+        raise ValueError('Неизвестные столбцы таблицы search_sessions: {}'.format(', '.join(sorted(unknown))))
+
+    cursor = connect.cursor()
+    cursor.execute('UPDATE search_sessions SET {columns} WHERE id=:session_id'.format(
+        columns=', '.join('{name}=:{name}'.format(name=name) for name in fields)),
+        {**SqliteStorage.to_db_values(fields), 'session_id': session_id}
+    )
+
+    # Сохранить изменения
+    connect.commit()
+
+
+class SqliteStorage(UserStorage):
+    """
+    Хранилище пользователей и сессий поиска на основе sqlite3 (функции данного модуля).
+    """
+
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        return get_user_row(user_id)
+
+    def add_user(self, user_id: int, first_name: str, last_name: str, join_date: str) -> None:
+        add_user(user_id, first_name, last_name, join_date)
+
+    def update_user(self, user_id: int, **fields: Any) -> None:
+        update_user_data(user_id, fields)
+
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        return get_session_data(user_id)
+
+    def start_session(self, user_id: int, **fields: Any) -> dict[str, Any]:
+        return start_session(user_id, fields)
+
+    def update_session(self, session_id: int, **fields: Any) -> None:
+        update_session_data(session_id, fields)
+
+    def normalize(self, fields: dict[str, Any]) -> dict[str, Any]:
+        return self.to_db_values(fields)
+
+    @staticmethod
+    def to_db_values(fields: dict[str, Any]) -> dict[str, Any]:
+        """
+        Приводит значения к виду, в котором они хранятся в SQLite:
+        словари и списки - JSON, логические значения - 0/1, даты - ISO-строки.
+        """
+
+        result = dict()
+        for name, value in fields.items():
+            if isinstance(value, (dict, list)):
+                value = json.dumps(value)
+            elif isinstance(value, bool):
+                value = int(value)
+            elif isinstance(value, date):
+                value = value.isoformat()
+            result[name] = value
+        return result
+
+
+@logger.catch
+def get_hotels(user_id: int) -> tuple[dict[str, dict[str, str | None]] | None, str | None]:
+    """
+    Данная функция запрашивает словарь с вариантами отелей у функции
+    search_hotels, записывает его в БД и возвращает либо кортеж,
+    содержащий словарь с найденными отелями, либо ничего.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (tuple): кортеж, содержащий словарь с найденными отелями,
+                        либо ничего.
+    """
+
+    user_data = get_user_data(user_id)
 
     searching_func = searching_functions[user_data['searching_function']]
     hotels_data = recurring.search_hotels(data=user_data, searching_func=searching_func)
@@ -370,8 +615,8 @@ def set_hotels_count(connect: Connection, user_id: int, user_hotels_count: int)
         cursor = connect.cursor()
 
         cursor.execute("""
-            UPDATE users SET hotels_count=:1 WHERE user_id=:2
-            """, {
+            UPDATE search_sessions SET hotels_count=:1 WHERE id={current}
+            """.format(current=CURRENT_SESSION.format(param=2)), {
             '1': user_hotels_count,
             '2': user_id
             }
@@ -397,8 +642,8 @@ def get_hotels_count(connect: Connection, user_id: int) -> int | None:
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT hotels_count FROM users WHERE user_id=:1', {'1': user_id})
-    hotels_count = cursor.fetchone()
+    cursor.execute('SELECT hotels_count FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    hotels_count = cursor.fetchone()['hotels_count']
 
     return hotels_count
 
@@ -422,8 +667,8 @@ def set_needed_photo(connect: Connection, user_id: int, user_needed_photo: bool
     cursor = connect.cursor()
 
     cursor.execute("""
-        UPDATE users SET needed_photo=:1 WHERE user_id=:2
-        """, {
+        UPDATE search_sessions SET needed_photo=:1 WHERE id={current}
+        """.format(current=CURRENT_SESSION.format(param=2)), {
         '1': user_needed_photo,
         '2': user_id
         }
@@ -451,8 +696,8 @@ def get_needed_photo(connect: Connection, user_id: int) -> bool | None:
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT needed_photo FROM users WHERE user_id=:1', {'1': user_id})
-    needed_photo = cursor.fetchone()
+    cursor.execute('SELECT needed_photo FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    needed_photo = cursor.fetchone()['needed_photo']
 
     return needed_photo
 
@@ -477,8 +722,8 @@ def set_photos_count(connect: Connection, user_id: int, user_photos_count: int)
         cursor = connect.cursor()
 
         cursor.execute("""
-            UPDATE users SET photos_count=:1 WHERE user_id=:2
-            """, {
+            UPDATE search_sessions SET photos_count=:1 WHERE id={current}
+            """.format(current=CURRENT_SESSION.format(param=2)), {
             '1': user_photos_count,
             '2': user_id
             }
@@ -504,23 +749,19 @@ def get_photos_count(connect: Connection, user_id: int) -> int | None:
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT photos_count FROM users WHERE user_id=:1', {'1': user_id})
-    photos_count = cursor.fetchone()
+    cursor.execute('SELECT photos_count FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    photos_count = cursor.fetchone()['photos_count']
 
     return photos_count
 
 
-@ensure_connection
 @logger.catch
-def get_photos(connect: Connection, user_id: int, hotel_id: int, text: str) -> list[InputMediaPhoto]:
+def get_photos(user_id: int, hotel_id: int, text: str) -> list[InputMediaPhoto]:
     """
     Данная функция запрашивает список url-адресов фотографий отеля
     у функции search_photos и возвращает список фотографий отеля.
 
     Args:
-        connect (Connection): Принимает объект Connection, который по сути
-                                является менеджером контекста, обеспечивающим
-                                подключение к файлу БД SQLite
         user_id (int): Принимает id пользователя из его команды или сообщения
         hotel_id (int): Принимает id отеля
         text (str): Принимает информацию об отеле
@@ -528,12 +769,7 @@ def get_photos(connect: Connection, user_id: int, hotel_id: int, text: str) -> l
     Returns (list): Возвращает список фотографий отеля
     """
 
-    cursor = connect.cursor()
-
-    query = cursor.execute('SELECT * FROM users WHERE user_id=:1', {'1': user_id})
-
-    data_frame = pd.read_sql(query, connect)
-    user_data = data_frame.to_dict("user_data")[0]
+    user_data = get_user_data(user_id)
 
     photos = recurring.search_photos(data=user_data, hotel_id=hotel_id)
     hotels_photos = list()
@@ -568,7 +804,7 @@ def set_language(connect: Connection, user_id: int, user_language: str) -> None:
     cursor = connect.cursor()
 
     cursor.execute("""
-        UPDATE users SET (language=:1, lang_flag=:2) WHERE user_id=:3
+        UPDATE users SET language=:1, lang_flag=:2 WHERE user_id=:3
         """, {
         '1': user_language,
         '2': True,
@@ -597,7 +833,7 @@ def get_language(connect: Connection, user_id: int) -> str:
 
     cursor = connect.cursor()
     cursor.execute('SELECT language FROM users WHERE user_id=:1', {'1': user_id})
-    language = cursor.fetchone()
+    language = cursor.fetchone()['language']
 
     return language
 
@@ -619,7 +855,7 @@ def set_currency(connect: Connection, user_id: int, user_currency: str) -> None:
     cursor = connect.cursor()
 
     cursor.execute("""
-        UPDATE users SET (currency=:1, cur_flag=:2) WHERE user_id=:3
+        UPDATE users SET currency=:1, cur_flag=:2 WHERE user_id=:3
         """, {
         '1': user_currency,
         '2': True,
@@ -648,7 +884,7 @@ def get_currency(connect: Connection, user_id: int) -> str:
 
     cursor = connect.cursor()
     cursor.execute('SELECT currency FROM users WHERE user_id=:1', {'1': user_id})
-    currency = cursor.fetchone()
+    currency = cursor.fetchone()['currency']
 
     return currency
 
@@ -669,44 +905,26 @@ def get_advanced_question_flag(connect: Connection, user_id: int) -> bool | None
     """
 
     cursor = connect.cursor()
-    cursor.execute('SELECT advanced_question_flag FROM users WHERE user_id=:1', {'1': user_id})
-    advanced_question_flag = cursor.fetchone()
+    cursor.execute('SELECT advanced_question_flag FROM search_sessions WHERE id=' + CURRENT_SESSION.format(param=1), {'1': user_id})
+    advanced_question_flag = cursor.fetchone()['advanced_question_flag']
 
     return advanced_question_flag
 
 
-@ensure_connection
 @logger.catch
-def set_searching_function(connect: Connection, user_id: int, user_searching_function: str) -> None:
+def set_searching_function(user_id: int, user_searching_function: str) -> None:
     """
-    Сеттер для установки функции поиска отелей и флага на дополнительные вопросы.
+    Функция, которая начинает новую сессию поиска с выбранной функцией
+    поиска отелей и флагом на дополнительные вопросы.
 
     Args:
-        connect (Connection): Принимает объект Connection, который по сути
-                                является менеджером контекста, обеспечивающим
-                                подключение к файлу БД SQLite
         user_id (int): Принимает id пользователя из его команды или сообщения
         user_searching_function (int): Принимает введённую пользователем
                                         функцию поиска отелей
     """
 
-    cursor = connect.cursor()
-
-    if user_searching_function == 'bestdeal':
-        cursor.execute('UPDATE users SET advanced_question_flag=:1 WHERE user_id=:2', {'1': True, '2': user_id})
-    else:
-        cursor.execute('UPDATE users SET advanced_question_flag=:1 WHERE user_id=:2', {'1': False, '2': user_id})
-
-    cursor.execute("""
-        UPDATE users SET searching_function=:1 WHERE user_id=:2
-        """, {
-            '1': user_searching_function,
-            '2': user_id
-        }
-    )
-
-    # Сохранить изменения
-    connect.commit()
+    start_session(user_id, {'advanced_question_flag': user_searching_function == 'bestdeal',
+                            'searching_function': user_searching_function})
 
 
 @ensure_connection
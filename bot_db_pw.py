@@ -5,19 +5,51 @@
 
 import argparse
 import datetime as dt
+import json
+import threading
+import time
 from typing import Any
+import zlib
 
 from loguru import logger
-from playhouse.sqlite_ext import *
+from peewee import (SENTINEL, SQL, AutoField, BooleanField, CharField, DateField, DateTimeField, ForeignKeyField,
+                    IntegerField, Model, TextField, Tuple, fn)
+from playhouse.sqlite_ext import SqliteExtDatabase, JSONField
 from telebot.types import Message, InputMediaPhoto
 
 from commands import recurring, hilowprice, bestdeal
 from commands.history import get_hotels_for_history
-from config import DATABASE
+from config import (DATABASE, DIALOG_STORE, HISTORY_MAX_AGE_DAYS, HISTORY_MAX_PER_USER, HISTORY_PAGE_SIZE,
+                    PHOTO_FILE_CACHE, RETENTION_BATCH_SIZE, RETENTION_INTERVAL, SESSION_MAX_AGE_DAYS,
+                    USER_CACHE_SIZE)
+from dialog import StateStore, MemoryStateStore, CachedStateStore, DialogMachine
+from photo_sizes import negotiator, base_url
+from query_log import query_log
+from storage import DEFAULT_SESSION_DATA, UserStorage, CachedStorage, LRUCache
 
 
-# Подключаемся к БД
-db = SqliteExtDatabase(DATABASE)
+class TimedSqliteDatabase(SqliteExtDatabase):
+    """
+    БД SQLite, которая учитывает время каждого запроса в журнале
+    медленных запросов query_log (модуль query_log.py).
+    """
+
+    def execute_sql(self, sql: str, params: Any = None, commit: Any = SENTINEL) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().execute_sql(sql, params, commit)
+        finally:
+            query_log.record(sql, params, time.perf_counter() - start, self._explain)
+
+    def _explain(self, sql: str, params: Any) -> list[tuple]:
+        # Напрямую через подключение, чтобы EXPLAIN не попадал в журнал
+        return self.connection().execute(sql, params or ()).fetchall()
+
+
+# Подключаемся к БД.
+# auto_vacuum=INCREMENTAL применяется только к новой (пустой) БД и позволяет
+# возвращать освободившееся место командой PRAGMA incremental_vacuum
+db = TimedSqliteDatabase(DATABASE, pragmas={'auto_vacuum': 'incremental'})
 
 
 searching_functions = {'lowprice': hilowprice.lowprice,
@@ -29,7 +61,7 @@ searching_functions = {'lowprice': hilowprice.lowprice,
 class ModelBase(Model):
     """
     Класс ModelBase, наследуется от класса Model библиотеки peewee.
-    Дочерние классы: User и History.
+    Дочерние классы: User, SearchSession, History, DialogState и PhotoFile.
 
     Данный класс содержит одинаковые поля таблиц и ссылку на БД
     для дочерних классов.
@@ -45,29 +77,18 @@ class User(ModelBase):
     """
     Модель, описывающая таблицу БД "users".
     Данная таблица необходима для регистрации новых пользователей бота,
-    а также для сохранения выбранных ими параметров и настроек.
+    а также для сохранения их постоянных настроек (язык, валюта).
+    Параметры поиска хранятся в отдельной таблице "search_sessions".
     """
 
     user_id = IntegerField(null=True, constraints=[SQL("UNIQUE ON CONFLICT IGNORE")])
     first_name = CharField(max_length=64, null=True)
     last_name = CharField(max_length=64, null=True)
     join_date = DateTimeField(constraints=[SQL("DEFAULT (datetime('now'))")])
-    cities = JSONField(null=True, constraints=[SQL("DEFAULT None")])
-    city_id = IntegerField(null=True, constraints=[SQL("DEFAULT None")])
-    city_name = CharField(max_length=50, null=True, constraints=[SQL("DEFAULT None")])
-    date_in = DateField(null=True, constraints=[SQL("DEFAULT None")])
-    date_out = DateField(null=True, constraints=[SQL("DEFAULT None")])
-    hotels_count = IntegerField(null=True, constraints=[SQL("DEFAULT None")])
-    needed_photo = BooleanField(null=True, constraints=[SQL("DEFAULT False")])
-    photos_count = IntegerField(null=True, constraints=[SQL("DEFAULT None")])
-    price_range = CharField(max_length=30, null=True, constraints=[SQL("DEFAULT None")])
-    dist_range = CharField(max_length=10, null=True, constraints=[SQL("DEFAULT None")])
     language = CharField(max_length=8, null=True, constraints=[SQL("DEFAULT ('ru_RU')")])
     lang_flag = BooleanField(null=True, constraints=[SQL("DEFAULT False")])
     currency = CharField(max_length=6, null=True, constraints=[SQL("DEFAULT ('RUB')")])
     cur_flag = BooleanField(null=True, constraints=[SQL("DEFAULT False")])
-    advanced_question_flag = BooleanField(null=True, constraints=[SQL("DEFAULT False")])
-    searching_function = CharField(max_length=22, null=True, constraints=[SQL("DEFAULT None")])
 
     class Meta:
         table_name = 'users'
@@ -87,21 +108,53 @@ class User(ModelBase):
 
         return pk_id
 
+
+class SearchSession(ModelBase):
+    """
+    Модель, описывающая таблицу БД "search_sessions".
+    Каждая команда поиска (/lowprice, /highprice, /bestdeal) создаёт новую
+    строку с параметрами этого поиска, текущая сессия пользователя - его
+    последняя строка. Старые сессии удаляются задачей очистки пакетами.
+    """
+
+    user_id = IntegerField(index=True)
+    created = DateTimeField(constraints=[SQL("DEFAULT (datetime('now'))")])
+    cities = JSONField(null=True)
+    city_id = IntegerField(null=True)
+    city_name = CharField(max_length=50, null=True)
+    date_in = DateField(null=True)
+    date_out = DateField(null=True)
+    hotels_count = IntegerField(null=True)
+    needed_photo = BooleanField(null=True)
+    photos_count = IntegerField(null=True)
+    price_range = CharField(max_length=30, null=True)
+    dist_range = CharField(max_length=10, null=True)
+    advanced_question_flag = BooleanField(null=True)
+    searching_function = CharField(max_length=22, null=True)
+
+    class Meta:
+        table_name = 'search_sessions'
+
     @classmethod
-    def reset_to_default_search_data(cls, user_id: int) -> None:
+    def delete_stale(cls, cutoff: str, batch_size: int) -> int:
         """
-        Метод, который сбрасывает выбранные пользователем данные
-        для поиска отелей в БД к значениям по умолчанию.
+        Метод, который удаляет не более batch_size сессий, созданных раньше
+        даты cutoff. Последняя сессия каждого пользователя не удаляется.
 
         Args:
-            user_id (int): Принимает id пользователя из его команды или сообщения
+            cutoff (str): Дата в формате YYYY-MM-DD HH:MM:SS
+            batch_size (int): Максимальное кол-во удаляемых за раз записей
+
+        Returns (int): кол-во удалённых записей
         """
 
         with db:
-            User(id=cls.get_pk_id(user_id), cities=None, city_id=None, city_name=None, date_in=None, date_out=None,
-                 hotels_count=None, needed_photo=False, photos_count=None, price_range=None, dist_range=None,
-                 language='ru_RU', lang_flag=False, currency='RUB', cur_flag=False, advanced_question_flag=False,
-                 searching_function=None).save()
+            current = SearchSession.select(fn.MAX(SearchSession.id)).group_by(SearchSession.user_id)
+            batch = (SearchSession
+                     .select(SearchSession.id)
+                     .where((SearchSession.created < cutoff) & SearchSession.id.not_in(current))
+                     .limit(batch_size))
+            return SearchSession.delete().where(SearchSession.id.in_(batch)).execute()
 
 
 class History(ModelBase):
@@ -118,6 +171,9 @@ class History(ModelBase):
 
     class Meta:
         table_name = 'user_messages'
+        indexes = (
+            (('user_id', 'date'), False),
+        )
 
     @classmethod
     def delete_history_data(cls, user_id: int) -> None:
@@ -131,12 +187,206 @@ class History(ModelBase):
         with db:
             History.delete().where(History.user_id == user_id).execute()
 
+    @classmethod
+    def delete_older_than(cls, cutoff: str, batch_size: int) -> int:
+        """
+        Метод, который удаляет не более batch_size записей старше даты cutoff.
+
+        Args:
+            cutoff (str): Дата в формате YYYY-MM-DD HH:MM:SS
+            batch_size (int): Максимальное кол-во удаляемых за раз записей
+
+        Returns (int): кол-во удалённых записей
+        """
+
+        with db:
+            batch = History.select(History.id).where(History.date < cutoff).limit(batch_size)
+            return History.delete().where(History.id.in_(batch)).execute()
+
+    @classmethod
+    def delete_over_limit(cls, user_id: int, max_per_user: int, batch_size: int) -> int:
+        """
+        Метод, который удаляет не более batch_size самых старых записей пользователя,
+        не попадающих в max_per_user последних.
+
+        Args:
+            user_id (int): Принимает id пользователя
+            max_per_user (int): Кол-во последних записей, которые нужно сохранить
+            batch_size (int): Максимальное кол-во удаляемых за раз записей
+
+        Returns (int): кол-во удалённых записей
+        """
+
+        with db:
+            batch = (History
+                     .select(History.id)
+                     .where(History.user_id == user_id)
+                     .order_by(History.date.desc(), History.id.desc())
+                     .limit(batch_size)
+                     .offset(max_per_user))
+            return History.delete().where(History.id.in_(batch)).execute()
+
+
+class DialogState(ModelBase):
+    """
+    Модель, описывающая таблицу БД "dialog_states".
+    Хранит текущее состояние диалога поиска каждого чата (модуль dialog.py),
+    поэтому следующее сообщение пользователя может обработать любой процесс бота.
+    """
+
+    chat_id = IntegerField(unique=True)
+    state = CharField(max_length=32)
+    updated = DateTimeField(constraints=[SQL("DEFAULT (datetime('now'))")])
+
+    class Meta:
+        table_name = 'dialog_states'
+
+    @classmethod
+    def delete_stale(cls, cutoff: str, batch_size: int) -> int:
+        """
+        Метод, который удаляет не более batch_size брошенных диалогов,
+        последний раз изменённых раньше даты cutoff.
+
+        Args:
+            cutoff (str): Дата в формате YYYY-MM-DD HH:MM:SS
+            batch_size (int): Максимальное кол-во удаляемых за раз записей
+
+        Returns (int): кол-во удалённых записей
+        """
+
+        with db:
+            batch = DialogState.select(DialogState.id).where(DialogState.updated < cutoff).limit(batch_size)
+            return DialogState.delete().where(DialogState.id.in_(batch)).execute()
+
+
+class PhotoFile(ModelBase):
+    """
+    Модель, описывающая таблицу БД "photo_files".
+    Хранит file_id фотографий отелей, уже отправленных в Telegram:
+    повторно фотография отправляется по file_id, и Telegram не загружает её заново.
+    """
+
+    template = TextField(unique=True)
+    file_id = CharField(max_length=255, index=True)
+    created = DateTimeField(constraints=[SQL("DEFAULT (datetime('now'))")])
+
+    class Meta:
+        table_name = 'photo_files'
+
+
+class PeeweeStateStore(StateStore):
+    """
+    Хранилище состояний диалога в таблице "dialog_states" (модель DialogState).
+    """
+
+    def get(self, chat_id: int) -> str | None:
+        with db:
+            return DialogState.select(DialogState.state).where(DialogState.chat_id == chat_id).scalar()
+
+    def set(self, chat_id: int, state: str) -> None:
+        with db:
+            DialogState.replace(chat_id=chat_id, state=state,
+                                updated=dt.datetime.now().replace(microsecond=0)).execute()
+
+    def delete(self, chat_id: int) -> None:
+        with db:
+            DialogState.delete().where(DialogState.chat_id == chat_id).execute()
+
+
+class PeeweeStorage(UserStorage):
+    """
+    Хранилище пользователей и сессий поиска на основе моделей User и SearchSession (peewee).
+    """
+
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        with db:
+            return User.select().where(User.user_id == user_id).dicts().first()
+
+    def add_user(self, user_id: int, first_name: str, last_name: str, join_date: str) -> None:
+        with db:
+            User.insert(user_id=user_id, first_name=first_name, last_name=last_name,
+                        join_date=join_date).on_conflict_ignore().execute()
+
+    def update_user(self, user_id: int, **fields: Any) -> None:
+        with db:
+            User.update(**fields).where(User.user_id == user_id).execute()
+
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        with db:
+            return (SearchSession
+                    .select()
+                    .where(SearchSession.user_id == user_id)
+                    .order_by(SearchSession.id.desc())
+                    .dicts()
+                    .first())
+
+    def start_session(self, user_id: int, **fields: Any) -> dict[str, Any]:
+        session = {'user_id': user_id,
+                   'created': dt.datetime.now().replace(microsecond=0),
+                   **DEFAULT_SESSION_DATA,
+                   **fields
+                   }
+        with db:
+            session_id = SearchSession.insert(**session).execute()
+
+        return {'id': session_id, **self.normalize(session)}
+
+    def update_session(self, session_id: int, **fields: Any) -> None:
+        with db:
+            SearchSession.update(**fields).where(SearchSession.id == session_id).execute()
+
+    def normalize(self, fields: dict[str, Any]) -> dict[str, Any]:
+        result = dict()
+        for name, value in fields.items():
+            field = User._meta.fields.get(name) or SearchSession._meta.fields[name]
+            if isinstance(field, JSONField):
+                # db_value поля JSONField - это SQL-выражение, а не значение
+                result[name] = json.loads(json.dumps(value))
+            else:
+                result[name] = field.python_value(field.db_value(value))
+        return result
+
+
+# Хранилище пользователей с LRU-кэшем горячих строк таблиц users и search_sessions.
+# Все чтения и записи данных пользователей выполняются через него
+storage = CachedStorage(backend=PeeweeStorage(), maxsize=USER_CACHE_SIZE)
+
+# LRU-кэш строк таблицы photo_files {шаблон адреса фотографии: file_id}
+photo_files_cache = LRUCache(maxsize=PHOTO_FILE_CACHE)
+
+# Конечный автомат диалога поиска (см. dialog.py и DIALOG_STORE в config.py).
+# При обработке обновления состояние чата читается из хранилища один раз (CachedStateStore)
+dialog_machine = DialogMachine(store=CachedStateStore(PeeweeStateStore() if DIALOG_STORE == 'sqlite'
+                                                    else MemoryStateStore()))
+
+
+# Таблицы БД бота
+MODELS = [User, SearchSession, History, DialogState, PhotoFile]
+
+
+def schema_version() -> int:
+    """
+    Функция, которая возвращает версию схемы БД: контрольную сумму SQL создания таблиц и индексов.
+    Версия меняется при любом изменении моделей, поэтому её не нужно увеличивать вручную.
+
+    Returns (int): версия схемы (хранится в PRAGMA user_version)
+    """
+
+    ddl = list()
+    for model in MODELS:
+        ddl.append(model._schema._create_table(safe=False).query()[0])
+        ddl.extend(db.get_sql_context().sql(index).query()[0] for index in model._schema._create_indexes(safe=False))
+
+    return zlib.crc32('\n'.join(ddl).encode('utf-8')) & 0x7FFFFFFF
+
 
 @logger.catch
 def init_db(force: bool = False) -> None:
     """
     Функция, которая инициализирует БД.
     Проверяет наличие нужных таблиц, если их нет, то создаёт.
+    Если версия схемы в БД (PRAGMA user_version) совпадает с текущей, проверка
+    таблиц пропускается: повторный запуск бота выполняет один запрос к БД.
     При вызове с аргументом force=True удаляет таблицы, перед тем,
     как создать их.
 
@@ -145,17 +395,161 @@ def init_db(force: bool = False) -> None:
                         (по умолчанию: False)
     """
 
+    version = schema_version()
+
     with db:
+        if not force and db.execute_sql('PRAGMA user_version').fetchone()[0] == version:
+            logger.info('БД инициализирована (схема не изменилась)')
+            return
+
         # Удаление всех таблиц, если аргумент force = True
         if force:
-            db.drop_tables([User, History])
+            db.drop_tables(MODELS)
 
         # Создание таблиц
-        db.create_tables([User, History])
+        db.create_tables(MODELS)
+        db.execute_sql('PRAGMA user_version = {:d}'.format(version))
 
     logger.info('БД инициализирована')
 
 
+@logger.catch
+def purge_history(max_age_days: int = HISTORY_MAX_AGE_DAYS,
+                  max_per_user: int = HISTORY_MAX_PER_USER,
+                  batch_size: int = RETENTION_BATCH_SIZE,
+                  pause: float = 0.05) -> int:
+    """
+    Функция, которая удаляет устаревшую историю поиска пользователей.
+    Удаляет записи старше max_age_days дней, а также записи сверх
+    max_per_user последних для каждого пользователя.
+    Удаление выполняется небольшими пакетами в отдельных транзакциях,
+    чтобы не блокировать запись в БД обработчикам бота.
+
+    Args:
+        max_age_days (int): Максимальный возраст записей в днях (0 - без ограничения)
+        max_per_user (int): Максимальное кол-во записей на пользователя (0 - без ограничения)
+        batch_size (int): Кол-во записей, удаляемых за одну транзакцию
+        pause (float): Пауза между пакетами в секундах
+
+    Returns (int): общее кол-во удалённых записей
+    """
+
+    deleted_total = 0
+
+    if max_age_days > 0:
+        cutoff = convert_data(dt.datetime.now() - dt.timedelta(days=max_age_days))
+        while True:
+            deleted = History.delete_older_than(cutoff=cutoff, batch_size=batch_size)
+            deleted_total += deleted
+            if deleted < batch_size:
+                break
+            time.sleep(pause)
+
+    if max_per_user > 0:
+        with db:
+            heavy_users = [row[0] for row in (History
+                                              .select(History.user_id)
+                                              .group_by(History.user_id)
+                                              .having(fn.COUNT(History.id) > max_per_user)
+                                              .tuples())]
+
+        for user_id in heavy_users:
+            while True:
+                deleted = History.delete_over_limit(user_id=user_id, max_per_user=max_per_user,
+                                                    batch_size=batch_size)
+                deleted_total += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+
+    return deleted_total
+
+
+@logger.catch
+def purge_sessions(max_age_days: int = SESSION_MAX_AGE_DAYS,
+                   batch_size: int = RETENTION_BATCH_SIZE,
+                   pause: float = 0.05) -> int:
+    """
+    Функция, которая пакетами удаляет сессии поиска старше max_age_days дней
+    (кроме текущей сессии каждого пользователя) и брошенные диалоги поиска,
+    не изменявшиеся max_age_days дней.
+
+    Args:
+        max_age_days (int): Максимальный возраст сессий в днях (0 - без ограничения)
+        batch_size (int): Кол-во записей, удаляемых за одну транзакцию
+        pause (float): Пауза между пакетами в секундах
+
+    Returns (int): общее кол-во удалённых сессий и диалогов
+    """
+
+    deleted_total = 0
+
+    if max_age_days > 0:
+        cutoff = convert_data(dt.datetime.now() - dt.timedelta(days=max_age_days))
+        for model in (SearchSession, DialogState):
+            while True:
+                deleted = model.delete_stale(cutoff=cutoff, batch_size=batch_size)
+                deleted_total += deleted
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+
+    return deleted_total
+
+
+@logger.catch
+def incremental_vacuum(pages: int = 0) -> None:
+    """
+    Функция, которая возвращает освободившиеся страницы БД файловой системе.
+    Работает только для БД, созданных с auto_vacuum=INCREMENTAL.
+
+    Args:
+        pages (int): Кол-во освобождаемых страниц (0 - все свободные страницы)
+    """
+
+    with db.connection_context():
+        if db.execute_sql('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            logger.warning('Для БД не включён auto_vacuum=INCREMENTAL, '
+                           'освобождение места невозможно без полного VACUUM')
+            return
+
+        # executescript выполняет прагму до конца (execute освобождает лишь одну страницу)
+        db.connection().executescript('PRAGMA incremental_vacuum({pages});'.format(pages=int(pages)))
+
+
+@logger.catch
+def run_retention() -> None:
+    """
+    Функция, которая выполняет задачу очистки истории и сжатия БД.
+    """
+
+    deleted = purge_history()
+    deleted_sessions = purge_sessions()
+    incremental_vacuum()
+
+    logger.info('Очистка истории: удалено записей - {deleted}, сессий поиска - {sessions}'.format(
+        deleted=deleted, sessions=deleted_sessions))
+
+
+class RetentionScheduler(threading.Thread):
+    """
+    Фоновый поток, который периодически запускает задачу очистки истории
+    внутри процесса бота.
+    """
+
+    def __init__(self, interval: int = RETENTION_INTERVAL) -> None:
+        super().__init__(name='RetentionScheduler', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            run_retention()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
 def convert_data(value: Any) -> Any:
     """
     Функция конвертирует значение времени в формате timestamp в
@@ -186,20 +580,15 @@ def user_exists(user_id: int) -> bool:
     Returns (bool): Возвращает True, если пользователь уже есть в БД, иначе - False
     """
 
-    with db:
-        try:
-            User.get(User.user_id == user_id)
-            result = True
-        except User.DoesNotExist:
-            result = False
-
-    return result
+    return storage.user_exists(user_id)
 
 
 @logger.catch
 def set_searching_function(user_id: int, user_searching_function: str) -> None:
     """
-    Сеттер для установки функции поиска отелей и флага на дополнительные вопросы.
+    Функция, которая начинает новую сессию поиска с выбранной функцией
+    поиска отелей и флагом на дополнительные вопросы.
+    Параметры предыдущего поиска остаются в его сессии и не перезаписываются.
 
     Args:
         user_id (int): Принимает id пользователя из его команды или сообщения
@@ -207,13 +596,23 @@ def set_searching_function(user_id: int, user_searching_function: str) -> None:
                                         функцию поиска отелей
     """
 
-    with db:
-        if user_searching_function == 'bestdeal':
-            User(id=User.get_pk_id(user_id), advanced_question_flag=True).save()
-        else:
-            User(id=User.get_pk_id(user_id), advanced_question_flag=False).save()
+    storage.start_session(user_id,
+                          advanced_question_flag=user_searching_function == 'bestdeal',
+                          searching_function=user_searching_function)
+
+
+@logger.catch
+def get_session_data(user_id: int) -> dict:
+    """
+    Геттер для получения параметров текущей сессии поиска пользователя.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (dict): параметры текущего поиска (по умолчанию, если поисков ещё не было)
+    """
 
-        User(id=User.get_pk_id(user_id), searching_function=user_searching_function).save()
+    return storage.get_session(user_id) or dict(DEFAULT_SESSION_DATA)
 
 
 @logger.catch
@@ -231,12 +630,24 @@ def get_cities(message: Message) -> dict:
     cities = recurring.search_location(message)
 
     # Добавляем словарь городов в БД
-    with db:
-        User(id=User.get_pk_id(message.from_user.id), cities=cities).save()
+    set_cities(user_id=message.from_user.id, cities=cities)
 
     return cities
 
 
+@logger.catch
+def set_cities(user_id: int, cities: dict | None) -> None:
+    """
+    Сеттер для записи в БД словаря с вариантами найденных городов.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+        cities (dict | None): Принимает словарь с вариантами городов
+    """
+
+    storage.update_current_session(user_id, cities=cities)
+
+
 @logger.catch
 def set_city_id(user_id: int, user_city: str) -> None:
     """
@@ -247,12 +658,9 @@ def set_city_id(user_id: int, user_city: str) -> None:
         user_city (str): Принимает введённый пользователем город
     """
 
-    with db:
-        query = User.select(User.cities, User.id).where(User.user_id == user_id).execute()
-        for obj in query:
-            for city_name, city_data in obj.cities.items():
-                if city_data == user_city:
-                    User(id=obj.id, city_id=city_data, city_name=city_name).save()
+    for city_name, city_data in get_session_data(user_id)['cities'].items():
+        if city_data == user_city:
+            storage.update_current_session(user_id, city_id=city_data, city_name=city_name)
 
 
 @logger.catch
@@ -266,8 +674,7 @@ def get_city_id(user_id: int) -> str:
     Returns (str): id искомого пользователем города
     """
 
-    with db:
-        return User.get(User.user_id == user_id).city_id
+    return get_session_data(user_id)['city_id']
 
 
 @logger.catch
@@ -281,8 +688,7 @@ def get_advanced_question_flag(user_id: int) -> bool | None:
     Returns (bool | None): значение флага на наличие дополнительных вопросов
     """
 
-    with db:
-        return User.get(User.user_id == user_id).advanced_question_flag
+    return get_session_data(user_id)['advanced_question_flag']
 
 
 @logger.catch
@@ -295,8 +701,7 @@ def set_price_range(user_id: int, price_range: list) -> None:
         price_range (list): Принимает ценовой диапазон пользователя
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), price_range=price_range).save()
+    storage.update_current_session(user_id, price_range=price_range)
 
 
 @logger.catch
@@ -310,8 +715,7 @@ def get_price_range(user_id: int) -> list:
     Returns (list): ценовой диапазон, заданный пользователем
     """
 
-    with db:
-        return User.get(User.user_id == user_id).price_range
+    return get_session_data(user_id)['price_range']
 
 
 @logger.catch
@@ -324,8 +728,7 @@ def set_distance_range(user_id: int, dist_range: list) -> None:
         dist_range (list): Принимает диапазон расстояний от пользователя
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), dist_range=dist_range).save()
+    storage.update_current_session(user_id, dist_range=dist_range)
 
 
 @logger.catch
@@ -339,12 +742,26 @@ def get_distance_range(user_id: int) -> list:
     Returns (list): диапазон расстояний, заданный пользователем
     """
 
-    with db:
-        return User.get(User.user_id == user_id).dist_range
+    return get_session_data(user_id)['dist_range']
 
 
 @logger.catch
-def get_hotels(user_id: int) -> tuple:
+def get_user_data(user_id: int) -> dict:
+    """
+    Геттер для получения данных пользователя вместе с параметрами
+    его текущей сессии поиска.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (dict): данные пользователя и его текущего поиска в виде словаря
+    """
+
+    return {**get_session_data(user_id), **storage.get_user(user_id)}
+
+
+@logger.catch
+def get_hotels(user_id: int, user_data: dict | None = None) -> tuple:
     """
     Данная функция запрашивает словарь с вариантами отелей у функции
     search_hotels, записывает его в БД и возвращает либо кортеж,
@@ -352,18 +769,37 @@ def get_hotels(user_id: int) -> tuple:
 
     Args:
         user_id (int): Принимает id пользователя из его команды или сообщения
+        user_data (dict | None): Принимает уже прочитанные данные пользователя (иначе читаются из БД)
 
     Returns (tuple): кортеж, содержащий словарь с найденными отелями,
                         либо ничего.
     """
 
-    with db:
-        user_data = User.select().where(User.user_id == user_id).dicts().get()
+    if user_data is None:
+        user_data = get_user_data(user_id=user_id)
 
     searching_func = searching_functions[user_data['searching_function']]
     hotels_data = recurring.search_hotels(data=user_data, searching_func=searching_func)
 
-    if hotels_data[0]:
+    return save_search(user_id=user_id, user_data=user_data, hotels_data=hotels_data)
+
+
+@logger.catch
+def save_search(user_id: int, user_data: dict, hotels_data: tuple | None) -> tuple:
+    """
+    Функция, которая записывает найденные отели в историю поиска и возвращает
+    либо кортеж, содержащий словарь с найденными отелями, либо (None, None).
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+        user_data (dict): Принимает данные пользователя и его текущего поиска
+        hotels_data (tuple | None): Принимает результат функции поиска отелей
+
+    Returns (tuple): кортеж, содержащий словарь с найденными отелями,
+                        либо (None, None).
+    """
+
+    if hotels_data and hotels_data[0]:
         command_data, found_hotels = get_hotels_for_history(hotels_data=hotels_data, user_data=user_data)
         with db:
             History(
@@ -416,8 +852,7 @@ def set_hotels_count(user_id: int, user_hotels_count: int) -> None:
         user_hotels_count (int): Принимает введённое пользователем кол-во отелей
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), hotels_count=user_hotels_count).save()
+    storage.update_current_session(user_id, hotels_count=user_hotels_count)
 
 
 @logger.catch
@@ -431,8 +866,7 @@ def get_hotels_count(user_id: int) -> int | None:
     Returns (int | None): кол-во запрашиваемых пользователем отелей
     """
 
-    with db:
-        return User.get(User.user_id == user_id).hotels_count
+    return get_session_data(user_id)['hotels_count']
 
 
 @logger.catch
@@ -447,8 +881,7 @@ def set_needed_photo(user_id: int, user_needed_photo: bool | None) -> None:
                                             на вывод фотографий отелей
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), needed_photo=user_needed_photo).save()
+    storage.update_current_session(user_id, needed_photo=user_needed_photo)
 
 
 @logger.catch
@@ -464,8 +897,7 @@ def get_needed_photo(user_id: int) -> bool | None:
                             вывода фотографий отелей.
     """
 
-    with db:
-        return User.get(User.user_id == user_id).needed_photo
+    return get_session_data(user_id)['needed_photo']
 
 
 @logger.catch
@@ -481,8 +913,7 @@ def set_photos_count(user_id: int, user_photos_count: int) -> None:
     if user_photos_count > 10:
         raise ValueError('ValueError: user_photos_count must be <= 10')
     else:
-        with db:
-            User(id=User.get_pk_id(user_id), photos_count=user_photos_count).save()
+        storage.update_current_session(user_id, photos_count=user_photos_count)
 
 
 @logger.catch
@@ -496,12 +927,11 @@ def get_photos_count(user_id: int) -> int | None:
     Returns (int | None): кол-во фотографий для каждого отеля.
     """
 
-    with db:
-        return User.get(User.user_id == user_id).photos_count
+    return get_session_data(user_id)['photos_count']
 
 
 @logger.catch
-def get_photos(user_id: int, hotel_id: int, text: str) -> list:
+def get_photos(user_id: int, hotel_id: int, text: str, user_data: dict | None = None) -> list:
     """
     Данная функция запрашивает список url-адресов фотографий отеля
     у функции search_photos и возвращает список фотографий отеля.
@@ -510,29 +940,158 @@ def get_photos(user_id: int, hotel_id: int, text: str) -> list:
         user_id (int): Принимает id пользователя из его команды или сообщения
         hotel_id (int): Принимает id отеля
         text (str): Принимает информацию об отеле
+        user_data (dict | None): Принимает уже прочитанные данные пользователя (иначе читаются из БД)
 
     Returns (list): Возвращает список фотографий отеля
     """
 
-    with db:
-        user_data = User.select().where(User.user_id == user_id).dicts().get()
+    if user_data is None:
+        user_data = get_user_data(user_id=user_id)
 
     photos = recurring.search_photos(data=user_data, hotel_id=hotel_id)
+
+    return photos_media(photos=photos, text=text)
+
+
+def photos_media(photos: list, text: str) -> list:
+    """
+    Функция, которая формирует из url-адресов фотографий отеля альбом
+    для отправки в Telegram (описание отеля - подпись к первой фотографии).
+    Уже отправленные фотографии передаются по file_id (см. save_photo_files),
+    размер остальных выбирается модулем photo_sizes (самый большой, который примет Telegram).
+
+    Args:
+        photos (list): Принимает список фотографий отеля от Hotels API
+        text (str): Принимает информацию об отеле
+
+    Returns (list): Возвращает список фотографий отеля
+    """
+
+    templates = [photo['baseUrl'] for photo in photos]
+    file_ids = get_photo_files(templates=templates)
+    sizes = negotiator.sizes([template for template in templates if template not in file_ids])
+
+    return album_media(templates=templates, file_ids=file_ids, sizes=sizes, text=text)
+
+
+def album_media(templates: list[str], file_ids: dict[str, str], sizes: dict[str, str], text: str) -> list:
+    """
+    Функция, которая формирует альбом фотографий отеля из уже найденных file_id
+    и выбранных размеров (без запросов к БД и к фотографиям, см. photos_media).
+
+    Args:
+        templates (list): Принимает шаблоны адресов фотографий отеля
+        file_ids (dict): Принимает file_id уже отправленных фотографий {шаблон: file_id}
+        sizes (dict): Принимает выбранные размеры остальных фотографий {шаблон: размер}
+        text (str): Принимает информацию об отеле
+
+    Returns (list): Возвращает список фотографий отеля
+    """
+
     hotels_photos = list()
 
-    for photo in photos:
+    for template in templates:
+        if template in file_ids:
+            media = file_ids[template]
+        elif sizes[template]:
+            media = template.replace('{size}', sizes[template])
+        else:
+            continue
+
         if not hotels_photos:
             hotels_photos.append(InputMediaPhoto(caption=text,
-                                                 media=photo['baseUrl'].replace('{size}', 'w'),
+                                                 media=media,
                                                  parse_mode='HTML'
                                                  )
                                  )
         else:
-            hotels_photos.append(InputMediaPhoto(media=photo['baseUrl'].replace('{size}', 'w')))
+            hotels_photos.append(InputMediaPhoto(media=media))
 
     return hotels_photos
 
 
+def is_photo_url(media: str) -> bool:
+    """
+    Функция, которая отличает адрес фотографии от file_id.
+    """
+
+    return media.startswith(('http://', 'https://'))
+
+
+def get_photo_files(templates: list) -> dict[str, str]:
+    """
+    Функция, которая возвращает file_id уже отправленных фотографий:
+    сначала из LRU-кэша, остальные - одним запросом к БД.
+
+    Args:
+        templates (list): Принимает шаблоны адресов фотографий
+
+    Returns (dict): {шаблон адреса: file_id} для найденных фотографий
+    """
+
+    file_ids = dict()
+    missing = list()
+    for template in templates:
+        file_id = photo_files_cache.get(template)
+        if file_id is None:
+            missing.append(template)
+        else:
+            file_ids[template] = file_id
+
+    if missing:
+        with db:
+            rows = PhotoFile.select(PhotoFile.template, PhotoFile.file_id).where(PhotoFile.template.in_(missing))
+            for template, file_id in rows.tuples():
+                photo_files_cache.put(template, file_id)
+                file_ids[template] = file_id
+
+    return file_ids
+
+
+@logger.catch
+def save_photo_files(media: list, messages: list) -> None:
+    """
+    Функция, которая запоминает file_id фотографий, отправленных по адресу,
+    из ответа Telegram на send_media_group.
+
+    Args:
+        media (list): Принимает отправленный альбом (список InputMediaPhoto)
+        messages (list): Принимает сообщения из ответа Telegram (в том же порядке)
+    """
+
+    rows = [{'template': base_url(obj.media), 'file_id': message.photo[-1].file_id}
+            for obj, message in zip(media, messages) if is_photo_url(obj.media) and message.photo]
+    if not rows:
+        return
+
+    with db:
+        PhotoFile.insert_many(rows).on_conflict_replace().execute()
+    for row in rows:
+        photo_files_cache.put(row['template'], row['file_id'])
+
+
+@logger.catch
+def forget_photo_files(media: list) -> None:
+    """
+    Функция, которая удаляет file_id фотографий альбома, отклонённого Telegram,
+    и забывает выбранные размеры остальных его фотографий.
+
+    Args:
+        media (list): Принимает отклонённый альбом (список InputMediaPhoto)
+    """
+
+    negotiator.forget(urls=[obj.media for obj in media if is_photo_url(obj.media)])
+
+    file_ids = [obj.media for obj in media if not is_photo_url(obj.media)]
+    if file_ids:
+        with db:
+            templates = [row[0] for row in PhotoFile.select(PhotoFile.template)
+                         .where(PhotoFile.file_id.in_(file_ids)).tuples()]
+            PhotoFile.delete().where(PhotoFile.file_id.in_(file_ids)).execute()
+        for template in templates:
+            photo_files_cache.pop(template)
+
+
 @logger.catch
 def set_language(user_id: int, user_language: str) -> None:
     """
@@ -543,8 +1102,7 @@ def set_language(user_id: int, user_language: str) -> None:
         user_language (int): Принимает введённый пользователем язык
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), language=user_language, lang_flag=True).save()
+    storage.update_user(user_id, language=user_language, lang_flag=True)
 
 
 @logger.catch
@@ -558,8 +1116,7 @@ def get_language(user_id: int) -> str:
     Returns (str): язык пользователя
     """
 
-    with db:
-        return User.get(User.user_id == user_id).language
+    return storage.get_user(user_id)['language']
 
 
 @logger.catch
@@ -572,8 +1129,7 @@ def set_currency(user_id: int, user_currency: str) -> None:
         user_currency (int): Принимает введённую пользователем валюту
     """
 
-    with db:
-        User(id=User.get_pk_id(user_id), currency=user_currency, cur_flag=True).save()
+    storage.update_user(user_id, currency=user_currency, cur_flag=True)
 
 
 @logger.catch
@@ -587,8 +1143,49 @@ def get_currency(user_id: int) -> str:
     Returns (str): валюту пользователя
     """
 
-    with db:
-        return User.get(User.user_id == user_id).currency
+    return storage.get_user(user_id)['currency']
+
+
+@logger.catch
+def update_dates(user_id: int, **dates: dt.date | None) -> None:
+    """
+    Сеттер для установки дат заезда и/или выезда.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+        **dates: Именованные аргументы date_in и/или date_out
+    """
+
+    storage.update_current_session(user_id, **dates)
+
+
+@logger.catch
+def get_dates(user_id: int) -> tuple:
+    """
+    Геттер для получения дат заезда и выезда.
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+
+    Returns (tuple): кортеж из даты заезда и даты выезда
+    """
+
+    session_data = get_session_data(user_id)
+
+    return session_data['date_in'], session_data['date_out']
+
+
+@logger.catch
+def reset_search_data(user_id: int) -> None:
+    """
+    Функция, которая сбрасывает настройки пользователя к значениям
+    по умолчанию и начинает для него пустую сессию поиска (в БД и в кэше).
+
+    Args:
+        user_id (int): Принимает id пользователя из его команды или сообщения
+    """
+
+    storage.reset_user(user_id)
 
 
 @logger.catch
@@ -603,8 +1200,7 @@ def add_user(user_id: int, first_name: str, last_name: str, date: int) -> None:
         date (int): Принимает дату команды или сообщения в формате Timestamp
     """
 
-    with db:
-        User(user_id=user_id, first_name=first_name, last_name=last_name, join_date=date).save()
+    storage.add_user(user_id, first_name, last_name, convert_data(date))
 
 
 @logger.catch
@@ -624,44 +1220,65 @@ def add_message(user_id: int,  date: int, command: str = '', message: str = '')
 
 
 @logger.catch
-def get_history(user_id: int, within: str) -> Any:
+def get_history_page(user_id: int, within: str, cursor: tuple | None = None,
+                     page_size: int = HISTORY_PAGE_SIZE) -> tuple:
     """
-    Функция, которая получает историю команд и запросов пользователя из БД.
+    Функция, которая получает одну страницу истории команд и запросов
+    пользователя из БД (от новых записей к старым).
+    Использует keyset-пагинацию по паре (date, id), поэтому каждая страница -
+    это один запрос по индексу, независимо от объёма истории.
 
     Args:
         user_id (int): Принимает id пользователя из его команды или сообщения
-
         within (str): Принимает значения last(последний), day(день), week(неделя),
                         за которые нужно запросить историю
+        cursor (tuple | None): Курсор (timestamp, id) последней выведенной записи,
+                                None - первая страница
+        page_size (int): Кол-во записей на странице
 
-    Returns (Model): Возвращает историю команд и запросов пользователя
+    Returns (tuple): кортеж из списка записей и курсора следующей страницы
+                        (None, если записей больше нет)
     """
 
     if within == 'last':
-        with db:
-            result = History.select().where(History.user_id == user_id).order_by(History.date.desc()).limit(1).dicts()
-    elif within == 'day':
-        day_ago = dt.date.today() - dt.timedelta(days=1)
-        with db:
-            result = History.select().where((History.user_id == user_id) & (History.date >= day_ago)).dicts()
-    elif within == 'week':
-        day_ago = dt.date.today() - dt.timedelta(days=7)
-        with db:
-            result = History.select().where((History.user_id == user_id) & (History.date >= day_ago)).dicts()
+        page_size, cursor = 1, None
 
-    return result
+    query = History.select().where(History.user_id == user_id)
+
+    if within in ('day', 'week'):
+        days_ago = dt.date.today() - dt.timedelta(days=1 if within == 'day' else 7)
+        query = query.where(History.date >= days_ago)
+
+    if cursor:
+        timestamp, last_id = cursor
+        query = query.where(Tuple(History.date, History.id) < (convert_data(timestamp), last_id))
+
+    with db:
+        records = list(query.order_by(History.date.desc(), History.id.desc()).limit(page_size + 1).dicts())
+
+    if within == 'last' or len(records) <= page_size:
+        return records[:page_size], None
+
+    records = records[:page_size]
+    next_cursor = (int(records[-1]['date'].timestamp()), records[-1]['id'])
+
+    return records, next_cursor
 
 
 if __name__ == '__main__':
 
-    # Создаём аргумент force для командной строки
+    # Создаём аргументы force и retention для командной строки
     parser = argparse.ArgumentParser()
     parser.add_argument('--force',
                         action='store_true',
                         help='ВНИМАНИЕ! Аргумент "--force" полностью обнуляет все таблицы в БД'
                         )
+    parser.add_argument('--retention',
+                        action='store_true',
+                        help='Удаляет устаревшую историю поиска и освобождает место в БД'
+                        )
 
-    # Принимаем аргумент force из командной строки
+    # Принимаем аргументы из командной строки
     args = parser.parse_args()
     user_args = args.force
 
@@ -670,3 +1287,6 @@ if __name__ == '__main__':
         logger.info('Таблицы БД были полностью удалены и созданы заново')
     else:
         init_db()
+
+    if args.retention:
+        run_retention()
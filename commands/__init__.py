@@ -1,4 +1,5 @@
 __all__ = [
+    'async_recurring',
     'bestdeal',
     'calendar',
     'hilowprice',
@@ -0,0 +1,116 @@
+"""
+Модуль асинхронного клиента Hotels API для асинхронного бота.
+Отправляет те же запросы, что и функции модулей recurring, hilowprice
+и bestdeal, но через aiohttp, и разбирает ответы теми же функциями.
+"""
+
+import asyncio
+import functools
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from loguru import logger
+
+from commands import bestdeal, hilowprice, recurring
+import metrics
+
+
+# Функции, формирующие параметры запроса отелей для каждой команды поиска
+hotels_queries = {'lowprice': functools.partial(hilowprice.hotels_query, 'PRICE'),
+                  'highprice': functools.partial(hilowprice.hotels_query, 'PRICE_HIGHEST_FIRST'),
+                  'bestdeal': bestdeal.hotels_query
+                  }
+
+
+class HotelsClient:
+    """
+    Асинхронный клиент Hotels API. Все запросы выполняются через одну
+    сессию aiohttp с общим пулом соединений, которая создаётся при первом запросе.
+    """
+
+    def __init__(self, timeout: float = 10, limit: int = 100) -> None:
+        self.timeout = timeout
+        self.limit = limit
+        self._session: aiohttp.ClientSession | None = None
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @logger.catch
+    async def search_location(self, query: str) -> dict:
+        """
+        Функция, которая выполняет поиск городов (аналог recurring.search_location).
+
+        Args:
+            query (str): Принимает введённое пользователем название города
+
+        Returns:
+            словарь с вариантами городов
+        """
+
+        status, text = await self._get(recurring.city_url, {'query': query, 'locale': 'ru_RU'})
+
+        return recurring.parse_locations(status, text)
+
+    @logger.catch
+    async def search_hotels(self, data: dict) -> tuple:
+        """
+        Функция, которая выполняет поиск отелей (аналог recurring.search_hotels).
+
+        Args:
+            data (dict): критерии поиска, заданные пользователем
+
+        Returns:
+            кортеж, содержащий словарь с найденными отелями
+        """
+
+        querystring, url = hotels_queries[data['searching_function']](**recurring.searching_kwargs(data))
+        status, text = await self._get(recurring.hotel_url, querystring)
+
+        if data['searching_function'] == 'bestdeal':
+            found_hotels = bestdeal.filter_hotels(status, text, data['dist_range'])
+            if found_hotels is None:
+                return None, None
+            return bestdeal.hotels_glossary(found_hotels), url
+
+        return hilowprice.parse_hotels(status, text, url)
+
+    @logger.catch
+    async def search_photos(self, data: dict, hotel_id: int) -> list:
+        """
+        Функция, которая выполняет поиск фотографий отеля (аналог recurring.search_photos).
+
+        Args:
+            data (dict): критерии поиска, заданные пользователем
+            hotel_id (int): id отеля
+
+        Returns:
+            список url-адресов фотографий отеля
+        """
+
+        status, text = await self._get(recurring.photo_url, {'id': hotel_id})
+
+        return recurring.parse_photos(status, text, data['photos_count'])
+
+    async def _get(self, url: str, params: dict) -> tuple[int, str]:
+        if self._session is None:
+            self._session = aiohttp.ClientSession(headers=recurring.headers,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                                  connector=aiohttp.TCPConnector(limit=self.limit))
+
+        # aiohttp принимает в параметрах запроса только строки и числа
+        params = {name: str(value) for name, value in params.items()}
+        endpoint = urlsplit(url).path
+        start = time.perf_counter()
+        try:
+            async with self._session.get(url, params=params) as response:
+                text = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            metrics.observe_upstream(endpoint, 'error', time.perf_counter() - start)
+            raise
+
+        metrics.observe_upstream(endpoint, response.status, time.perf_counter() - start)
+        return response.status, text
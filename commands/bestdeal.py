@@ -10,6 +10,94 @@ import re
 from loguru import logger
 import requests
 
+from commands.recurring import api_request
+
+
+def hotels_query(**ud) -> tuple:
+    """
+    Функция, которая формирует параметры HTTP-запроса отелей к Hotels API
+    и ссылку на результаты поиска на hotels.com.
+
+    Args:
+        **ud: (сокр. от UserData) - Именованные аргументы (см. bestdeal)
+
+    Returns (tuple): параметры запроса и ссылка на результаты поиска
+    """
+
+    querystring = {"destinationId": ud['user_city_id'], "pageNumber": "1", "pageSize": str(ud['hotels_count']),
+                   "checkIn": ud['check_in'], "checkOut": ud['check_out'], "adults1": "1",
+                   "sortOrder": "DISTANCE_FROM_LANDMARK", "locale": "{}".format(ud['language']),
+                   "currency": ud['currency'], 'priceMin': min(json.loads(ud['price_range'])),
+                   'priceMax': max(json.loads(ud['price_range']))
+                   }
+
+    url = (f"""https://hotels.com/search.do?destination-id={ud['user_city_id']}&q-check-in={ud['check_in']}
+&q-check-out={ud['check_out']}&q-rooms=1&q-room-0-adults=2&q-room-0-children=0
+&f-price-min={min(json.loads(ud['price_range']))}&f-price-max={max(json.loads(ud['price_range']))}
+&f-price-multiplier=1&sort-order={querystring["sortOrder"]}""")
+
+    return querystring, url
+
+
+def filter_hotels(status_code: int, text: str, dist_range: str) -> list | None:
+    """
+    Функция, которая разбирает ответ Hotels API на запрос одной страницы
+    отелей и отбирает отели, подходящие по расстоянию от центра.
+
+    Args:
+        status_code (int): HTTP-статус ответа
+        text (str): тело ответа
+        dist_range (str): диапазон расстояний от центра (JSON-список)
+
+    Returns (list | None): список подходящих отелей или None, если отелей нет
+    """
+
+    if status_code == requests.codes.ok:
+        check = re.search(r'(?<=,)\"results\".+?(?=,\"pagination)', text)
+
+        if check:
+            data = json.loads(text)
+            hotels_catalog = data['data']['body']['searchResults']['results']
+
+            if not hotels_catalog:
+                return None
+
+            found_hotels = list()
+            for hotel in hotels_catalog:
+                distance = re.findall(r'\d[,.]?\d', hotel['landmarks'][0]['distance'])[0].replace(',', '.')
+
+                if float(distance) > float(max(json.loads(dist_range))):
+                    raise ValueError('Превышено максимальное расстояние от центра города')
+                elif float(distance) > float(min(json.loads(dist_range))):
+                    found_hotels.append(hotel)
+
+            return found_hotels
+        else:
+            raise ValueError('Ошибка сервера! В JSON ключи не обнаружены.')
+    else:
+        raise ValueError('Ошибка сервера! Статус код не "200 ОК".')
+
+
+def hotels_glossary(found_hotels: list) -> dict:
+    """
+    Функция, которая формирует словарь найденных отелей {название: данные отеля}.
+
+    Args:
+        found_hotels (list): список отелей из ответа Hotels API
+
+    Returns (dict): словарь найденных отелей
+    """
+
+    return {
+        hotel['name']: {
+            'id': hotel['id'], 'name': hotel['name'], 'stars': hotel['starRating'],
+            'address': hotel['address'], 'landmarks': hotel['landmarks'],
+            'price': hotel['ratePlan']['price'].get('current')
+            if hotel.get('ratePlan', None)
+            else '-', 'coordinate': '+'.join(map(str, hotel['coordinate'].values()))
+        } for hotel in found_hotels
+    }
+
 
 @logger.catch
 def bestdeal(**ud) -> tuple:
@@ -33,55 +121,18 @@ def bestdeal(**ud) -> tuple:
     Returns (tuple): кортеж, содержащий словарь с найденными отелями
     """
 
-    querystring = {"destinationId": ud['user_city_id'], "pageNumber": "1", "pageSize": str(ud['hotels_count']),
-                   "checkIn": ud['check_in'], "checkOut": ud['check_out'], "adults1": "1",
-                   "sortOrder": "DISTANCE_FROM_LANDMARK", "locale": "{}".format(ud['language']),
-                   "currency": ud['currency'], 'priceMin': min(json.loads(ud['price_range'])),
-                   'priceMax': max(json.loads(ud['price_range']))
-                   }
-
-    url = (f"""https://hotels.com/search.do?destination-id={ud['user_city_id']}&q-check-in={ud['check_in']}
-&q-check-out={ud['check_out']}&q-rooms=1&q-room-0-adults=2&q-room-0-children=0
-&f-price-min={min(json.loads(ud['price_range']))}&f-price-max={max(json.loads(ud['price_range']))}
-&f-price-multiplier=1&sort-order={querystring["sortOrder"]}""")
+    querystring, url = hotels_query(**ud)
 
     found_hotels = list()
 
     while len(found_hotels) < ud['hotels_count']:
-        response = requests.request("GET", ud['hotel_url'], headers=ud['headers'], params=querystring, timeout=10)
-
-        if response.status_code == requests.codes.ok:
-            check = re.search(r'(?<=,)\"results\".+?(?=,\"pagination)', response.text)
-
-            if check:
-                data = json.loads(response.text)
-                hotels_catalog = data['data']['body']['searchResults']['results']
-
-                if not hotels_catalog:
-                    return None, None
+        response = api_request(ud['hotel_url'], querystring, headers=ud['headers'])
 
-                for hotel in hotels_catalog:
-                    distance = re.findall(r'\d[,.]?\d', hotel['landmarks'][0]['distance'])[0].replace(',', '.')
+        page_hotels = filter_hotels(response.status_code, response.text, ud['dist_range'])
+        if page_hotels is None:
+            return None, None
 
-                    if float(distance) > float(max(json.loads(ud['dist_range']))):
-                        raise ValueError('Превышено максимальное расстояние от центра города')
-                    elif float(distance) > float(min(json.loads(ud['dist_range']))):
-                        found_hotels.append(hotel)
+        found_hotels.extend(page_hotels)
+        querystring['pageNumber'] = str(int(querystring.get('pageNumber')) + 1)
 
-                querystring['pageNumber'] = str(int(querystring.get('pageNumber')) + 1)
-
-                hotels_glossary = {
-                    hotel['name']: {
-                        'id': hotel['id'], 'name': hotel['name'], 'stars': hotel['starRating'],
-                        'address': hotel['address'], 'landmarks': hotel['landmarks'],
-                        'price': hotel['ratePlan']['price'].get('current')
-                        if hotel.get('ratePlan', None)
-                        else '-', 'coordinate': '+'.join(map(str, hotel['coordinate'].values()))
-                    } for hotel in found_hotels
-                }
-
-                return hotels_glossary, url
-            else:
-                raise ValueError('Ошибка сервера! В JSON ключи не обнаружены.')
-        else:
-            raise ValueError('Ошибка сервера! Статус код не "200 ОК".')
+        return hotels_glossary(found_hotels), url
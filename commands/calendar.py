@@ -1,9 +1,20 @@
 """
 Модуль пользовательских настроек для календаря.
+Клавиатуры календаря запоминаются (они зависят только от id календаря, языка,
+минимальной даты, шага и видимого периода, а callback_data кнопок не содержит
+случайной добавки), а минимальная дата передаётся в
+callback_data кнопок, поэтому нажатия на кнопки календаря не читают БД
+и не строят клавиатуру заново.
 """
 
+import datetime as dt
+from typing import Callable
+
+from config import CALENDAR_CACHE_SIZE
+from router import callback_data
 from settings import emoji
-from telegram_bot_calendar import DetailedTelegramCalendar
+from storage import LRUCache
+from telegram_bot_calendar import DetailedTelegramCalendar, DAY
 
 
 # Переопределение словаря названий даты DetailedTelegramCalendar
@@ -19,3 +30,60 @@ class MyStyleCalendar(DetailedTelegramCalendar):
     # Не показывать пустые ячейки при выборе года и месяца
     empty_month_button = ""
     empty_year_button = ""
+
+    # Готовые клавиатуры {(id календаря, язык, мин. и макс. даты, шаг, начало видимого периода): клавиатура}
+    keyboards = LRUCache(maxsize=CALENDAR_CACHE_SIZE)
+
+    @staticmethod
+    def prefix(calendar_id: int) -> str:
+        """
+        Возвращает префикс callback_data кнопок календаря для маршрутизатора нажатий (router.py).
+        """
+
+        return 'cal{}'.format(calendar_id)
+
+    @staticmethod
+    def func(calendar_id: int = 0, telethon: bool = False) -> Callable:
+        start = callback_data(MyStyleCalendar.prefix(calendar_id), '')
+        return lambda call: call.data.startswith(start)
+
+    @staticmethod
+    def encode_date(value: dt.date) -> str:
+        """
+        Возвращает дату в виде строки для callback_data (2026-10-19 -> "20261019").
+        """
+
+        return value.strftime('%Y%m%d')
+
+    @staticmethod
+    def decode_date(value: str) -> dt.date:
+        """
+        Возвращает дату из строки encode_date ("20261019" -> 2026-10-19).
+        """
+
+        return dt.datetime.strptime(value, '%Y%m%d').date()
+
+    def _build(self, step: str | None = None, **kwargs) -> None:
+        step = step or self.first_step
+
+        # Клавиатура выбора года и месяца зависит только от года, выбора дня - от месяца,
+        # поэтому дата приводится к началу видимого периода
+        self.current_date = self.current_date.replace(month=self.current_date.month if step == DAY else 1, day=1)
+        key = (self.calendar_id, self.locale, self.min_date, self.max_date, step, self.current_date)
+
+        keyboard = self.keyboards.get(key)
+        if keyboard is None:
+            super()._build(step=step, **kwargs)
+            self.keyboards.put(key, self._keyboard)
+        else:
+            self.step = step
+            self._keyboard = keyboard
+
+    def _build_callback(self, *args, **kwargs) -> str:
+        # "cbcal_1_s_d_2026_10_19" -> "cal1:20261019:cbcal_1_s_d_2026_10_19" (с минимальной датой календаря),
+        # обработчик нажатия получает минимальную дату и данные для process.
+        # Клавиатуры общие для всех пользователей (см. keyboards), поэтому случайная добавка
+        # к callback_data (is_random) не используется
+        kwargs['is_random'] = False
+        return callback_data(self.prefix(self.calendar_id), self.encode_date(self.min_date),
+                             super()._build_callback(*args, **kwargs))
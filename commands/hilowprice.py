@@ -10,43 +10,50 @@ import re
 from loguru import logger
 import requests
 
+from commands.recurring import api_request
 
-@logger.catch
-def lowprice(**ud) -> tuple:
+
+def hotels_query(sort_order: str, **ud) -> tuple:
     """
-    Функция, которая формирует и отправляет HTTP-запрос вариантов самых
-    дешёвых отелей к Hotels API и возвращает либо кортеж, либо ничего.
+    Функция, которая формирует параметры HTTP-запроса отелей к Hotels API
+    и ссылку на результаты поиска на hotels.com.
 
     Args:
-        **ud: (сокр. от UserData) - Именованные аргументы, где
-            user_city_id (str): id города
-            language (str): язык пользователя
-            currency (str): валюта пользователя
-            hotels_count (int): кол-во отелей
-            hotel_url (str): ссылка на отель
-            headers (dict): необходимые заголовки
-            check_in (str): дата заезда
-            check_out (str): дата выезда
+        sort_order (str): порядок сортировки отелей (PRICE или PRICE_HIGHEST_FIRST)
+        **ud: (сокр. от UserData) - Именованные аргументы (см. lowprice)
 
-    Returns:
-        кортеж, содержащий словарь с найденными отелями
+    Returns (tuple): параметры запроса и ссылка на результаты поиска
     """
 
     querystring = {"destinationId": ud['user_city_id'], "pageNumber": "1", "pageSize": str(ud['hotels_count']),
-                   "checkIn": ud['check_in'], "checkOut": ud['check_out'], "adults1": "1", "sortOrder": "PRICE",
+                   "checkIn": ud['check_in'], "checkOut": ud['check_out'], "adults1": "1", "sortOrder": sort_order,
                    "locale": "{}".format(ud['language']), "currency": ud['currency']
                    }
 
     url = (f"""https://hotels.com/search.do?destination-id={ud['user_city_id']}&q-check-in={ud['check_in']}
 &q-check-out={ud['check_out']}&q-rooms=1&q-room-0-adults=2&q-room-0-children=0&sort-order={querystring["sortOrder"]}""")
 
-    response = requests.request("GET", ud['hotel_url'], headers=ud['headers'], params=querystring, timeout=10)
+    return querystring, url
 
-    if response.status_code == requests.codes.ok:
-        check = re.search(r'(?<=,)\"results\".+?(?=,\"pagination)', response.text)
+
+def parse_hotels(status_code: int, text: str, url: str) -> tuple:
+    """
+    Функция, которая разбирает ответ Hotels API на запрос отелей.
+
+    Args:
+        status_code (int): HTTP-статус ответа
+        text (str): тело ответа
+        url (str): ссылка на результаты поиска на hotels.com
+
+    Returns:
+        кортеж, содержащий словарь с найденными отелями и ссылку на них
+    """
+
+    if status_code == requests.codes.ok:
+        check = re.search(r'(?<=,)\"results\".+?(?=,\"pagination)', text)
 
         if check:
-            data = json.loads(response.text)
+            data = json.loads(text)
             hotels_catalog = data['data']['body']['searchResults']['results']
 
             if not hotels_catalog:
@@ -69,10 +76,10 @@ def lowprice(**ud) -> tuple:
 
 
 @logger.catch
-def highprice(**ud) -> tuple:
+def lowprice(**ud) -> tuple:
     """
     Функция, которая формирует и отправляет HTTP-запрос вариантов самых
-    дорогих отелей к Hotels API и возвращает либо кортеж, либо ничего.
+    дешёвых отелей к Hotels API и возвращает либо кортеж, либо ничего.
 
     Args:
         **ud: (сокр. от UserData) - Именованные аргументы, где
@@ -89,37 +96,36 @@ def highprice(**ud) -> tuple:
         кортеж, содержащий словарь с найденными отелями
     """
 
-    querystring = {"destinationId": ud['user_city_id'], "pageNumber": "1", "pageSize": str(ud['hotels_count']),
-                   "checkIn": ud['check_in'], "checkOut": ud['check_out'], "adults1": "1",
-                   "sortOrder": "PRICE_HIGHEST_FIRST", "locale": "{}".format(ud['language']), "currency": ud['currency']
-                   }
+    querystring, url = hotels_query('PRICE', **ud)
 
-    url = (f"""https://hotels.com/search.do?destination-id={ud['user_city_id']}&q-check-in={ud['check_in']}
-&q-check-out={ud['check_out']}&q-rooms=1&q-room-0-adults=2&q-room-0-children=0&sort-order={querystring["sortOrder"]}""")
+    response = api_request(ud['hotel_url'], querystring, headers=ud['headers'])
 
-    response = requests.request("GET", ud['hotel_url'], headers=ud['headers'], params=querystring, timeout=10)
+    return parse_hotels(response.status_code, response.text, url)
 
-    if response.status_code == requests.codes.ok:
-        check = re.search(r'(?<=,)\"results\".+?(?=,\"pagination)', response.text)
 
-        if check:
-            data = json.loads(response.text)
-            hotels_catalog = data['data']['body']['searchResults']['results']
+@logger.catch
+def highprice(**ud) -> tuple:
+    """
+    Функция, которая формирует и отправляет HTTP-запрос вариантов самых
+    дорогих отелей к Hotels API и возвращает либо кортеж, либо ничего.
 
-            if not hotels_catalog:
-                return None, None
+    Args:
+        **ud: (сокр. от UserData) - Именованные аргументы, где
+            user_city_id (str): id города
+            language (str): язык пользователя
+            currency (str): валюта пользователя
+            hotels_count (int): кол-во отелей
+            hotel_url (str): ссылка на отель
+            headers (dict): необходимые заголовки
+            check_in (str): дата заезда
+            check_out (str): дата выезда
 
-            hotels_glossary = {
-                hotel['name']: {
-                    'id': hotel['id'], 'name': hotel['name'], 'stars': hotel['starRating'], 'address': hotel['address'],
-                    'landmarks': hotel['landmarks'], 'price': hotel['ratePlan']['price'].get('current')
-                    if hotel.get('ratePlan', None)
-                    else '-', 'coordinate': '+'.join(map(str, hotel['coordinate'].values()))
-                } for hotel in hotels_catalog
-            }
+    Returns:
+        кортеж, содержащий словарь с найденными отелями
+    """
 
-            return hotels_glossary, url
-        else:
-            raise ValueError('Ошибка сервера! В JSON ключи не обнаружены.')
-    else:
-        raise ValueError('Ошибка сервера! Статус код не "200 ОК".')
+    querystring, url = hotels_query('PRICE_HIGHEST_FIRST', **ud)
+
+    response = api_request(ud['hotel_url'], querystring, headers=ud['headers'])
+
+    return parse_hotels(response.status_code, response.text, url)
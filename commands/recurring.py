@@ -5,24 +5,23 @@
 
 import json
 import re
+import time
 from typing import Callable
+from urllib.parse import urlsplit
 
 from loguru import logger
 import requests
 from telebot.types import Message
 
-from config import API_HOST, API_KEY
+from config import API_HOST, API_KEY, HOTELS_API_URL
+import metrics
 
 
 # Ссылки, которые используются для поиска города, отеля и фотографии
-city_url = 'https://hotels4.p.rapidapi.com/locations/v2/search'
-hotel_url = 'https://hotels4.p.rapidapi.com/properties/list'
-photo_url = 'https://hotels4.p.rapidapi.com/properties/get-hotel-photos'
-
-# TODO не забыть после тестов удалить ссылки на url Postman Mock server
-# city_url = 'https://71e385c7-4d1e-4c1d-8fa7-09b16043b9ab.mock.pstmn.io/locations/v2/search'
-# hotel_url = 'https://71e385c7-4d1e-4c1d-8fa7-09b16043b9ab.mock.pstmn.io/properties/list'
-# photo_url = 'https://71e385c7-4d1e-4c1d-8fa7-09b16043b9ab.mock.pstmn.io/properties/get-hotel-photos'
+# (базовый адрес HOTELS_API_URL - Hotels API или локальный тестовый сервер tools/hotels_stub.py)
+city_url = HOTELS_API_URL.rstrip('/') + '/locations/v2/search'
+hotel_url = HOTELS_API_URL.rstrip('/') + '/properties/list'
+photo_url = HOTELS_API_URL.rstrip('/') + '/properties/get-hotel-photos'
 
 
 # Заголовки запроса при обращении к rapidapi.com
@@ -31,6 +30,31 @@ headers = {'x-rapidapi-host': API_HOST,
            }
 
 
+def api_request(url: str, params: dict, headers: dict = headers) -> requests.Response:
+    """
+    Функция, которая выполняет GET-запрос к Hotels API и учитывает его время
+    и статус ответа в метриках (метод API - путь адреса запроса).
+
+    Args:
+        url (str): Принимает адрес метода Hotels API
+        params (dict): Принимает параметры запроса
+        headers (dict): Принимает заголовки запроса
+
+    Returns (requests.Response): ответ Hotels API
+    """
+
+    endpoint = urlsplit(url).path
+    start = time.perf_counter()
+    try:
+        response = requests.request("GET", url, headers=headers, params=params, timeout=10)
+    except requests.RequestException:
+        metrics.observe_upstream(endpoint, 'error', time.perf_counter() - start)
+        raise
+
+    metrics.observe_upstream(endpoint, response.status_code, time.perf_counter() - start)
+    return response
+
+
 @logger.catch
 def search_location(message: Message) -> dict:
     """
@@ -44,15 +68,45 @@ def search_location(message: Message) -> dict:
         словарь с вариантами городов
     """
 
-    querystring = {"query": message.text, "locale": "ru_RU"}
+    return find_cities(query=message.text)
+
+
+def find_cities(query: str) -> dict:
+    """
+    Функция, которая выполняет поиск городов по названию (без сообщения пользователя,
+    например, для inline-режима).
+
+    Args:
+        query (str): Принимает название города
+
+    Returns:
+        словарь с вариантами городов
+    """
+
+    querystring = {"query": query, "locale": "ru_RU"}
+
+    response = api_request(city_url, querystring)
 
-    response = requests.request("GET", city_url, headers=headers, params=querystring, timeout=10)
+    return parse_locations(response.status_code, response.text)
 
-    if response.status_code == requests.codes.ok:
-        check = re.search(r'(?<=\"CITY_GROUP\",).+?]', response.text)
+
+def parse_locations(status_code: int, text: str) -> dict:
+    """
+    Функция, которая разбирает ответ Hotels API на запрос поиска городов.
+
+    Args:
+        status_code (int): HTTP-статус ответа
+        text (str): тело ответа
+
+    Returns:
+        словарь с вариантами городов
+    """
+
+    if status_code == requests.codes.ok:
+        check = re.search(r'(?<=\"CITY_GROUP\",).+?]', text)
 
         if check:
-            data = json.loads(response.text)
+            data = json.loads(text)
 
             cities = {', '.join((city['name'],
                                  re.findall('(\\w+)[\n<]', city['caption'] + '\n')[-1])): city['destinationId']
@@ -79,32 +133,39 @@ def search_hotels(data: dict, searching_func: Callable) -> tuple:
         кортеж, содержащий словарь с найденными отелями
     """
 
-    if data['searching_function'] == 'bestdeal':
-        hotels_data = searching_func(user_city_id=data['city_id'],
-                                     language=data['language'],
-                                     currency=data['currency'],
-                                     hotels_count=data['hotels_count'],
-                                     hotel_url=hotel_url,
-                                     headers=headers,
-                                     price_range=data['price_range'],
-                                     dist_range=data['dist_range'],
-                                     check_in=data['date_in'],
-                                     check_out=data['date_out']
-                                     )
-    else:
-        hotels_data = searching_func(user_city_id=data['city_id'],
-                                     language=data['language'],
-                                     currency=data['currency'],
-                                     hotels_count=data['hotels_count'],
-                                     hotel_url=hotel_url,
-                                     headers=headers,
-                                     check_in=data['date_in'],
-                                     check_out=data['date_out']
-                                     )
+    hotels_data = searching_func(**searching_kwargs(data))
 
     return hotels_data
 
 
+def searching_kwargs(data: dict) -> dict:
+    """
+    Функция, которая формирует именованные аргументы функции поиска отелей
+    из критериев поиска пользователя.
+
+    Args:
+        data (dict): критерии поиска, заданные пользователем
+
+    Returns:
+        словарь именованных аргументов функции поиска отелей
+    """
+
+    kwargs = {'user_city_id': data['city_id'],
+              'language': data['language'],
+              'currency': data['currency'],
+              'hotels_count': data['hotels_count'],
+              'hotel_url': hotel_url,
+              'headers': headers,
+              'check_in': data['date_in'],
+              'check_out': data['date_out']
+              }
+
+    if data['searching_function'] == 'bestdeal':
+        kwargs.update(price_range=data['price_range'], dist_range=data['dist_range'])
+
+    return kwargs
+
+
 @logger.catch
 def search_photos(data: dict, hotel_id: int) -> list:
     """
@@ -121,14 +182,30 @@ def search_photos(data: dict, hotel_id: int) -> list:
 
     querystring = {"id": "{}".format(hotel_id)}
 
-    response = requests.request("GET", photo_url, headers=headers, params=querystring, timeout=10)
+    response = api_request(photo_url, querystring)
+
+    return parse_photos(response.status_code, response.text, data['photos_count'])
+
+
+def parse_photos(status_code: int, text: str, photos_count: int) -> list:
+    """
+    Функция, которая разбирает ответ Hotels API на запрос фотографий отеля.
+
+    Args:
+        status_code (int): HTTP-статус ответа
+        text (str): тело ответа
+        photos_count (int): кол-во нужных фотографий
+
+    Returns:
+        список url-адресов фотографий отеля
+    """
 
-    if response.status_code == requests.codes.ok:
-        check = re.search(r'(?<=,)\"hotelImages\".+?]', response.text)
+    if status_code == requests.codes.ok:
+        check = re.search(r'(?<=,)\"hotelImages\".+?]', text)
 
         if check:
-            photo_data = json.loads(response.text)
-            photos_address = photo_data["hotelImages"][:data['photos_count']]
+            photo_data = json.loads(text)
+            photos_address = photo_data["hotelImages"][:photos_count]
 
             return photos_address
         else:
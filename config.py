@@ -3,6 +3,7 @@
 """
 
 import os
+import secrets
 
 from dotenv import load_dotenv, find_dotenv
 
@@ -13,6 +14,123 @@ else:
 
 EXECUTE_CMD = os.getenv('EXECUTE_CMD')
 BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+# Базовый адрес Telegram Bot API. Для нагрузочного тестирования без Telegram
+# его заменяет локальный тестовый сервер tools/load_test.py
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org')
+
 DATABASE = os.getenv('DATABASE')
 API_HOST = os.getenv('API_HOST')
 API_KEY = os.getenv('API_KEY')
+
+# Базовый адрес Hotels API. Для работы без интернета (например, для замеров производительности)
+# укажите адрес локального тестового сервера tools/hotels_stub.py: http://127.0.0.1:8090
+HOTELS_API_URL = os.getenv('HOTELS_API_URL', 'https://hotels4.p.rapidapi.com')
+
+# Хранение истории поиска: максимальный возраст записей (в днях),
+# максимальное кол-во записей на одного пользователя, размер пакета удаления
+# и интервал запуска задачи очистки (в секундах)
+HISTORY_MAX_AGE_DAYS = int(os.getenv('HISTORY_MAX_AGE_DAYS', 90))
+HISTORY_MAX_PER_USER = int(os.getenv('HISTORY_MAX_PER_USER', 200))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+RETENTION_INTERVAL = int(os.getenv('RETENTION_INTERVAL', 6 * 60 * 60))
+
+# Максимальный возраст завершённых сессий поиска (в днях)
+SESSION_MAX_AGE_DAYS = int(os.getenv('SESSION_MAX_AGE_DAYS', 7))
+
+# Кол-во записей истории поиска на одной странице вывода /history
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 5))
+
+# Максимальное кол-во пользователей в LRU-кэше строк таблицы users
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1024))
+
+# Порог (в миллисекундах), начиная с которого запрос к БД записывается
+# в лог медленных запросов вместе с планом выполнения
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 50))
+
+# Кол-во рабочих потоков обработки обновлений (обновления одного чата
+# обрабатываются по очереди одним потоком) и максимальная длина очереди потока
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', 4))
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', 100))
+
+# Режим получения обновлений: 'polling' (long polling) или 'webhook'.
+# В режиме webhook бот слушает адрес WEBHOOK_LISTEN:WEBHOOK_PORT и принимает обновления
+# POST-запросами на WEBHOOK_PATH. Если задан публичный адрес WEBHOOK_URL (HTTPS, например,
+# адрес обратного прокси, перенаправляющего запросы на бота), webhook регистрируется в Telegram
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8080))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+
+# Секрет webhook: обновления принимаются только POST-запросами на WEBHOOK_PATH/WEBHOOK_SECRET (на другие адреса
+# сервер отвечает 403), а в Telegram регистрируется адрес WEBHOOK_URL/WEBHOOK_SECRET. Если секрет не задан,
+# он создаётся случайным при каждом запуске (задайте его, чтобы отправлять обновления вручную,
+# см. tools/post_updates.py)
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
+
+# Кол-во потоков, в которых асинхронный бот (besthoteloffers_bot_async.py) выполняет работу с БД
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', 4))
+
+# Кол-во потоков, в которых асинхронный бот выполняет синхронные сетевые запросы (inline-запросы к Hotels API
+# и HEAD-запросы к фотографиям), чтобы медленные ответы не занимали потоки работы с БД
+NETWORK_EXECUTOR_WORKERS = int(os.getenv('NETWORK_EXECUTOR_WORKERS', 16))
+
+# Лимиты отправки сообщений в Telegram: глобальный (сообщений в секунду), для одного чата
+# (сообщений в секунду и допустимый всплеск), кол-во потоков отправки и кол-во повторов после ответа 429
+SEND_GLOBAL_RATE = float(os.getenv('SEND_GLOBAL_RATE', 30))
+SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', 1))
+SEND_CHAT_BURST = float(os.getenv('SEND_CHAT_BURST', 3))
+SEND_WORKERS = int(os.getenv('SEND_WORKERS', 4))
+SEND_MAX_RETRIES = int(os.getenv('SEND_MAX_RETRIES', 5))
+
+# Хранилище состояний диалога поиска: 'sqlite' (таблица dialog_states БД, общая для всех
+# процессов бота и сохраняющаяся при перезапуске) или 'memory' (в памяти одного процесса)
+DIALOG_STORE = os.getenv('DIALOG_STORE', 'sqlite')
+
+# Кол-во процессов бота, которые запускает main.py (1 - один процесс без супервизора).
+# При нескольких процессах main.py сам получает обновления (long polling или webhook) и передаёт
+# каждое обновление процессу с номером chat_id % BOT_WORKERS на порт WORKER_BASE_PORT + номер процесса.
+# Нагрузка процессов выводится в лог каждые SUPERVISOR_REPORT_INTERVAL секунд.
+# WORKER_INDEX - номер процесса бота, задаётся супервизором (задачу очистки запускает только процесс 0)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', 1))
+WORKER_BASE_PORT = int(os.getenv('WORKER_BASE_PORT', 8100))
+SUPERVISOR_REPORT_INTERVAL = int(os.getenv('SUPERVISOR_REPORT_INTERVAL', 60))
+WORKER_INDEX = int(os.getenv('WORKER_INDEX', 0))
+
+# Кол-во потоков проверки размеров фотографий отелей (HEAD-запросы) и кол-во
+# адресов фотографий, для которых запоминается выбранный размер
+PHOTO_CHECK_WORKERS = int(os.getenv('PHOTO_CHECK_WORKERS', 16))
+PHOTO_SIZE_CACHE = int(os.getenv('PHOTO_SIZE_CACHE', 4096))
+
+# Кол-во file_id отправленных фотографий отелей в LRU-кэше (все file_id хранятся в таблице photo_files БД)
+PHOTO_FILE_CACHE = int(os.getenv('PHOTO_FILE_CACHE', 4096))
+
+# Вывод найденных отелей: кол-во потоков, в которых синхронный бот одновременно запрашивает фотографии
+# отелей, и минимальный интервал (в секундах) между изменениями сообщения с ходом вывода
+PHOTO_LOOKUP_WORKERS = int(os.getenv('PHOTO_LOOKUP_WORKERS', 8))
+PROGRESS_EDIT_INTERVAL = float(os.getenv('PROGRESS_EDIT_INTERVAL', 2))
+
+# Inline-режим (@бот Париж): время кэширования ответа на стороне Telegram (cache_time, в секундах),
+# время жизни и размер кэшей городов, найденных отелей и готовых ответов в памяти процесса
+# и кол-во отелей в ответе
+INLINE_CACHE_TIME = int(os.getenv('INLINE_CACHE_TIME', 300))
+INLINE_CACHE_TTL = int(os.getenv('INLINE_CACHE_TTL', 600))
+INLINE_CACHE_SIZE = int(os.getenv('INLINE_CACHE_SIZE', 1024))
+INLINE_HOTELS_COUNT = int(os.getenv('INLINE_HOTELS_COUNT', 5))
+
+# Кол-во готовых клавиатур календаря выбора дат, которые запоминаются
+CALENDAR_CACHE_SIZE = int(os.getenv('CALENDAR_CACHE_SIZE', 1024))
+
+# Плавная остановка бота (SIGTERM, SIGINT, [Ctrl] + C): общее время (в секундах), за которое бот
+# завершает уже начатую обработку обновлений и отправляет сообщения из очереди отправки.
+# При остановке кэши размеров и file_id фотографий сохраняются в файл STATE_SNAPSHOT ({worker} -
+# номер процесса бота) и загружаются при следующем запуске (пустое значение - без снимка)
+SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', 25))
+STATE_SNAPSHOT = os.getenv('STATE_SNAPSHOT', 'state/snapshot-{worker}.json')
+
+# Метрики в формате Prometheus (время обработчиков, запросов к Hotels API и к Telegram, запросы к БД
+# на одно обновление, попадания в кэши): адрес METRICS_LISTEN и порт METRICS_PORT + номер процесса бота,
+# путь /metrics (0 - без сервера метрик)
+METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
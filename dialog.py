@@ -0,0 +1,250 @@
+"""
+Модуль конечного автомата диалога поиска отелей.
+Содержит состояния диалога (что бот ждёт от пользователя), допустимые
+переходы между ними и общий интерфейс хранилища состояний. Состояние
+хранится не в памяти процесса, а в хранилище (по умолчанию - в таблице
+"dialog_states" БД, см. bot_db_pw.PeeweeStateStore), поэтому следующее
+обновление может обработать любой процесс бота, а перезапуск бота
+не прерывает начатые диалоги. При обработке обновления (update_scope)
+состояние чата читается из хранилища один раз, сколько бы фильтров
+обработчиков его ни проверяли.
+"""
+
+from abc import ABC, abstractmethod
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+import threading
+from typing import Any, Callable, Iterator
+
+from telebot.asyncio_storage import StateStorageBase
+from telebot.types import Message, CallbackQuery
+
+
+# Состояния диалога поиска
+CITY = 'city'                      # ввод названия города
+CITY_CHOICE = 'city_choice'        # выбор города из найденных
+PRICE_RANGE = 'price_range'        # ввод диапазона цен (/bestdeal)
+DISTANCE_RANGE = 'distance_range'  # ввод диапазона расстояний до центра (/bestdeal)
+DATE_IN = 'date_in'                # выбор даты заезда в календаре
+DATE_OUT = 'date_out'              # выбор даты выезда в календаре
+HOTELS_COUNT = 'hotels_count'      # ввод кол-ва отелей
+NEED_PHOTOS = 'need_photos'        # ответ, нужны ли фотографии
+PHOTOS_COUNT = 'photos_count'      # ввод кол-ва фотографий
+
+# Допустимые переходы: состояние -> следующие состояния (None - диалог завершён)
+TRANSITIONS = {
+    None: (CITY,),
+    CITY: (CITY_CHOICE, None),
+    CITY_CHOICE: (PRICE_RANGE, DATE_IN),
+    PRICE_RANGE: (DISTANCE_RANGE,),
+    DISTANCE_RANGE: (DATE_IN,),
+    DATE_IN: (DATE_OUT,),
+    DATE_OUT: (HOTELS_COUNT,),
+    HOTELS_COUNT: (NEED_PHOTOS,),
+    NEED_PHOTOS: (PHOTOS_COUNT, None),
+    PHOTOS_COUNT: (None,),
+}
+
+# Состояния чатов, прочитанные и записанные при обработке текущего обновления {id чата: состояние}
+# (None - вне обработки обновления). У каждого потока и каждой задачи asyncio своё значение
+update_states: ContextVar[dict[int, str | None] | None] = ContextVar('update_states', default=None)
+
+
+@contextmanager
+def update_scope() -> Iterator[None]:
+    """
+    Контекст обработки обновления: внутри него CachedStateStore читает
+    состояние каждого чата из хранилища не больше одного раза.
+    """
+
+    token = update_states.set(dict())
+    try:
+        yield
+    finally:
+        update_states.reset(token)
+
+
+class StateStore(ABC):
+    """
+    Интерфейс хранилища состояний диалога {id чата: состояние}.
+    """
+
+    @abstractmethod
+    def get(self, chat_id: int) -> str | None:
+        """
+        Возвращает состояние диалога чата или None, если диалога нет.
+        """
+
+    @abstractmethod
+    def set(self, chat_id: int, state: str) -> None:
+        """
+        Записывает состояние диалога чата.
+        """
+
+    @abstractmethod
+    def delete(self, chat_id: int) -> None:
+        """
+        Удаляет состояние диалога чата.
+        """
+
+
+class MemoryStateStore(StateStore):
+    """
+    Хранилище состояний диалога в памяти процесса (для одного процесса бота и тестов).
+    """
+
+    def __init__(self) -> None:
+        self._states: dict[int, str] = dict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: int) -> str | None:
+        with self._lock:
+            return self._states.get(chat_id)
+
+    def set(self, chat_id: int, state: str) -> None:
+        with self._lock:
+            self._states[chat_id] = state
+
+    def delete(self, chat_id: int) -> None:
+        with self._lock:
+            self._states.pop(chat_id, None)
+
+
+class CachedStateStore(StateStore):
+    """
+    Хранилище состояний, которое на время обработки обновления (update_scope)
+    запоминает прочитанные и записанные состояния: фильтры обработчиков
+    и проверка перехода в DialogMachine.move не обращаются к хранилищу повторно.
+    Записи сразу передаются в хранилище store.
+    """
+
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+
+    def get(self, chat_id: int) -> str | None:
+        states = update_states.get()
+        if states is None:
+            return self.store.get(chat_id)
+        if chat_id not in states:
+            states[chat_id] = self.store.get(chat_id)
+        return states[chat_id]
+
+    def set(self, chat_id: int, state: str) -> None:
+        self.store.set(chat_id, state)
+        states = update_states.get()
+        if states is not None:
+            states[chat_id] = state
+
+    def delete(self, chat_id: int) -> None:
+        self.store.delete(chat_id)
+        states = update_states.get()
+        if states is not None:
+            states[chat_id] = None
+
+
+class DialogMachine:
+    """
+    Конечный автомат диалога поиска поверх хранилища состояний.
+    Переход, которого нет в TRANSITIONS, вызывает ValueError.
+    """
+
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+
+    def state(self, chat_id: int) -> str | None:
+        return self.store.get(chat_id)
+
+    def start(self, chat_id: int) -> None:
+        """
+        Начинает новый диалог поиска (из любого состояния).
+        """
+
+        self.store.set(chat_id, CITY)
+
+    def move(self, chat_id: int, state: str | None) -> None:
+        """
+        Переводит диалог чата в состояние state (None - завершает диалог).
+
+        Args:
+            chat_id (int): Принимает id чата
+            state (str | None): Принимает новое состояние
+        """
+
+        current = self.store.get(chat_id)
+        if state not in TRANSITIONS.get(current, ()):
+            raise ValueError('Недопустимый переход диалога: {} -> {}'.format(current, state))
+
+        if state is None:
+            self.store.delete(chat_id)
+        else:
+            self.store.set(chat_id, state)
+
+    def finish(self, chat_id: int) -> None:
+        """
+        Завершает диалог (из любого состояния, например, при ошибке ввода).
+        """
+
+        self.store.delete(chat_id)
+
+    def in_state(self, *states: str,
+                 func: Callable[[Message | CallbackQuery], bool] | None = None
+                 ) -> Callable[[Message | CallbackQuery], bool]:
+        """
+        Возвращает фильтр обработчика, который пропускает сообщения
+        и нажатия кнопок только из чатов в одном из состояний states.
+
+        Args:
+            states (str): Принимает состояния, в которых работает обработчик
+            func (Callable | None): Принимает дополнительный фильтр, который
+                                    проверяется до обращения к хранилищу
+        """
+
+        def check(update: Message | CallbackQuery) -> bool:
+            if func is not None and not func(update):
+                return False
+            message = update.message if isinstance(update, CallbackQuery) else update
+            return self.store.get(message.chat.id) in states
+
+        return check
+
+
+class AsyncStateStorage(StateStorageBase):
+    """
+    Хранилище состояний AsyncTeleBot поверх StateStore: асинхронный бот
+    хранит шаги диалога там же, где и синхронный. Обращения к хранилищу
+    выполняются в пуле потоков, чтобы не блокировать цикл событий.
+    Данные состояний (set_data/get_data) ботом не используются и не хранятся.
+    """
+
+    def __init__(self, store: StateStore) -> None:
+        super().__init__()
+        self.store = store
+
+    async def set_state(self, chat_id: int, user_id: int, state: Any) -> bool:
+        # AsyncTeleBot может передать объект State, в хранилище записывается его имя
+        await asyncio.to_thread(self.store.set, chat_id, getattr(state, 'name', state))
+        return True
+
+    async def get_state(self, chat_id: int, user_id: int) -> str | None:
+        # Состояние, уже прочитанное при обработке этого обновления, не требует перехода в поток
+        states = update_states.get()
+        if states is not None and chat_id in states:
+            return states[chat_id]
+        return await asyncio.to_thread(self.store.get, chat_id)
+
+    async def delete_state(self, chat_id: int, user_id: int) -> bool:
+        await asyncio.to_thread(self.store.delete, chat_id)
+        return True
+
+    async def set_data(self, chat_id: int, user_id: int, key: str, value: Any) -> bool:
+        return False
+
+    async def get_data(self, chat_id: int, user_id: int) -> dict:
+        return dict()
+
+    async def reset_data(self, chat_id: int, user_id: int) -> bool:
+        return True
+
+    async def save(self, chat_id: int, user_id: int, data: dict) -> bool:
+        return False
@@ -0,0 +1,188 @@
+"""
+Модуль диспетчера обновлений Telegram.
+Распределяет обновления по заданному кол-ву рабочих потоков по id чата:
+обновления одного чата обрабатываются строго по очереди одним потоком,
+а обновления разных чатов - параллельно. Бот должен быть создан
+с параметром threaded=False, чтобы обработчики выполнялись в потоке диспетчера.
+"""
+
+import queue
+import threading
+import time
+
+from loguru import logger
+from telebot import TeleBot
+from telebot.types import Update
+
+from config import UPDATE_WORKERS, UPDATE_QUEUE_SIZE
+from dialog import update_scope
+import metrics
+from query_log import query_log
+
+
+# Типы обновлений, из которых можно получить чат или пользователя
+UPDATE_TYPES = ('message', 'edited_message', 'channel_post', 'edited_channel_post', 'callback_query',
+                'inline_query', 'chosen_inline_result', 'shipping_query', 'pre_checkout_query',
+                'poll_answer', 'my_chat_member', 'chat_member', 'chat_join_request')
+
+
+def get_chat_id(update: Update) -> int:
+    """
+    Функция, которая возвращает id чата, к которому относится обновление
+    (для обновлений без чата - id пользователя, для остальных - id обновления).
+
+    Args:
+        update (Update): Принимает обновление Telegram
+
+    Returns (int): id чата
+    """
+
+    for update_type in UPDATE_TYPES:
+        content = getattr(update, update_type, None)
+        if content is None:
+            continue
+        chat = getattr(content, 'chat', None) or getattr(getattr(content, 'message', None), 'chat', None)
+        if chat is not None:
+            return chat.id
+        user = getattr(content, 'from_user', None) or getattr(content, 'user', None)
+        if user is not None:
+            return user.id
+
+    return update.update_id
+
+
+class Dispatcher:
+    """
+    Пул рабочих потоков, каждый со своей очередью обновлений.
+    Обновление попадает в очередь потока с номером chat_id % workers.
+    """
+
+    def __init__(self, bot: TeleBot, workers: int = UPDATE_WORKERS, queue_size: int = UPDATE_QUEUE_SIZE) -> None:
+        self.bot = bot
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.threads = [threading.Thread(target=self._work, args=(index,), name='UpdateWorker-{}'.format(index),
+                                         daemon=True) for index in range(workers)]
+        self._stop_event = threading.Event()
+        # update_id, начиная с которого обновления ещё не переданы рабочим потокам (режим long polling)
+        self.offset: int | None = None
+
+    def start(self) -> None:
+        for thread in self.threads:
+            thread.start()
+
+    def dispatch(self, update: Update) -> None:
+        """
+        Ставит обновление в очередь потока, обрабатывающего его чат.
+        Если очередь заполнена, ждёт освобождения места (обратное давление
+        на получение новых обновлений).
+
+        Args:
+            update (Update): Принимает обновление Telegram
+        """
+
+        self.queues[get_chat_id(update) % len(self.queues)].put(update)
+
+    def queue_depths(self) -> list[int]:
+        """
+        Возвращает кол-во ожидающих обработки обновлений в очереди каждого потока.
+        """
+
+        return [worker_queue.qsize() for worker_queue in self.queues]
+
+    @property
+    def accepting(self) -> bool:
+        """
+        Принимает ли диспетчер новые обновления (False после stop_intake или stop).
+        """
+
+        return not self._stop_event.is_set()
+
+    def stop_intake(self) -> None:
+        """
+        Останавливает получение новых обновлений (цикл infinity_polling завершается,
+        webhook отвечает 503, и Telegram повторит обновление позже), не останавливая рабочие потоки.
+        """
+
+        self._stop_event.set()
+
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Останавливает получение обновлений и рабочие потоки
+        (уже поставленные в очереди обновления обрабатываются до конца).
+        Если все обновления обработаны, в режиме long polling Telegram
+        получает подтверждение их получения и не отправит их повторно после перезапуска.
+
+        Args:
+            timeout (float): Принимает общее время ожидания обработки обновлений (None - без ограничения)
+
+        Returns (bool): True, если все обновления из очередей обработаны
+        """
+
+        self._stop_event.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining() -> float | None:
+            return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+        try:
+            for worker_queue in self.queues:
+                worker_queue.put(None, timeout=remaining())
+        except queue.Full:
+            return False
+
+        for thread in self.threads:
+            thread.join(remaining())
+        if any(thread.is_alive() for thread in self.threads):
+            return False
+
+        if self.offset is not None:
+            try:
+                # Обновления с update_id < offset считаются полученными
+                self.bot.get_updates(offset=self.offset, limit=1, timeout=0, long_polling_timeout=0)
+            except Exception as error:
+                logger.error('Ошибка подтверждения обновлений: {}'.format(error))
+        return True
+
+    def infinity_polling(self, timeout: int = 20, long_polling_timeout: int = 20) -> None:
+        """
+        Получает обновления методом getUpdates и распределяет их по рабочим
+        потокам до вызова stop() (аналог TeleBot.infinity_polling).
+
+        Args:
+            timeout (int): Принимает таймаут запроса к Telegram Bot API
+            long_polling_timeout (int): Принимает таймаут long polling
+        """
+
+        self.start()
+        while not self._stop_event.is_set():
+            try:
+                updates = self.bot.get_updates(offset=self.offset, timeout=timeout,
+                                               long_polling_timeout=long_polling_timeout)
+            except Exception as error:
+                logger.error('Ошибка получения обновлений: {}'.format(error))
+                time.sleep(3)
+                continue
+
+            for update in updates:
+                # Обновления, полученные после остановки, не подтверждаются, и Telegram отправит их повторно
+                if self._stop_event.is_set():
+                    break
+                self.dispatch(update)
+                self.offset = update.update_id + 1
+
+    def _work(self, index: int) -> None:
+        worker_queue = self.queues[index]
+        while True:
+            update = worker_queue.get()
+            if update is None:
+                break
+            # Время обработки и запросы к БД, выполненные этим потоком при обработке обновления.
+            # Состояние диалога чата читается один раз за обновление (см. dialog.update_scope)
+            query_log.start_counting()
+            start = time.perf_counter()
+            try:
+                with update_scope():
+                    self.bot.process_new_updates([update])
+            except Exception:
+                logger.exception('Ошибка обработки обновления {}'.format(update.update_id))
+            metrics.observe_update(time.perf_counter() - start, *query_log.stop_counting())
@@ -0,0 +1,194 @@
+"""
+Модуль inline-режима бота: в любом чате "@бот Париж" - и бот предлагает
+отели найденного города (самые дешёвые на ближайшую ночь) и варианты городов.
+Ответы берутся из кэшей в памяти процесса: городов (запрос -> города),
+найденных отелей (город и дата -> отели) и готовых ответов (запрос -> ответ),
+поэтому повторный запрос обслуживается без запросов к Hotels API и БД.
+Кроме того, Telegram сам кэширует ответ на INLINE_CACHE_TIME секунд.
+"""
+
+import datetime as dt
+from typing import Any, Callable
+
+from loguru import logger
+from telebot.types import InlineQueryResultArticle, InputTextMessageContent
+
+from commands import hilowprice, recurring
+from config import INLINE_CACHE_TTL, INLINE_CACHE_SIZE, INLINE_HOTELS_COUNT
+from messages import hotel_card
+from settings import emoji
+from storage import TTLCache
+
+
+# Минимальная длина запроса, по которой ищутся города
+MIN_QUERY_LENGTH = 2
+
+# Максимальное кол-во вариантов городов в ответе
+MAX_CITIES = 5
+
+
+def normalize_query(query: str) -> str:
+    """
+    Функция, которая приводит inline-запрос к виду ключа кэша ("  Париж " -> "париж").
+    """
+
+    return ' '.join(query.lower().split())
+
+
+def top_hotels(city_id: str, check_in: dt.date, hotels_count: int = INLINE_HOTELS_COUNT) -> dict | None:
+    """
+    Функция, которая запрашивает у Hotels API самые дешёвые отели города на одну ночь
+    (загрузчик отелей по умолчанию).
+
+    Args:
+        city_id (str): Принимает id города (destinationId)
+        check_in (dt.date): Принимает дату заезда
+        hotels_count (int): Принимает кол-во отелей
+
+    Returns (dict | None): данные найденных отелей или None при ошибке запроса
+    """
+
+    result = hilowprice.lowprice(user_city_id=city_id, language='ru_RU', currency='RUB', hotels_count=hotels_count,
+                                 hotel_url=recurring.hotel_url, headers=recurring.headers, check_in=check_in,
+                                 check_out=check_in + dt.timedelta(days=1))
+    if result is None:
+        return None
+
+    return result[0] or dict()
+
+
+class InlineSearch:
+    """
+    Ответы на inline-запросы с кэшами городов, найденных отелей и готовых ответов.
+    Загрузчики locate(запрос) -> {город: id} и search(id города, дата заезда) -> {название: отель}
+    можно заменить (например, на локальный тестовый сервер).
+    """
+
+    def __init__(self, locate: Callable[[str], dict] = recurring.find_cities,
+                 search: Callable[[str, dt.date], dict | None] = top_hotels,
+                 cache_size: int = INLINE_CACHE_SIZE, ttl: float = INLINE_CACHE_TTL) -> None:
+        self.locate = locate
+        self.search = search
+        self.cities = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.results = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.answers = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.hits = 0
+        self.misses = 0
+
+    def cached(self, query: str) -> list | None:
+        """
+        Возвращает готовый ответ на запрос из кэша или None, если его нет.
+
+        Args:
+            query (str): Принимает текст inline-запроса
+
+        Returns (list | None): результаты inline-запроса
+        """
+
+        key = normalize_query(query)
+        if len(key) < MIN_QUERY_LENGTH:
+            return list()
+
+        answer = self.answers.get(key)
+        if answer is not None:
+            self.hits += 1
+        return answer
+
+    def answer(self, query: str) -> list:
+        """
+        Возвращает ответ на inline-запрос: отели первого найденного города и варианты городов.
+        При ошибке Hotels API возвращается пустой ответ, который не кэшируется.
+
+        Args:
+            query (str): Принимает текст inline-запроса
+
+        Returns (list): результаты inline-запроса
+        """
+
+        answer = self.cached(query)
+        if answer is not None:
+            return answer
+
+        self.misses += 1
+        key = normalize_query(query)
+        check_in = dt.date.today()
+        try:
+            cities = self.cities.get(key)
+            if cities is None:
+                cities = self.locate(key) or dict()
+                self.cities.put(key, cities)
+
+            cities = list(cities.items())[:MAX_CITIES]
+            hotels = None
+            if cities:
+                hotels = self.results.get((cities[0][1], check_in))
+                if hotels is None:
+                    hotels = self.search(cities[0][1], check_in)
+                    if hotels is None:
+                        return list()
+                    self.results.put((cities[0][1], check_in), hotels)
+        except Exception as error:
+            logger.warning('Ошибка inline-запроса "{}": {}'.format(query, error))
+            return list()
+
+        # Отели без цены (Hotels API не вернул предложение) в inline-ответ не попадают
+        answer = [hotel_result(hotel) for hotel in (hotels or dict()).values() if hotel['price'] != '-']
+        answer += [city_result(name, city_id) for name, city_id in cities]
+        self.answers.put(key, answer)
+
+        return answer
+
+    def metrics(self) -> dict[str, Any]:
+        """
+        Возвращает кол-во ответов из кэша и без него и размеры кэшей.
+        """
+
+        return {'hits': self.hits, 'misses': self.misses, 'answers': len(self.answers),
+                'cities': len(self.cities), 'results': len(self.results)}
+
+
+def hotel_result(hotels: dict) -> InlineQueryResultArticle:
+    """
+    Функция, которая формирует результат inline-запроса с описанием отеля на одну ночь.
+
+    Args:
+        hotels (dict): Принимает данные отеля
+
+    Returns (InlineQueryResultArticle): результат inline-запроса
+    """
+
+    return InlineQueryResultArticle(
+        id='hotel:{}'.format(hotels['id']),
+        title='{} {}'.format(emoji['hotel'], hotels['name']),
+        description='{} Цена за ночь: {}'.format(emoji['price'], hotels['price']),
+        input_message_content=InputTextMessageContent(message_text=hotel_card(hotels=hotels, total_days=1),
+                                                      parse_mode='HTML', disable_web_page_preview=True),
+        url='https://hotels.com/ho' + str(hotels['id'])
+    )
+
+
+def city_result(name: str, city_id: str) -> InlineQueryResultArticle:
+    """
+    Функция, которая формирует результат inline-запроса с вариантом города.
+
+    Args:
+        name (str): Принимает название города
+        city_id (str): Принимает id города (destinationId)
+
+    Returns (InlineQueryResultArticle): результат inline-запроса
+    """
+
+    return InlineQueryResultArticle(
+        id='city:{}'.format(city_id),
+        title='{} {}'.format(emoji['address'], name),
+        description='Все отели города на hotels.com',
+        input_message_content=InputTextMessageContent(
+            message_text="{} <a href='https://hotels.com/search.do?destination-id={}'>Отели: {}</a>".format(
+                emoji['address'], city_id, name),
+            parse_mode='HTML'),
+        url='https://hotels.com/search.do?destination-id={}'.format(city_id)
+    )
+
+
+# Общие кэши inline-режима для всех обработчиков бота
+inline_search = InlineSearch()
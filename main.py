@@ -1,13 +1,16 @@
 """
 Главный скрипт main.py
-Запускает бота besthoteloffers_bot.py в дочернем процессе
+Запускает бота besthoteloffers_bot.py в дочернем процессе, а при BOT_WORKERS > 1 -
+супервизор (supervisor.py) с несколькими процессами бота.
+По сигналу SIGTERM или [Ctrl] + C процессы бота останавливаются плавно (см. shutdown.py)
 """
 
-from subprocess import run
+import signal
 
 from loguru import logger
 
-from config import EXECUTE_CMD
+from config import EXECUTE_CMD, BOT_WORKERS
+from supervisor import Supervisor, run_bot
 
 
 @logger.catch()
@@ -18,10 +21,19 @@ def main() -> None:
 
     logger.info('Бот запускается...')
 
+    # SIGTERM прерывает ожидание процессов бота так же, как [Ctrl] + C:
+    # процессы бота получают SIGTERM и завершают начатую обработку обновлений
+    signal.signal(signal.SIGTERM, lambda signum, frame: exit())
+
     try:
-        run(EXECUTE_CMD, shell=True, check=True)
+        if BOT_WORKERS > 1:
+            Supervisor(workers=BOT_WORKERS).run()
+        else:
+            returncode = run_bot(EXECUTE_CMD)
+            if returncode:
+                logger.error('Процесс бота завершился с кодом {}'.format(returncode))
     except KeyboardInterrupt:
-        logger.error('Работа бота была прервана принудительно, нажатием на [Ctrl] + C')
+        logger.info('Работа бота остановлена нажатием на [Ctrl] + C')
         exit()
 
 
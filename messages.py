@@ -0,0 +1,216 @@
+"""
+Модуль, который содержит тексты сообщений бота, общие для синхронного
+(besthoteloffers_bot.py) и асинхронного (besthoteloffers_bot_async.py) ботов.
+"""
+
+import json
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, NamedTuple
+
+from bot_db_pw import get_address, get_landmarks
+from settings import emoji, star_rating, night_declension
+
+
+NOTHING_FOUND = ("""
+К сожалению, я ничего подходящего не нашёл {sad}...
+Может попробуешь заново?  /help""").format(sad=emoji['sadness'])
+
+NO_CITIES_FOUND = ("""
+К сожалению, я ничего подходящего не нашёл {sad}...
+(Российские города всё ещё недоступны)
+
+Может попробуешь ещё раз?  /help""").format(sad=emoji['sadness'])
+
+PARTIAL_RESULT = ("""
+Не удалось отправить часть результатов поиска {sad}
+Может попробуешь заново?  /help""").format(sad=emoji['sadness'])
+
+
+class CardSnapshot(NamedTuple):
+    """
+    Неизменяемый снимок параметров поиска пользователя, нужных для вывода
+    найденных отелей. Снимается один раз (одним запросом к БД) перед выводом.
+    """
+
+    hotels_count: int
+    needed_photo: bool
+    photos_count: int
+    total_days: int
+
+    @classmethod
+    def from_user_data(cls, user_data: dict) -> 'CardSnapshot':
+        """
+        Создаёт снимок из данных пользователя и его текущего поиска (см. bot_db_pw.get_user_data).
+        """
+
+        return cls(hotels_count=user_data['hotels_count'] or 0,
+                   needed_photo=bool(user_data['needed_photo']),
+                   photos_count=user_data['photos_count'] or 0,
+                   total_days=abs((user_data['date_out'] - user_data['date_in']).days))
+
+
+class _Partial(dict):
+    """
+    Словарь для str.format_map, который оставляет неизвестные поля шаблона
+    как есть: шаблон можно заполнять по частям.
+    """
+
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+# Шаблон описания отеля с уже подставленными эмодзи
+CARD_TEMPLATE = ("""
+\n\n{e_hotel} <b>{name} </b>
+\n{e_star} Категория отеля:  <b>{stars}</b>
+\n\n{e_address} <a href='{address_link}'>{address}</a>
+\n\n{e_dist} Ближайшие ориентиры: <b>{distance}</b>
+\n\n{e_price} Цена за ночь:  <b>{price}</b>
+\n{e_total} Общая сумма за <b>{total_days}</b> {night}:  <b>{total_price} {curr_value}</b>
+\n\n{e_link} <a href='{link}'>Подробнее на hotels.com</a>""").format_map(_Partial(
+    e_hotel=emoji['hotel'],
+    e_star=emoji['star'],
+    e_address=emoji['address'],
+    e_dist=emoji['landmarks'],
+    e_price=emoji['price'],
+    e_total=emoji['total_price'],
+    e_link=emoji['link']
+))
+
+# Строки звёзд категории отеля запоминаются для каждого значения рейтинга
+cached_star_rating = lru_cache(maxsize=None)(star_rating)
+
+
+def card_template(total_days: int) -> str:
+    """
+    Функция, которая возвращает шаблон описания отеля с подставленным кол-вом ночей.
+
+    Args:
+        total_days (int): Принимает кол-во ночей в отеле
+
+    Returns (str): шаблон описания отеля
+    """
+
+    return CARD_TEMPLATE.format_map(_Partial(total_days=total_days, night=night_declension(days=total_days)))
+
+
+def render_card(template: str, hotels: dict, total_days: int) -> str:
+    """
+    Функция, которая формирует описание найденного отеля по шаблону card_template.
+
+    Args:
+        template (str): Принимает шаблон описания отеля
+        hotels (dict): Принимает данные отеля
+        total_days (int): Принимает кол-во ночей в отеле
+
+    Returns (str): описание отеля (HTML)
+    """
+
+    price = hotels['price'].replace(',', '')
+    cost, curr_value = price.split()
+
+    return template.format(
+        name=hotels['name'],
+        stars=cached_star_rating(hotels['stars']),
+        address=get_address(hotels=hotels),
+        distance=get_landmarks(hotels=hotels),
+        price=price,
+        total_price=int(cost) * total_days,
+        curr_value=curr_value,
+        link='https://hotels.com/ho' + str(hotels['id']),
+        address_link='https://google.com/maps/place/' + hotels['coordinate']
+    )
+
+
+def hotel_card(hotels: dict, total_days: int) -> str:
+    """
+    Функция, которая формирует описание найденного отеля.
+
+    Args:
+        hotels (dict): Принимает данные отеля
+        total_days (int): Принимает кол-во ночей в отеле
+
+    Returns (str): описание отеля (HTML)
+    """
+
+    return render_card(template=card_template(total_days), hotels=hotels, total_days=total_days)
+
+
+def render_cards(snapshot: CardSnapshot, hotels_list: Iterable[dict]) -> list[tuple[dict, str]]:
+    """
+    Функция, которая за один проход формирует описания первых snapshot.hotels_count
+    найденных отелей (шаблон с кол-вом ночей заполняется один раз на весь вывод).
+
+    Args:
+        snapshot (CardSnapshot): Принимает снимок параметров поиска пользователя
+        hotels_list (Iterable): Принимает данные найденных отелей
+
+    Returns (list): список пар (данные отеля, описание отеля)
+    """
+
+    template = card_template(snapshot.total_days)
+
+    return [(hotels, render_card(template=template, hotels=hotels, total_days=snapshot.total_days))
+            for hotels in islice(hotels_list, snapshot.hotels_count)]
+
+
+def search_progress(sent: int, total: int) -> str:
+    """
+    Функция, которая формирует текст сообщения с ходом вывода найденных отелей.
+
+    Args:
+        sent (int): Принимает кол-во уже выведенных отелей
+        total (int): Принимает кол-во отелей, которые будут выведены
+
+    Returns (str): текст сообщения
+    """
+
+    if sent < total:
+        return 'УРА!!!\nКажется, я кое-что нашёл для тебя. Вывожу...\n\nВыведено отелей: {} из {}'.format(sent, total)
+
+    return 'УРА!!!\nКажется, я кое-что нашёл для тебя.\n\nВыведено отелей: {}'.format(total)
+
+
+def search_footer(search_link: str) -> str:
+    """
+    Функция, которая формирует завершающее сообщение после вывода отелей.
+
+    Args:
+        search_link (str): Принимает ссылку на результаты поиска на hotels.com
+
+    Returns (str): текст сообщения (MarkdownV2)
+    """
+
+    return ("""
+Не подошли эти варианты?  Почемууу? {ask}
+
+Ладно, шучу\\. {smile}
+Ещё больше отелей по твоему запросу [смотри здесь]({link})
+
+Хочешь заново?  /help""").format(ask=emoji['ask'],
+                                 smile=emoji['smile'],
+                                 link=search_link)
+
+
+def history_page(histories: list) -> str:
+    """
+    Функция, которая формирует текст одной страницы истории поиска.
+
+    Args:
+        histories (list): Принимает записи истории поиска
+
+    Returns (str): текст страницы истории (HTML)
+    """
+
+    return '\n\n'.join(("""
+Дата:  <b>{dt}</b>
+Команда:  <b>{cmd}</b>
+Город:  <b>{req}</b>
+
+Найденные отели:
+<b>{ans}</b>""").format(dt=record['date'],
+                        cmd=record['commands'],
+                        req=record['requests'],
+                        ans='\n'.join(json.loads(record['answers']))
+                        ) for record in histories)
@@ -0,0 +1,474 @@
+"""
+Модуль метрик бота в формате Prometheus.
+Содержит счётчики и гистограммы (без внешних зависимостей), общий реестр
+метрик и HTTP-сервер, который отдаёт их по адресу /metrics на порту
+METRICS_PORT + номер процесса бота. Измеряются:
+- время обработчиков сообщений, нажатий на кнопки и inline-запросов (по имени обработчика);
+- время и статус запросов к Hotels API и HEAD-запросов к фотографиям (по методу API);
+- время обработки обновления, кол-во запросов к БД и изменяющих БД запросов на одно обновление;
+- время запросов отправки в Telegram и ожидания в очереди отправки;
+- попадания в кэши, длины очередей и статистика запросов к БД по хелперам (при каждом опросе).
+"""
+
+import bisect
+from contextlib import contextmanager
+import functools
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import inspect
+import math
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from loguru import logger
+
+from config import METRICS_LISTEN, METRICS_PORT, WORKER_INDEX
+from query_log import query_log
+
+
+# Границы корзин гистограмм времени (в секундах) и кол-ва запросов к БД
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+# Списки обработчиков TeleBot и AsyncTeleBot, время которых измеряется
+HANDLER_LISTS = ('message_handlers', 'edited_message_handlers', 'callback_query_handlers', 'inline_handlers',
+                 'chosen_inline_handlers')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value: float) -> str:
+    """
+    Функция, которая форматирует значение метрики (целые числа - без дробной части).
+    """
+
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: tuple[str, ...], values: tuple, extra: str = '') -> str:
+    """
+    Функция, которая форматирует метки метрики: {name="value",...}.
+    """
+
+    pairs = ['{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+             for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """
+    Метрика с именем, описанием и именами меток.
+    Значения с разными значениями меток хранятся отдельно.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def key(self, labels: dict[str, Any]) -> tuple:
+        if labels.keys() != set(self.labels):
+            raise ValueError('Метрика {} принимает метки {}, получены {}'.format(self.name, self.labels,
+                                                                                 tuple(labels)))
+        # Значения меток хранятся строками (например, статус ответа 200 и 'error' в одной метке)
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        """
+        Возвращает строки метрики: (суффикс имени, метки, значение).
+        """
+
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = ['# HELP {} {}'.format(self.name, self.documentation), '# TYPE {} {}'.format(self.name, self.kind)]
+        lines.extend('{}{}{} {}'.format(self.name, suffix, labels, format_value(value))
+                     for suffix, labels, value in self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """
+    Счётчик, значение которого только растёт.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: dict[tuple, float] = dict()
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self.key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        with self._lock:
+            return [('', format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """
+    Гистограмма: кол-во наблюдений в корзинах с верхними границами buckets,
+    сумма и кол-во наблюдений.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = TIME_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # {значения меток: [кол-во наблюдений в каждой корзине, сумма, кол-во]}
+        self._values: dict[tuple, list] = dict()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """
+        Контекстный менеджер, который измеряет время выполнения блока (в том числе завершившегося исключением).
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        with self._lock:
+            values = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items())
+
+        result = list()
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                result.append(('_bucket', format_labels(self.labels, key, 'le="{}"'.format(format_value(bound))),
+                               cumulative))
+            result.append(('_sum', format_labels(self.labels, key), total))
+            result.append(('_count', format_labels(self.labels, key), count))
+        return result
+
+
+class CallbackMetric(Metric):
+    """
+    Метрика, значения которой вычисляются функцией при каждом опросе
+    (длины очередей, размеры кэшей, счётчики, которые ведут другие модули).
+    Функция возвращает {значения меток: значение} или одно значение (для метрики без меток).
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...], func: Callable[[], Any],
+                 kind: str = 'gauge') -> None:
+        super().__init__(name, documentation, labels)
+        self.func = func
+        self.kind = kind
+
+    def samples(self) -> list[tuple[str, str, float]]:
+        values = self.func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [('', format_labels(self.labels, key if isinstance(key, tuple) else (key,)), value)
+                for key, value in values.items() if value is not None]
+
+
+class Registry:
+    """
+    Реестр метрик процесса: создаёт метрики и выводит их в текстовом формате Prometheus.
+    """
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = dict()
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError('Метрика {} уже зарегистрирована'.format(metric.name))
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                  buckets: tuple[float, ...] = TIME_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name: str, documentation: str, func: Callable[[], Any], labels: tuple[str, ...] = (),
+                 kind: str = 'gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, labels, func, kind))
+
+    def render(self) -> str:
+        """
+        Возвращает все метрики в текстовом формате Prometheus. Ошибка вычисления
+        одной метрики записывается в лог и не мешает выводу остальных.
+        """
+
+        with self._lock:
+            metrics = list(self.metrics.values())
+
+        blocks = list()
+        for metric in metrics:
+            try:
+                blocks.append(metric.render())
+            except Exception as error:
+                logger.error('Ошибка вычисления метрики {}: {}'.format(metric.name, error))
+        return '\n'.join(blocks) + '\n'
+
+
+# Общий реестр метрик процесса бота
+registry = Registry()
+
+HANDLER_SECONDS = registry.histogram('bot_handler_seconds', 'Время выполнения обработчика бота', ('handler',))
+UPDATE_SECONDS = registry.histogram('bot_update_seconds', 'Время обработки одного обновления Telegram')
+UPDATE_DB_QUERIES = registry.histogram('bot_update_db_queries', 'Кол-во запросов к БД (без BEGIN) при обработке '
+                                       'обновления', buckets=COUNT_BUCKETS)
+UPDATE_DB_WRITES = registry.histogram('bot_update_db_writes', 'Кол-во изменяющих БД запросов (INSERT, UPDATE, DELETE, '
+                                      'REPLACE) при обработке обновления', buckets=COUNT_BUCKETS)
+UPDATE_DB_TRANSACTIONS = registry.histogram('bot_update_db_transactions', 'Кол-во транзакций БД (BEGIN, вход '
+                                            'в блок with db) при обработке обновления', buckets=COUNT_BUCKETS)
+UPDATE_DB_SECONDS = registry.histogram('bot_update_db_seconds', 'Суммарное время запросов к БД при обработке '
+                                       'обновления')
+UPSTREAM_SECONDS = registry.histogram('upstream_request_seconds', 'Время запроса к Hotels API или к фотографии '
+                                      'отеля', ('endpoint',))
+UPSTREAM_REQUESTS = registry.counter('upstream_requests_total', 'Кол-во запросов к Hotels API и к фотографиям отелей '
+                                     'по статусу ответа (error - ошибка соединения или таймаут)',
+                                     ('endpoint', 'status'))
+SEND_SECONDS = registry.histogram('telegram_send_seconds', 'Время запроса к Telegram Bot API из очереди отправки',
+                                  ('method', 'status'))
+SEND_QUEUE_SECONDS = registry.histogram('telegram_send_queue_seconds', 'Время ожидания запроса в очереди отправки '
+                                        '(с учётом лимитов Telegram)', ('priority',))
+
+registry.callback('db_queries_total', 'Кол-во запросов к БД по хелперам',
+                  lambda: {helper: stats['count'] for helper, stats in query_log.stats().items()},
+                  ('helper',), kind='counter')
+registry.callback('db_query_seconds_total', 'Суммарное время запросов к БД по хелперам',
+                  lambda: {helper: stats['total_ms'] / 1000 for helper, stats in query_log.stats().items()},
+                  ('helper',), kind='counter')
+registry.callback('db_slow_queries_total', 'Кол-во медленных запросов к БД (дольше SLOW_QUERY_MS) по хелперам',
+                  lambda: {helper: stats['slow'] for helper, stats in query_log.stats().items()},
+                  ('helper',), kind='counter')
+
+# Кэши, попадания в которые выводятся в метриках: {название: кэш с атрибутами hits, misses и длиной}
+_caches: dict[str, Any] = dict()
+
+registry.callback('cache_hits_total', 'Кол-во попаданий в кэш',
+                  lambda: {name: cache.hits for name, cache in _caches.items()}, ('cache',), kind='counter')
+registry.callback('cache_misses_total', 'Кол-во промахов кэша',
+                  lambda: {name: cache.misses for name, cache in _caches.items()}, ('cache',), kind='counter')
+registry.callback('cache_hit_ratio', 'Доля попаданий в кэш с запуска бота',
+                  lambda: {name: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else None
+                           for name, cache in _caches.items()}, ('cache',))
+registry.callback('cache_entries', 'Кол-во записей в кэше',
+                  lambda: {name: len(cache) for name, cache in _caches.items()}, ('cache',))
+
+
+def register_cache(name: str, cache: Any) -> None:
+    """
+    Функция, которая добавляет кэш в метрики попаданий.
+
+    Args:
+        name (str): Принимает название кэша (значение метки cache)
+        cache (Any): Принимает кэш с атрибутами hits и misses (storage.LRUCache, storage.CachedStorage)
+    """
+
+    _caches[name] = cache
+
+
+def register_bot_caches() -> None:
+    """
+    Функция, которая добавляет в метрики кэши, общие для синхронного и асинхронного бота.
+    Модули кэшей импортируются при вызове: они сами используют метрики (например, время запросов к Hotels API).
+    """
+
+    from bot_db_pw import storage, photo_files_cache
+    from commands.calendar import MyStyleCalendar
+    from inline import inline_search
+    from photo_sizes import negotiator
+
+    for name, cache in {'users': storage, 'photo_sizes': negotiator.cache, 'photo_files': photo_files_cache,
+                        'calendar': MyStyleCalendar.keyboards, 'inline_answers': inline_search.answers,
+                        'inline_cities': inline_search.cities, 'inline_results': inline_search.results}.items():
+        register_cache(name, cache)
+
+
+def observe_upstream(endpoint: str, status: int | str, elapsed: float) -> None:
+    """
+    Функция, которая учитывает запрос к Hotels API или к фотографии отеля.
+
+    Args:
+        endpoint (str): Принимает метод API (путь адреса запроса)
+        status (int | str): Принимает HTTP-статус ответа или 'error'
+        elapsed (float): Принимает время запроса в секундах
+    """
+
+    UPSTREAM_SECONDS.observe(elapsed, endpoint=endpoint)
+    UPSTREAM_REQUESTS.inc(endpoint=endpoint, status=status)
+
+
+def observe_update(elapsed: float, queries: int, writes: int, transactions: int, db_elapsed: float) -> None:
+    """
+    Функция, которая учитывает обработку одного обновления.
+
+    Args:
+        elapsed (float): Принимает время обработки обновления в секундах
+        queries (int): Принимает кол-во запросов к БД без BEGIN (см. query_log.QueryLog.stop_counting)
+        writes (int): Принимает кол-во изменяющих БД запросов
+        transactions (int): Принимает кол-во транзакций БД
+        db_elapsed (float): Принимает суммарное время запросов к БД в секундах
+    """
+
+    UPDATE_SECONDS.observe(elapsed)
+    UPDATE_DB_QUERIES.observe(queries)
+    UPDATE_DB_WRITES.observe(writes)
+    UPDATE_DB_TRANSACTIONS.observe(transactions)
+    UPDATE_DB_SECONDS.observe(db_elapsed)
+
+
+def timed_handler(handler: Callable) -> Callable:
+    """
+    Функция, которая возвращает обработчик, измеряющий своё время в bot_handler_seconds
+    (обработчик-корутина заменяется корутиной).
+
+    Args:
+        handler (Callable): Принимает обработчик бота
+
+    Returns (Callable): обработчик с измерением времени
+    """
+
+    name = getattr(handler, '__name__', repr(handler))
+
+    if inspect.iscoroutinefunction(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs) -> Any:
+            with HANDLER_SECONDS.time(handler=name):
+                return await handler(*args, **kwargs)
+    else:
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs) -> Any:
+            with HANDLER_SECONDS.time(handler=name):
+                return handler(*args, **kwargs)
+
+    return wrapper
+
+
+def instrument_handlers(bot: Any, router: Any = None) -> None:
+    """
+    Функция, которая включает измерение времени всех зарегистрированных обработчиков
+    бота (TeleBot или AsyncTeleBot) и маршрутизатора нажатий router.CallbackRouter.
+    Вызывается после регистрации обработчиков (при создании приложения).
+
+    Args:
+        bot (Any): Принимает объект бота
+        router (CallbackRouter): Принимает маршрутизатор нажатий, зарегистрированный в боте
+    """
+
+    for attribute in HANDLER_LISTS:
+        for handler in getattr(bot, attribute, ()):
+            function = handler['function']
+            # Маршрутизатор учитывается по обработчикам префиксов, а не общей функцией выбора обработчика
+            if router is not None and function == router.dispatch:
+                continue
+            if not getattr(function, '_timed', False):
+                handler['function'] = timed_handler(function)
+                handler['function']._timed = True
+
+    if router is not None:
+        for prefix, (handler, func) in list(router.handlers.items()):
+            if not getattr(handler, '_timed', False):
+                handler = timed_handler(handler)
+                handler._timed = True
+                router.handlers[prefix] = (handler, func)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP-запросов: GET /metrics возвращает метрики реестра сервера.
+    """
+
+    server: 'MetricsServer'
+
+    def do_GET(self) -> None:
+        if self.path.partition('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        # Каждый опрос не логируется, чтобы не засорять лог
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Многопоточный HTTP-сервер метрик (работает в фоновом потоке, см. start).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, listen: str = METRICS_LISTEN, port: int = METRICS_PORT + WORKER_INDEX,
+                 metrics: Registry = registry) -> None:
+        super().__init__((listen, port), MetricsHandler)
+        self.registry = metrics
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name='Metrics', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def start_server(listen: str = METRICS_LISTEN, port: int = METRICS_PORT + WORKER_INDEX) -> MetricsServer | None:
+    """
+    Функция, которая запускает сервер метрик, если задан METRICS_PORT.
+    Если порт занят, бот работает без сервера метрик (ошибка записывается в лог).
+
+    Args:
+        listen (str): Принимает адрес сервера
+        port (int): Принимает порт сервера (METRICS_PORT + номер процесса бота)
+
+    Returns (MetricsServer | None): запущенный сервер или None
+    """
+
+    if not METRICS_PORT:
+        return None
+
+    try:
+        server = MetricsServer(listen, port)
+    except OSError as error:
+        logger.error('Сервер метрик не запущен ({}:{}): {}'.format(listen, port, error))
+        return None
+
+    server.start()
+    logger.info('Метрики доступны по адресу http://{}:{}/metrics'.format(listen, port))
+    return server
@@ -0,0 +1,174 @@
+"""
+Модуль выбора размера фотографий отелей.
+Hotels API возвращает адреса фотографий с шаблоном размера ("..._{size}.jpg").
+Раньше бот отправлял альбом с самым большим размером и при отказе Telegram
+повторял отправку всего альбома с меньшими размерами (до шести попыток на отель).
+Теперь все варианты размеров проверяются заранее одновременными HEAD-запросами,
+выбирается самый большой вариант, который примет Telegram, и выбор запоминается
+для адреса фотографии, поэтому альбом обычно отправляется с первой попытки.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import re
+import time
+from typing import Callable
+
+from loguru import logger
+import requests
+
+from config import PHOTO_CHECK_WORKERS, PHOTO_SIZE_CACHE
+import metrics
+from storage import LRUCache
+
+
+# Размеры фотографий Hotels API от большего к меньшему
+PHOTO_SIZES = ('w', 'z', 'y', 'd', 'n', '_')
+
+# Максимальный размер фотографии, которую Telegram загружает по ссылке (байт)
+MAX_PHOTO_BYTES = 5 * 1024 * 1024
+
+# Метод в метриках запросов (upstream_request_seconds), под которым учитываются HEAD-запросы к фотографиям
+HEAD_ENDPOINT = 'photo_head'
+
+# Результат HEAD-запроса: HTTP-статус, Content-Type и Content-Length (None, если неизвестен)
+HeadResult = tuple[int, str, int | None]
+
+# Размер в адресе фотографии: один символ после "_" перед расширением (и строкой запроса)
+SIZE_PATTERN = re.compile(r'_(.)(\.\w+(?:\?.*)?)$')
+
+session = requests.Session()
+
+
+def head_request(url: str, timeout: float = 5) -> HeadResult:
+    """
+    Функция, которая выполняет HEAD-запрос к фотографии (загрузчик по умолчанию).
+
+    Args:
+        url (str): Принимает адрес фотографии
+        timeout (float): Принимает таймаут запроса в секундах
+
+    Returns (HeadResult): статус, тип и размер фотографии
+    """
+
+    start = time.perf_counter()
+    try:
+        response = session.head(url, allow_redirects=True, timeout=timeout)
+    except requests.RequestException:
+        metrics.observe_upstream(HEAD_ENDPOINT, 'error', time.perf_counter() - start)
+        raise
+    metrics.observe_upstream(HEAD_ENDPOINT, response.status_code, time.perf_counter() - start)
+
+    length = response.headers.get('Content-Length')
+
+    return response.status_code, response.headers.get('Content-Type', ''), int(length) if length else None
+
+
+def acceptable(result: HeadResult) -> bool:
+    """
+    Функция, которая проверяет, примет ли Telegram фотографию по ссылке:
+    ответ 200, тип image/*, размер не больше MAX_PHOTO_BYTES.
+    """
+
+    status, content_type, length = result
+    return status == 200 and content_type.startswith('image/') and (length is None or length <= MAX_PHOTO_BYTES)
+
+
+def base_url(url: str) -> str:
+    """
+    Функция, которая возвращает шаблон адреса фотографии по адресу с выбранным
+    размером ("..._z.jpg" -> "..._{size}.jpg", "..._z.webp?v=2" -> "..._{size}.webp?v=2").
+    """
+
+    return SIZE_PATTERN.sub(r'_{size}\2', url, count=1)
+
+
+class SizeNegotiator:
+    """
+    Выбор размера фотографий с кэшем {шаблон адреса: размер} ограниченного размера.
+    Загрузчик fetcher(url) -> HeadResult можно заменить (например, на локальный тестовый сервер).
+    """
+
+    def __init__(self, fetcher: Callable[[str], HeadResult] = head_request, workers: int = PHOTO_CHECK_WORKERS,
+                 cache_size: int = PHOTO_SIZE_CACHE) -> None:
+        self.fetcher = fetcher
+        self.cache = LRUCache(maxsize=cache_size)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='photo-size')
+
+    def resolve(self, templates: list[str]) -> list[str]:
+        """
+        Возвращает адреса фотографий с выбранным размером (см. sizes).
+        Фотографии, ни один вариант которых Telegram не примет, пропускаются.
+
+        Args:
+            templates (list): Принимает шаблоны адресов фотографий с "{size}"
+
+        Returns (list): адреса фотографий
+        """
+
+        sizes = self.sizes(templates)
+
+        return [template.replace('{size}', sizes[template]) for template in templates if sizes[template]]
+
+    def sizes(self, templates: list[str]) -> dict[str, str]:
+        """
+        Возвращает выбранный размер каждой фотографии ('' - ни один вариант не подходит).
+        Варианты размеров всех фотографий, которых нет в кэше, проверяются одновременно.
+        Выбор запоминается, только если проверка большего варианта не завершилась ошибкой
+        (таймаут, разрыв соединения): иначе при следующем поиске варианты проверяются снова.
+
+        Args:
+            templates (list): Принимает шаблоны адресов фотографий с "{size}"
+
+        Returns (dict): {шаблон адреса: размер}
+        """
+
+        sizes = {template: self.cache.get(template) for template in templates}
+        checks = {(template, size): self._executor.submit(self._check, template.replace('{size}', size))
+                  for template, known in sizes.items() if known is None for size in PHOTO_SIZES}
+
+        for template, known in sizes.items():
+            if known is None:
+                # Самый большой вариант, который примет Telegram ('' - ни один не подходит)
+                sizes[template], decided = '', True
+                for size in PHOTO_SIZES:
+                    accepted = checks[template, size].result()
+                    if accepted is None:
+                        decided = False
+                    elif accepted:
+                        sizes[template] = size
+                        break
+
+                if decided:
+                    self.cache.put(template, sizes[template])
+                if not sizes[template]:
+                    logger.warning('Нет подходящего размера фотографии{}: {}'.format(
+                        '' if decided else ' (ошибки проверки)', template))
+
+        return sizes
+
+    def forget(self, urls: list[str]) -> None:
+        """
+        Удаляет из кэша выбор размера фотографий (например, если Telegram всё же отклонил альбом).
+
+        Args:
+            urls (list): Принимает адреса фотографий с выбранным размером
+        """
+
+        for url in urls:
+            self.cache.pop(base_url(url))
+
+    def _check(self, url: str) -> bool | None:
+        """
+        Проверяет вариант фотографии: True - Telegram его примет, False - не примет,
+        None - проверка не удалась (ошибка запроса), и о варианте ничего не известно.
+        """
+
+        try:
+            return acceptable(self.fetcher(url))
+        except Exception as error:
+            logger.debug('Ошибка проверки фотографии {}: {}'.format(url, error))
+            return None
+
+
+# Общий выбор размеров фотографий для всех обработчиков бота
+negotiator = SizeNegotiator()
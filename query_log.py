@@ -0,0 +1,272 @@
+"""
+Модуль журнала медленных запросов к БД.
+Измеряет время выполнения каждого SQL-запроса бэкендов bot_db.py (sqlite3)
+и bot_db_pw.py (peewee), записывает в лог запросы дольше SLOW_QUERY_MS
+вместе с планом выполнения (EXPLAIN QUERY PLAN) и именем вызвавшей
+их функции-хелпера, а также ведёт сводные счётчики по каждому хелперу,
+которые можно вывести в лог по запросу (функцией dump или сигналом SIGUSR1).
+"""
+
+import inspect
+import signal
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable
+
+from loguru import logger
+
+from config import SLOW_QUERY_MS
+
+
+# Модули, функции которых считаются хелперами БД
+HELPER_MODULES = ('bot_db', 'bot_db_pw')
+
+# Классы, методы которых только измеряют время запросов: запрос относится к коду, который их вызвал
+INSTRUMENTATION_CLASSES = ('TimedSqliteDatabase', 'TimedConnection', 'TimedCursor')
+
+# Запросы, для которых можно получить план выполнения
+EXPLAINABLE = ('select', 'insert', 'update', 'delete', 'replace', 'with')
+
+# Запросы, которые изменяют БД
+WRITES = ('insert', 'update', 'delete', 'replace')
+
+# Начало транзакции (каждый вход в блок "with db:" выполняет BEGIN)
+TRANSACTIONS = ('begin',)
+
+
+class QueryLog:
+    """
+    Журнал запросов к БД: сводные счётчики по хелперам и лог медленных запросов.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS) -> None:
+        self.threshold_ms = threshold_ms
+        self._stats: dict[str, dict[str, float]] = dict()
+        self._lock = threading.Lock()
+        # Счётчики запросов текущего потока (см. start_counting)
+        self._local = threading.local()
+
+    def record(self, sql: str, params: Any, elapsed: float,
+               explain: Callable[[str, Any], list[tuple]] | None = None) -> None:
+        """
+        Учитывает выполненный запрос в счётчиках и, если запрос медленный,
+        записывает его в лог вместе с планом выполнения.
+
+        Args:
+            sql (str): Принимает текст запроса
+            params (Any): Принимает параметры запроса
+            elapsed (float): Принимает время выполнения запроса (в секундах)
+            explain (Callable): Принимает функцию, которая выполняет
+                                EXPLAIN QUERY PLAN и возвращает строки плана
+        """
+
+        helper = find_helper()
+        elapsed_ms = elapsed * 1000
+        slow = elapsed_ms >= self.threshold_ms
+
+        with self._lock:
+            stats = self._stats.setdefault(helper, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'slow': 0})
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['slow'] += slow
+
+        counters = getattr(self._local, 'counters', None)
+        if counters is not None:
+            statement = sql.lstrip()[:7].lower()
+            if statement.startswith(TRANSACTIONS):
+                counters[2] += 1
+            else:
+                counters[0] += 1
+                counters[1] += statement.startswith(WRITES)
+            counters[3] += elapsed
+
+        if slow:
+            plan = ''
+            if explain is not None and sql.lstrip()[:7].lower().startswith(EXPLAINABLE):
+                try:
+                    plan = format_plan(explain('EXPLAIN QUERY PLAN ' + sql, params))
+                except sqlite3.Error as error:
+                    plan = 'план недоступен: {}'.format(error)
+            logger.warning('Медленный запрос ({:.1f} мс) в {}: {} {}\n{}'.format(
+                elapsed_ms, helper, sql, params if params else '', plan))
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        """
+        Возвращает копию сводных счётчиков {хелпер: {count, total_ms, max_ms, slow}}.
+        """
+
+        with self._lock:
+            return {helper: dict(stats) for helper, stats in self._stats.items()}
+
+    def start_counting(self) -> None:
+        """
+        Начинает подсчёт запросов, выполненных текущим потоком
+        (например, при обработке одного обновления, см. stop_counting).
+        """
+
+        self._local.counters = [0, 0, 0, 0.0]
+
+    def stop_counting(self) -> tuple[int, int, int, float]:
+        """
+        Заканчивает подсчёт запросов текущего потока.
+
+        Returns (tuple): кол-во запросов (без BEGIN), кол-во изменяющих БД запросов (INSERT, UPDATE,
+                         DELETE, REPLACE), кол-во транзакций (BEGIN) и суммарное время всех запросов (в секундах)
+        """
+
+        counters = getattr(self._local, 'counters', None) or [0, 0, 0, 0.0]
+        self._local.counters = None
+        return counters[0], counters[1], counters[2], counters[3]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self) -> str:
+        """
+        Записывает в лог сводные счётчики по хелперам, отсортированные
+        по суммарному времени запросов, и возвращает их в виде таблицы.
+
+        Returns (str): таблица счётчиков
+        """
+
+        lines = ['{:<40} {:>8} {:>12} {:>10} {:>10} {:>6}'.format(
+            'хелпер', 'запросы', 'всего, мс', 'сред., мс', 'макс., мс', 'медл.')]
+        for helper, stats in sorted(self.stats().items(), key=lambda item: item[1]['total_ms'], reverse=True):
+            lines.append('{:<40} {:>8} {:>12.1f} {:>10.2f} {:>10.1f} {:>6}'.format(
+                helper, stats['count'], stats['total_ms'], stats['total_ms'] / stats['count'],
+                stats['max_ms'], stats['slow']))
+
+        table = '\n'.join(lines)
+        logger.info('Статистика запросов к БД:\n{}'.format(table))
+        return table
+
+
+# Имена хелперов по коду функций модулей HELPER_MODULES {id(код): (код, "модуль.функция" или '' для
+# методов классов)}: определяются один раз для каждой функции, а не при каждом запросе
+# (ключ - id, так как хэш объекта кода вычисляется по всему его содержимому)
+_helper_names: dict[int, tuple[Any, str]] = dict()
+
+
+def helper_name(frame) -> str:
+    """
+    Функция, которая определяет имя хелпера по кадру стека функции модуля HELPER_MODULES.
+
+    Returns (str): "модуль.функция" для функции уровня модуля, '' для метода класса
+    """
+
+    module = frame.f_globals['__name__']
+    code = frame.f_code
+    # Функция уровня модуля (в том числе под декоратором): её имя в модуле указывает на этот код
+    # (co_qualname, по которому это видно сразу, есть только в Python 3.11+)
+    function = inspect.unwrap(frame.f_globals.get(code.co_name))
+    if getattr(function, '__code__', None) is code:
+        return '{}.{}'.format(module, code.co_name)
+    return ''
+
+
+def find_helper() -> str:
+    """
+    Функция, которая находит в стеке вызовов ближайшую функцию модулей
+    HELPER_MODULES (методы классов и обёртки декораторов пропускаются,
+    чтобы запрос из метода модели или хранилища был отнесён к вызвавшему его хелперу).
+    Имя хелпера для каждой функции определяется один раз и хранится в _helper_names.
+
+    Returns (str): имя хелпера в виде "модуль.функция"
+    """
+
+    frame = sys._getframe(1)
+    method = None
+    while frame is not None:
+        module = frame.f_globals.get('__name__')
+        if module in HELPER_MODULES:
+            code = frame.f_code
+            cached, name = _helper_names.get(id(code), (None, ''))
+            if cached is not code:
+                name = helper_name(frame)
+                _helper_names[id(code)] = code, name
+            if name:
+                return name
+            owner = frame.f_locals.get('self') if method is None else None
+            if owner is not None and type(owner).__name__ not in INSTRUMENTATION_CLASSES:
+                method = '{}.{}.{}'.format(module, type(owner).__name__, code.co_name)
+        frame = frame.f_back
+
+    return method or '<неизвестно>'
+
+
+def format_plan(rows: list[tuple]) -> str:
+    """
+    Функция, которая форматирует строки результата EXPLAIN QUERY PLAN
+    (id, parent, notused, detail) в виде дерева.
+
+    Args:
+        rows (list): Принимает строки плана выполнения
+
+    Returns (str): план выполнения с отступами
+    """
+
+    depth = {0: 0}
+    lines = list()
+    for row in rows:
+        node_id, parent, _, detail = row.values() if isinstance(row, dict) else row
+        depth[node_id] = depth.get(parent, 0) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+# Общий журнал запросов обоих бэкендов
+query_log = QueryLog()
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Курсор sqlite3, который учитывает время каждого запроса в журнале query_log.
+    """
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            query_log.record(sql, parameters, time.perf_counter() - start, self._explain)
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            query_log.record(sql, None, time.perf_counter() - start)
+
+    def _explain(self, sql: str, parameters: Any) -> list[tuple]:
+        # Обычный курсор, чтобы EXPLAIN не попадал в журнал
+        return sqlite3.Cursor(self.connection).execute(sql, parameters).fetchall()
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Подключение sqlite3, курсоры которого учитывают время запросов
+    (передаётся в sqlite3.connect аргументом factory).
+    """
+
+    def cursor(self, factory: type = TimedCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+
+def install_dump_signal(signum: int | None = getattr(signal, 'SIGUSR1', None)) -> None:
+    """
+    Функция, которая включает вывод статистики запросов в лог по сигналу
+    (по умолчанию SIGUSR1: kill -USR1 <pid бота>). На платформах
+    без такого сигнала (Windows) ничего не делает.
+
+    Args:
+        signum (int): Принимает номер сигнала
+    """
+
+    if signum is None:
+        return
+
+    signal.signal(signum, lambda *_: query_log.dump())
@@ -0,0 +1,96 @@
+"""
+Модуль маршрутизации нажатий на InLine кнопки.
+callback_data каждой кнопки начинается с короткого префикса-пространства
+имён, за которым через ':' идут аргументы ("city:504261", "hist:week",
+"cal1:cbcal_1_s_d_2026_10_19"). Обработчик нажатия выбирается по префиксу
+поиском в словаре, а не перебором фильтров-лямбд, и не зависит от текста сообщения.
+"""
+
+from typing import Any, Callable
+
+from loguru import logger
+from telebot.types import CallbackQuery
+
+
+# Разделитель префикса и аргументов в callback_data
+SEPARATOR = ':'
+
+# Максимальная длина callback_data в Telegram (в байтах)
+MAX_CALLBACK_DATA = 64
+
+
+def callback_data(prefix: str, *args: Any) -> str:
+    """
+    Функция, которая формирует callback_data кнопки: префикс и аргументы через ':'.
+
+    Args:
+        prefix (str): Принимает префикс обработчика
+        args (Any): Принимает аргументы, которые получит обработчик (в виде строк)
+
+    Returns (str): callback_data
+    """
+
+    data = SEPARATOR.join(map(str, (prefix, *args)))
+    if len(data.encode('utf-8')) > MAX_CALLBACK_DATA:
+        raise ValueError('callback_data длиннее {} байт: {}'.format(MAX_CALLBACK_DATA, data))
+
+    return data
+
+
+class CallbackRouter:
+    """
+    Таблица обработчиков нажатий {префикс: (обработчик, фильтр)}.
+    Обработчик вызывается как handler(call, *args), где args - аргументы из callback_data.
+    Регистрируется в боте (TeleBot или AsyncTeleBot) одним обработчиком callback_query.
+    """
+
+    def __init__(self) -> None:
+        self.handlers: dict[str, tuple[Callable, Callable | None]] = dict()
+
+    def route(self, prefix: str, func: Callable[[CallbackQuery], bool] | None = None) -> Callable:
+        """
+        Декоратор, который регистрирует обработчик нажатий на кнопки с префиксом prefix.
+
+        Args:
+            prefix (str): Принимает префикс callback_data
+            func (Callable | None): Принимает дополнительный фильтр нажатий (например, по состоянию диалога)
+        """
+
+        if SEPARATOR in prefix:
+            raise ValueError('Префикс не может содержать "{}": {}'.format(SEPARATOR, prefix))
+        if prefix in self.handlers:
+            raise ValueError('Обработчик с префиксом "{}" уже зарегистрирован'.format(prefix))
+
+        def decorator(handler: Callable) -> Callable:
+            self.handlers[prefix] = (handler, func)
+            return handler
+
+        return decorator
+
+    def match(self, call: CallbackQuery) -> bool:
+        """
+        Фильтр обработчика бота: есть ли обработчик для префикса нажатия и пропускает ли его фильтр.
+        """
+
+        route = self.handlers.get(call.data.partition(SEPARATOR)[0])
+        return route is not None and (route[1] is None or route[1](call))
+
+    def dispatch(self, call: CallbackQuery) -> Any:
+        """
+        Вызывает обработчик префикса нажатия (для AsyncTeleBot возвращает корутину обработчика).
+        """
+
+        prefix, _, payload = call.data.partition(SEPARATOR)
+        route = self.handlers.get(prefix)
+        if route is None:
+            logger.warning('Нет обработчика для callback_data "{}"'.format(call.data))
+            return None
+
+        return route[0](call, *payload.split(SEPARATOR)) if payload else route[0](call)
+
+    def register(self, bot: Any) -> None:
+        """
+        Регистрирует маршрутизатор в боте (TeleBot или AsyncTeleBot).
+        """
+
+        bot.register_callback_query_handler(self.dispatch, func=self.match)
@@ -0,0 +1,454 @@
+"""
+Модуль очереди отправки сообщений в Telegram.
+Все исходящие запросы бота (отправка, изменение и удаление сообщений)
+проходят через общую очередь, которая соблюдает лимиты Telegram:
+глобальный (около 30 сообщений в секунду) и для каждого чата (около
+1 сообщения в секунду). При ответе 429 запрос повторяется автоматически
+через указанное Telegram время retry_after. Ответы на действия пользователя
+(INTERACTIVE) отправляются раньше массового вывода (BULK) других чатов,
+а сообщения одного чата всегда отправляются в порядке постановки в очередь.
+Синхронный бот использует очередь SendQueue (QueuedTeleBot), асинхронный -
+AsyncSendQueue (AsyncQueuedTeleBot, модуль async_sender.py) с теми же лимитами.
+"""
+
+from collections import deque
+from concurrent.futures import Future
+import functools
+import itertools
+import threading
+import time
+from typing import Any, Callable
+
+from loguru import logger
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+from config import (SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_WORKERS, SEND_MAX_RETRIES,
+                    PROGRESS_EDIT_INTERVAL)
+import metrics
+
+
+# Приоритеты отправки: ответы на действия пользователя и массовый вывод (карточки отелей, фотографии)
+INTERACTIVE = 0
+BULK = 1
+
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BULK: 'bulk'}
+
+
+class TokenBucket:
+    """
+    Ведро токенов: пополняется со скоростью rate токенов в секунду до capacity.
+    Не потокобезопасно (используется под блокировкой очереди).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, cost: float = 1, now: float | None = None) -> float:
+        """
+        Возвращает, через сколько секунд в ведре будет cost токенов
+        (запрос дороже ёмкости ведра ждёт полного ведра).
+        """
+
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (min(cost, self.capacity) - self.tokens) / self.rate)
+
+    def take(self, cost: float = 1) -> None:
+        self.tokens -= cost
+
+
+class SendJob:
+    """
+    Запрос к Telegram Bot API в очереди отправки.
+    """
+
+    def __init__(self, func: Callable, chat_id: Any, priority: int, cost: float, seq: int,
+                 future: Any = None) -> None:
+        self.func = func
+        self.chat_id = chat_id
+        self.priority = priority
+        self.cost = cost
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.started = self.enqueued
+        self.retries = 0
+        # Результат запроса: concurrent.futures.Future (SendQueue) или asyncio.Future (AsyncSendQueue)
+        self.future = Future() if future is None else future
+
+    @property
+    def method(self) -> str:
+        """
+        Имя метода бота, который выполняет запрос (для метрик).
+        """
+
+        return getattr(getattr(self.func, 'func', self.func), '__name__', 'unknown')
+
+
+class ChatState:
+    """
+    Очередь запросов одного чата и его лимит.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.jobs: deque[SendJob] = deque()
+        self.bucket = TokenBucket(rate, capacity)
+        # Запрос чата уже выполняется (порядок сообщений чата сохраняется)
+        self.busy = False
+        # Время, до которого Telegram запретил отправку в чат (ответ 429)
+        self.paused_until = 0.0
+
+
+class BaseSendQueue:
+    """
+    Общая часть очередей отправки SendQueue и AsyncSendQueue: глобальное ведро
+    токенов, ведро токенов на каждый чат и выбор следующего запроса. Из готовых
+    к отправке чатов выбирается чат, первый запрос которого имеет наивысший
+    приоритет (при равном приоритете - поставленный раньше). Состояние очереди
+    меняется только под блокировкой _lock.
+    """
+
+    # Исключения Bot API, ответ 429 в которых означает превышение лимита Telegram
+    api_errors: tuple[type[Exception], ...] = (ApiTelegramException,)
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, max_retries: int = SEND_MAX_RETRIES) -> None:
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: dict[Any, ChatState] = dict()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._stopped = False
+        # Метрики: задержка в очереди (от постановки до начала отправки) по приоритетам
+        self._latencies = {priority: deque(maxlen=1000) for priority in PRIORITY_NAMES}
+        self._sent = {priority: 0 for priority in PRIORITY_NAMES}
+        self._retries_429 = 0
+        self._failed = 0
+
+    def metrics(self) -> dict[str, Any]:
+        """
+        Возвращает метрики очереди: кол-во запросов в очереди, кол-во
+        отправленных запросов и задержку в очереди (среднюю, p50, p95,
+        максимальную, мс) по приоритетам, кол-во повторов после ответа 429
+        и кол-во запросов, завершившихся ошибкой.
+        """
+
+        with self._lock:
+            result = {'queued': sum(len(chat.jobs) for chat in self._chats.values()),
+                      'retries_429': self._retries_429,
+                      'failed': self._failed}
+            for priority, name in PRIORITY_NAMES.items():
+                latencies = sorted(self._latencies[priority])
+                result[name] = {'sent': self._sent[priority]}
+                if latencies:
+                    result[name].update(avg_ms=sum(latencies) / len(latencies) * 1000,
+                                        p50_ms=latencies[len(latencies) // 2] * 1000,
+                                        p95_ms=latencies[int(len(latencies) * 0.95)] * 1000,
+                                        max_ms=latencies[-1] * 1000)
+            return result
+
+    def _add(self, job: SendJob) -> None:
+        """
+        Добавляет запрос в очередь его чата (вызывается под блокировкой).
+        """
+
+        chat = self._chats.get(job.chat_id)
+        if chat is None:
+            chat = self._chats[job.chat_id] = ChatState(self.chat_rate, self.chat_burst)
+        chat.jobs.append(job)
+
+    def _pending(self) -> bool:
+        """
+        Проверяет, есть ли в очереди неотправленные или выполняемые запросы (вызывается под блокировкой).
+        """
+
+        return any(chat.jobs or chat.busy for chat in self._chats.values())
+
+    def _select(self) -> tuple[SendJob | None, float | None]:
+        """
+        Выбирает запрос, который можно отправить сейчас с учётом лимитов,
+        и списывает его токены (вызывается под блокировкой).
+
+        Returns (tuple): запрос и None или None и время (в секундах), через которое
+        стоит проверить очередь снова (None - пока в очереди нет запросов)
+        """
+
+        now = time.monotonic()
+        best, wait = None, None
+        for chat_id, chat in list(self._chats.items()):
+            if not chat.jobs:
+                if not chat.busy and chat.bucket.wait_time(self.chat_burst, now) == 0:
+                    # Чат без запросов с полным ведром больше не нужен
+                    del self._chats[chat_id]
+                continue
+            if chat.busy:
+                continue
+            job = chat.jobs[0]
+            delay = max(chat.paused_until - now, chat.bucket.wait_time(job.cost, now))
+            if delay > 0:
+                wait = delay if wait is None else min(wait, delay)
+            elif best is None or (job.priority, job.seq) < (best.priority, best.seq):
+                best = job
+
+        if best is not None:
+            delay = self._global.wait_time(best.cost, now)
+            if delay == 0:
+                chat = self._chats[best.chat_id]
+                chat.jobs.popleft()
+                chat.busy = True
+                chat.bucket.take(best.cost)
+                self._global.take(best.cost)
+                self._latencies[best.priority].append(now - best.enqueued)
+                metrics.SEND_QUEUE_SECONDS.observe(now - best.enqueued, priority=PRIORITY_NAMES[best.priority])
+                return best, None
+            wait = delay if wait is None else min(wait, delay)
+
+        return None, wait
+
+    def _retry_after(self, job: SendJob, error: Exception) -> float | None:
+        """
+        Возвращает время (в секундах), через которое нужно повторить запрос после ответа 429,
+        или None, если запрос не нужно повторять.
+        """
+
+        if not isinstance(error, self.api_errors):
+            return None
+        retry_after = error.result_json.get('parameters', {}).get('retry_after')
+        if error.error_code == 429 and retry_after and job.retries < self.max_retries:
+            logger.warning('Лимит Telegram (429) для чата {}, повтор через {} с'.format(job.chat_id, retry_after))
+            return retry_after
+        return None
+
+    def _requeue(self, job: SendJob, retry_after: float) -> None:
+        """
+        Возвращает запрос в начало очереди его чата и приостанавливает отправку в чат (вызывается под блокировкой).
+        """
+
+        job.retries += 1
+        self._retries_429 += 1
+        chat = self._chats[job.chat_id]
+        chat.paused_until = time.monotonic() + retry_after
+        chat.jobs.appendleft(job)
+        chat.busy = False
+
+    def _release(self, job: SendJob, error: Exception | None) -> None:
+        """
+        Отмечает запрос выполненным (вызывается под блокировкой).
+        """
+
+        self._chats[job.chat_id].busy = False
+        if error is None:
+            self._sent[job.priority] += 1
+        else:
+            self._failed += 1
+
+
+class SendQueue(BaseSendQueue):
+    """
+    Очередь отправки синхронного бота: запросы выполняют workers потоков,
+    запускаемых методом start.
+    """
+
+    def __init__(self, global_rate: float = SEND_GLOBAL_RATE, chat_rate: float = SEND_CHAT_RATE,
+                 chat_burst: float = SEND_CHAT_BURST, workers: int = SEND_WORKERS,
+                 max_retries: int = SEND_MAX_RETRIES) -> None:
+        super().__init__(global_rate, chat_rate, chat_burst, max_retries)
+        self._cond = threading.Condition(self._lock)
+        self._threads = [threading.Thread(target=self._work, name='Sender-{}'.format(index), daemon=True)
+                         for index in range(workers)]
+
+    def start(self) -> None:
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, chat_id: Any, func: Callable, priority: int = INTERACTIVE, cost: float = 1) -> Future:
+        """
+        Ставит запрос в очередь отправки.
+
+        Args:
+            chat_id (Any): Принимает id чата, в который отправляется запрос
+            func (Callable): Принимает функцию без аргументов, выполняющую запрос
+            priority (int): Принимает приоритет INTERACTIVE или BULK
+            cost (float): Принимает кол-во сообщений, которые отправляет запрос
+
+        Returns (Future): результат запроса
+        """
+
+        with self._cond:
+            job = SendJob(func, chat_id, priority, cost, next(self._seq))
+            self._add(job)
+            self._cond.notify()
+        return job.future
+
+    def call(self, chat_id: Any, func: Callable, priority: int = INTERACTIVE, cost: float = 1) -> Any:
+        """
+        Ставит запрос в очередь и ждёт его результата (см. submit).
+        """
+
+        return self.submit(chat_id, func, priority, cost).result()
+
+    def drain(self, timeout: float | None = None) -> bool:
+        """
+        Ждёт отправки всех запросов из очереди (с учётом лимитов) и останавливает очередь.
+
+        Args:
+            timeout (float): Принимает время ожидания в секундах (None - без ограничения)
+
+        Returns (bool): True, если все запросы отправлены до истечения времени
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            drained = not self._pending()
+        self.stop()
+        return drained
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _next_job(self) -> SendJob | None:
+        """
+        Ждёт и возвращает следующий запрос, который можно отправить с учётом
+        лимитов, или None, если очередь остановлена.
+        """
+
+        with self._cond:
+            while not self._stopped:
+                job, wait = self._select()
+                if job is not None:
+                    return job
+                self._cond.wait(wait)
+
+        return None
+
+    def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                break
+
+            job.started = time.monotonic()
+            try:
+                result = job.func()
+            except Exception as error:
+                retry_after = self._retry_after(job, error)
+                if retry_after:
+                    self._retry(job, retry_after)
+                    continue
+                self._finish(job, error=error)
+            else:
+                self._finish(job, result=result)
+
+    def _retry(self, job: SendJob, retry_after: float) -> None:
+        metrics.SEND_SECONDS.observe(time.monotonic() - job.started, method=job.method, status='retry')
+        with self._cond:
+            self._requeue(job, retry_after)
+            self._cond.notify_all()
+
+    def _finish(self, job: SendJob, result: Any = None, error: Exception | None = None) -> None:
+        metrics.SEND_SECONDS.observe(time.monotonic() - job.started, method=job.method,
+                                     status='ok' if error is None else 'error')
+        with self._cond:
+            self._release(job, error)
+            self._cond.notify_all()
+
+        if error is None:
+            job.future.set_result(result)
+        else:
+            # Результат массового вывода (BULK) обработчик обычно не ждёт, поэтому ошибка записывается в лог здесь
+            if job.priority == BULK:
+                logger.error('Ошибка запроса {} в чат {} из очереди отправки: {}'.format(job.method, job.chat_id,
+                                                                                          error))
+            job.future.set_exception(error)
+
+
+class EditThrottle:
+    """
+    Ограничение частоты изменений одного сообщения (например, сообщения с ходом
+    вывода результатов): текст меняется не чаще раза в interval секунд и только
+    если он отличается от уже отправленного (Telegram отклоняет изменение без изменений).
+    """
+
+    def __init__(self, interval: float = PROGRESS_EDIT_INTERVAL, clock: Callable[[], float] = time.monotonic) -> None:
+        self.interval = interval
+        self.clock = clock
+        self.text: str | None = None
+        self.edited = float('-inf')
+        self.skipped = 0
+
+    def ready(self, text: str, force: bool = False) -> bool:
+        """
+        Проверяет, нужно ли изменить сообщение на text сейчас, и если да, запоминает text как отправленный.
+
+        Args:
+            text (str): Принимает новый текст сообщения
+            force (bool): Принимает признак последнего изменения (отправляется без учёта интервала)
+
+        Returns (bool): True, если сообщение нужно изменить
+        """
+
+        if text == self.text:
+            return False
+
+        now = self.clock()
+        if not force and now - self.edited < self.interval:
+            self.skipped += 1
+            return False
+
+        self.text = text
+        self.edited = now
+        return True
+
+
+class QueuedTeleBot(TeleBot):
+    """
+    TeleBot, методы отправки, изменения и удаления сообщений которого проходят
+    через очередь отправки SendQueue. Методы принимают дополнительный
+    аргумент priority: при INTERACTIVE (по умолчанию) метод ждёт отправки
+    и возвращает её результат, при BULK - сразу возвращает Future
+    (массовый вывод не задерживает поток обработки обновлений).
+    Потоки отправки запускаются методом send_queue.start().
+    """
+
+    def __init__(self, token: str, send_queue: SendQueue | None = None, **kwargs) -> None:
+        super().__init__(token, **kwargs)
+        self.send_queue = send_queue or SendQueue()
+
+    def _queued(self, chat_id: Any, func: Callable, priority: int, cost: float = 1) -> Any:
+        future = self.send_queue.submit(chat_id, func, priority, cost)
+        return future if priority == BULK else future.result()
+
+    def send_message(self, chat_id, text, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return self._queued(chat_id, functools.partial(super().send_message, chat_id, text, *args, **kwargs),
+                            priority)
+
+    def send_media_group(self, chat_id, media, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        # Telegram учитывает каждое фото альбома как отдельное сообщение
+        return self._queued(chat_id, functools.partial(super().send_media_group, chat_id, media, *args, **kwargs),
+                            priority, cost=len(media))
+
+    def edit_message_text(self, text, chat_id=None, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return self._queued(chat_id, functools.partial(super().edit_message_text, text, chat_id, *args, **kwargs),
+                            priority)
+
+    def edit_message_reply_markup(self, chat_id=None, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return self._queued(chat_id, functools.partial(super().edit_message_reply_markup, chat_id, *args, **kwargs),
+                            priority)
+
+    def delete_message(self, chat_id, message_id, *args, priority: int = INTERACTIVE, **kwargs) -> Any:
+        return self._queued(chat_id, functools.partial(super().delete_message, chat_id, message_id, *args, **kwargs),
+                            priority)
+
@@ -0,0 +1,184 @@
+"""
+Модуль плавной остановки бота.
+По сигналу SIGTERM или SIGINT ([Ctrl] + C) бот перестаёт получать обновления,
+даёт обработчикам, которые уже выполняются, завершить поиск и запись истории,
+отправляет сообщения из очереди отправки и сохраняет снимок кэшей в памяти.
+Все шаги остановки укладываются в общее время SHUTDOWN_TIMEOUT.
+Снимок (размеры и file_id фотографий отелей) загружается при следующем запуске,
+поэтому после перезапуска бот не повторяет уже выполненные проверки фотографий.
+"""
+
+import json
+import os
+import signal
+import time
+from typing import Any, Callable
+
+from loguru import logger
+
+from bot_db_pw import photo_files_cache
+from config import SHUTDOWN_TIMEOUT, STATE_SNAPSHOT, WORKER_INDEX
+from photo_sizes import negotiator
+
+
+# Этапы остановки (шаги выполняются по порядку этапов, внутри этапа - по порядку добавления)
+STOP_INTAKE, DRAIN, FLUSH, SAVE = range(4)
+
+# Сигналы, по которым бот останавливается плавно
+SHUTDOWN_SIGNALS = tuple(getattr(signal, name) for name in ('SIGTERM', 'SIGINT') if hasattr(signal, name))
+
+# Кэши, которые сохраняются в снимок: {имя в снимке: LRU-кэш}
+SNAPSHOT_CACHES = {'photo_sizes': negotiator.cache,
+                   'photo_files': photo_files_cache}
+
+
+class ShutdownRequested(SystemExit):
+    """
+    Исключение, которым обработчик сигнала прерывает получение обновлений в главном потоке.
+    """
+
+
+class GracefulShutdown:
+    """
+    Шаги остановки бота с общим ограничением времени.
+    Шаг - функция step(remaining), которая получает оставшееся время (в секундах)
+    и возвращает False, если не успела завершить работу.
+    """
+
+    def __init__(self, timeout: float = SHUTDOWN_TIMEOUT, clock: Callable[[], float] = time.monotonic) -> None:
+        self.timeout = timeout
+        self.clock = clock
+        self.steps: list[tuple[int, str, Callable[[float], Any]]] = list()
+        self.requested = False
+        # Сигнал, по которому началась остановка (None - остановка без сигнала)
+        self.signum: int | None = None
+        self._finished = False
+
+    def add(self, stage: int, name: str, step: Callable[[float], Any]) -> None:
+        """
+        Добавляет шаг остановки.
+
+        Args:
+            stage (int): Принимает этап остановки (STOP_INTAKE, DRAIN, FLUSH или SAVE)
+            name (str): Принимает название шага для лога
+            step (Callable): Принимает функцию step(remaining)
+        """
+
+        self.steps.append((stage, name, step))
+
+    def install(self, signals: tuple[int, ...] = SHUTDOWN_SIGNALS) -> None:
+        """
+        Устанавливает обработчики сигналов остановки (только из главного потока).
+        """
+
+        for signum in signals:
+            signal.signal(signum, self._on_signal)
+
+    def run(self) -> bool:
+        """
+        Выполняет шаги остановки (повторный вызов ничего не делает).
+
+        Returns (bool): True, если все шаги завершились до истечения времени
+        """
+
+        if self._finished:
+            return True
+        self.requested = self._finished = True
+
+        if self.signum is not None:
+            logger.info('Получен сигнал {}, бот останавливается (не дольше {:.0f} с)'.format(
+                signal.Signals(self.signum).name, self.timeout))
+
+        start = self.clock()
+        deadline = start + self.timeout
+        completed = True
+        for stage, name, step in sorted(self.steps, key=lambda item: item[0]):
+            step_start = self.clock()
+            try:
+                result = step(max(deadline - step_start, 0))
+            except Exception as error:
+                completed = False
+                logger.error('Остановка: ошибка шага "{}": {}'.format(name, error))
+                continue
+            if result is False:
+                completed = False
+                logger.warning('Остановка: шаг "{}" не завершён за отведённое время'.format(name))
+            else:
+                logger.info('Остановка: шаг "{}" выполнен за {:.0f} мс'.format(name,
+                                                                             (self.clock() - step_start) * 1000))
+
+        logger.info('Бот остановлен за {:.1f} с'.format(self.clock() - start))
+        return completed
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        # Обработчик сигнала ничего не пишет в лог: сигнал может прервать главный поток
+        # во время записи в лог, и повторная запись заблокирует поток навсегда
+        if self.requested:
+            return
+
+        self.requested = True
+        self.signum = signum
+        raise ShutdownRequested(0)
+
+
+def snapshot_path(path: str = STATE_SNAPSHOT, worker: int = WORKER_INDEX) -> str:
+    """
+    Функция, которая возвращает путь к файлу снимка кэшей процесса бота ('' - снимок не сохраняется).
+    """
+
+    return path.format(worker=worker)
+
+
+def save_snapshot(path: str | None = None) -> int:
+    """
+    Функция, которая сохраняет кэши SNAPSHOT_CACHES в файл снимка
+    (через временный файл, чтобы при сбое не остался повреждённый снимок).
+
+    Args:
+        path (str): Принимает путь к файлу снимка (по умолчанию - snapshot_path())
+
+    Returns (int): кол-во сохранённых записей
+    """
+
+    path = snapshot_path() if path is None else path
+    if not path:
+        return 0
+
+    state = {name: cache.items() for name, cache in SNAPSHOT_CACHES.items()}
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(state, file, ensure_ascii=False)
+    os.replace(path + '.tmp', path)
+
+    return sum(len(items) for items in state.values())
+
+
+def load_snapshot(path: str | None = None) -> int:
+    """
+    Функция, которая загружает кэши SNAPSHOT_CACHES из файла снимка, если он есть.
+
+    Args:
+        path (str): Принимает путь к файлу снимка (по умолчанию - snapshot_path())
+
+    Returns (int): кол-во загруженных записей
+    """
+
+    path = snapshot_path() if path is None else path
+    if not path or not os.path.exists(path):
+        return 0
+
+    try:
+        with open(path, encoding='utf-8') as file:
+            state = json.load(file)
+    except (OSError, ValueError) as error:
+        logger.warning('Снимок кэшей {} не загружен: {}'.format(path, error))
+        return 0
+
+    loaded = 0
+    for name, cache in SNAPSHOT_CACHES.items():
+        for key, value in state.get(name, list()):
+            cache.put(key, value)
+            loaded += 1
+
+    return loaded
@@ -0,0 +1,366 @@
+"""
+Модуль хранилища данных пользователей.
+Содержит общий интерфейс хранилища, который реализуют бэкенды
+bot_db.py (sqlite3) и bot_db_pw.py (peewee), хранилище в памяти
+(для тестов и бенчмарков) и LRU-кэш строк пользователей и их текущих
+сессий поиска, работающий по схеме write-through поверх любого хранилища.
+
+Данные разделены на две таблицы:
+- "users" - долгоживущие данные пользователя (имя, язык, валюта);
+- "search_sessions" - временные данные одного поиска (город, даты, кол-во
+  отелей и т.д.). Каждая новая команда поиска - это новая строка,
+  текущая сессия пользователя - его последняя строка.
+"""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import datetime as dt
+import itertools
+import threading
+import time
+from typing import Any, Callable
+
+
+# Настройки пользователя по умолчанию (таблица users, сбрасываются командой /reset)
+DEFAULT_USER_SETTINGS = {'language': 'ru_RU',
+                         'lang_flag': False,
+                         'currency': 'RUB',
+                         'cur_flag': False
+                         }
+
+# Параметры поиска по умолчанию (таблица search_sessions)
+DEFAULT_SESSION_DATA = {'cities': None,
+                        'city_id': None,
+                        'city_name': None,
+                        'date_in': None,
+                        'date_out': None,
+                        'hotels_count': None,
+                        'needed_photo': False,
+                        'photos_count': None,
+                        'price_range': None,
+                        'dist_range': None,
+                        'advanced_question_flag': False,
+                        'searching_function': None
+                        }
+
+
+class UserStorage(ABC):
+    """
+    Интерфейс хранилища строк таблиц "users" и "search_sessions".
+    Строки представлены словарями {имя столбца: значение}.
+    """
+
+    @abstractmethod
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        """
+        Возвращает строку пользователя или None, если пользователя нет.
+        """
+
+    @abstractmethod
+    def add_user(self, user_id: int, first_name: str, last_name: str, join_date: str) -> None:
+        """
+        Добавляет пользователя (повторное добавление игнорируется).
+        """
+
+    @abstractmethod
+    def update_user(self, user_id: int, **fields: Any) -> None:
+        """
+        Записывает переданные поля в строку пользователя.
+        """
+
+    @abstractmethod
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        """
+        Возвращает текущую (последнюю) сессию поиска пользователя или None.
+        """
+
+    @abstractmethod
+    def start_session(self, user_id: int, **fields: Any) -> dict[str, Any]:
+        """
+        Создаёт новую сессию поиска и возвращает её строку.
+        """
+
+    @abstractmethod
+    def update_session(self, session_id: int, **fields: Any) -> None:
+        """
+        Записывает переданные поля в сессию поиска с указанным id.
+        """
+
+    def reset_user(self, user_id: int) -> None:
+        """
+        Сбрасывает настройки пользователя и начинает пустую сессию поиска.
+        """
+
+        self.update_user(user_id, **DEFAULT_USER_SETTINGS)
+        self.start_session(user_id)
+
+    def normalize(self, fields: dict[str, Any]) -> dict[str, Any]:
+        """
+        Приводит записываемые значения к виду, в котором их вернёт хранилище.
+        Используется кэшем, чтобы строка в кэше не отличалась от строки в БД.
+        """
+
+        return fields
+
+    def user_exists(self, user_id: int) -> bool:
+        return self.get_user(user_id) is not None
+
+
+class MemoryStorage(UserStorage):
+    """
+    Хранилище пользователей и сессий поиска в памяти процесса.
+    """
+
+    def __init__(self) -> None:
+        self._users: dict[int, dict[str, Any]] = dict()
+        self._sessions: dict[int, dict[str, Any]] = dict()
+        self._session_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        with self._lock:
+            user = self._users.get(user_id)
+            return dict(user) if user is not None else None
+
+    def add_user(self, user_id: int, first_name: str, last_name: str, join_date: str) -> None:
+        with self._lock:
+            self._users.setdefault(user_id, {'id': len(self._users) + 1,
+                                             'user_id': user_id,
+                                             'first_name': first_name,
+                                             'last_name': last_name,
+                                             'join_date': join_date,
+                                             **DEFAULT_USER_SETTINGS
+                                             })
+
+    def update_user(self, user_id: int, **fields: Any) -> None:
+        with self._lock:
+            if user_id in self._users:
+                self._users[user_id].update(fields)
+
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        with self._lock:
+            session = self._sessions.get(user_id)
+            return dict(session) if session is not None else None
+
+    def start_session(self, user_id: int, **fields: Any) -> dict[str, Any]:
+        with self._lock:
+            session = {'id': next(self._session_ids),
+                       'user_id': user_id,
+                       'created': dt.datetime.now().replace(microsecond=0),
+                       **DEFAULT_SESSION_DATA,
+                       **fields
+                       }
+            self._sessions[user_id] = session
+            return dict(session)
+
+    def update_session(self, session_id: int, **fields: Any) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                if session['id'] == session_id:
+                    session.update(fields)
+
+
+class LRUCache:
+    """
+    Потокобезопасный словарь ограниченного размера, который при
+    переполнении удаляет давно не использовавшиеся ключи.
+    Считает попадания и промахи чтения (hits, misses) для метрик.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key: Any) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value
+
+    def _lookup(self, key: Any) -> Any:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> Any:
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def values(self) -> list:
+        with self._lock:
+            return list(self._data.values())
+
+    def items(self) -> list[tuple]:
+        """
+        Возвращает пары (ключ, значение) от давно не использовавшихся к недавним
+        (в этом порядке их можно записать в новый кэш, сохранив порядок вытеснения).
+        """
+
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class TTLCache(LRUCache):
+    """
+    LRU-кэш, значения которого устаревают через ttl секунд после записи
+    (устаревшее значение не возвращается и удаляется при чтении).
+    """
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic) -> None:
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.clock = clock
+
+    def _lookup(self, key: Any) -> Any:
+        item = super()._lookup(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires <= self.clock():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        super().put(key, (self.clock() + self.ttl, value))
+
+    def pop(self, key: Any) -> Any:
+        item = super().pop(key)
+        return item[1] if item is not None else None
+
+    def values(self) -> list:
+        now = self.clock()
+        return [value for expires, value in super().values() if expires > now]
+
+    def items(self) -> list[tuple]:
+        now = self.clock()
+        return [(key, value) for key, (expires, value) in super().items() if expires > now]
+
+
+class CachedStorage(UserStorage):
+    """
+    Ограниченный по размеру LRU-кэш строк пользователей и их текущих сессий
+    поиска поверх хранилища. Чтение горячих пользователей не обращается к БД,
+    а запись сначала выполняется в хранилище и затем применяется к строке
+    в кэше (write-through).
+    """
+
+    def __init__(self, backend: UserStorage, maxsize: int = 1024) -> None:
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._users = LRUCache(maxsize)
+        self._sessions = LRUCache(maxsize)
+        self._lock = threading.RLock()
+        # Счётчик записей: строка, прочитанная из хранилища во время
+        # чьей-то записи, не попадает в кэш (она может быть устаревшей)
+        self._writes = 0
+
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        return self._read(self._users, user_id, self.backend.get_user)
+
+    def add_user(self, user_id: int, first_name: str, last_name: str, join_date: str) -> None:
+        self.backend.add_user(user_id, first_name, last_name, join_date)
+        self.invalidate(user_id)
+
+    def update_user(self, user_id: int, **fields: Any) -> None:
+        self.backend.update_user(user_id, **fields)
+        self._apply(self._users, user_id, fields)
+
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        return self._read(self._sessions, user_id, self.backend.get_session)
+
+    def start_session(self, user_id: int, **fields: Any) -> dict[str, Any]:
+        session = self.backend.start_session(user_id, **fields)
+        with self._lock:
+            self._writes += 1
+            self._sessions.put(user_id, dict(session))
+        return session
+
+    def update_session(self, session_id: int, **fields: Any) -> None:
+        self.backend.update_session(session_id, **fields)
+        with self._lock:
+            self._writes += 1
+            # Сессии в кэше хранятся по id пользователя
+            for session in self._sessions.values():
+                if session['id'] == session_id:
+                    session.update(self.backend.normalize(dict(fields)))
+
+    def update_current_session(self, user_id: int, **fields: Any) -> None:
+        """
+        Записывает поля в текущую сессию поиска пользователя
+        (создаёт сессию, если у пользователя её ещё нет).
+        """
+
+        session = self.get_session(user_id)
+        if session is None:
+            self.start_session(user_id, **fields)
+            return
+
+        self.backend.update_session(session['id'], **fields)
+        with self._lock:
+            self._writes += 1
+            cached = self._sessions.get(user_id)
+            if cached is not None and cached['id'] == session['id']:
+                cached.update(self.backend.normalize(dict(fields)))
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._writes += 1
+            self._users.pop(user_id)
+            self._sessions.pop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._writes += 1
+            self._users.clear()
+            self._sessions.clear()
+
+    def _read(self, cache: LRUCache, user_id: int, loader) -> dict[str, Any] | None:
+        with self._lock:
+            row = cache.get(user_id)
+            if row is not None:
+                self.hits += 1
+                return dict(row)
+            self.misses += 1
+            writes = self._writes
+
+        row = loader(user_id)
+
+        if row is not None:
+            with self._lock:
+                if writes == self._writes:
+                    cache.put(user_id, dict(row))
+
+        return row
+
+    def _apply(self, cache: LRUCache, user_id: int, fields: dict[str, Any]) -> None:
+        with self._lock:
+            self._writes += 1
+            row = cache.get(user_id)
+            if row is not None:
+                row.update(self.backend.normalize(dict(fields)))
+
+    def __len__(self) -> int:
+        return len(self._users)
@@ -0,0 +1,421 @@
+"""
+Модуль супервизора процессов бота.
+Запускает несколько процессов бота (EXECUTE_CMD), каждый из которых
+принимает обновления локально в режиме webhook на своём порту. Супервизор
+сам получает обновления от Telegram (long polling или webhook, см. BOT_MODE)
+и передаёт каждое обновление процессу с номером chat_id % кол-во процессов,
+поэтому все обновления одного чата обрабатывает один процесс (по порядку,
+с его кэшем пользователей), а процессы разных чатов занимают все ядра.
+Упавшие процессы перезапускаются, нагрузка процессов периодически выводится в лог.
+При остановке супервизор перестаёт получать обновления, передаёт процессам
+обновления из очередей и останавливает процессы плавно (SIGTERM, см. shutdown.py).
+"""
+
+import json
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any
+
+from loguru import logger
+from telebot import TeleBot, apihelper
+
+from config import (BOT_TOKEN, BOT_MODE, EXECUTE_CMD, BOT_WORKERS, WORKER_BASE_PORT, SUPERVISOR_REPORT_INTERVAL,
+                    UPDATE_QUEUE_SIZE, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET, SHUTDOWN_TIMEOUT, TELEGRAM_API_URL)
+from dispatcher import UPDATE_TYPES
+from webhook import WebhookHandler, WebhookServer, with_secret
+
+
+# Запас времени (в секундах) сверх SHUTDOWN_TIMEOUT на сохранение снимка кэшей и завершение процесса бота
+STOP_GRACE = 5
+
+
+def get_raw_chat_id(update: dict[str, Any]) -> int:
+    """
+    Функция, которая возвращает id чата обновления в формате JSON
+    (аналог dispatcher.get_chat_id для ещё не разобранного обновления).
+
+    Args:
+        update (dict): Принимает обновление Telegram в формате JSON
+
+    Returns (int): id чата
+    """
+
+    for update_type in UPDATE_TYPES:
+        content = update.get(update_type)
+        if content is None:
+            continue
+        chat = content.get('chat') or (content.get('message') or {}).get('chat')
+        if chat is not None:
+            return chat['id']
+        user = content.get('from') or content.get('user')
+        if user is not None:
+            return user['id']
+
+    return update['update_id']
+
+
+def wait_process(process: subprocess.Popen, timeout: float = SHUTDOWN_TIMEOUT + STOP_GRACE) -> int:
+    """
+    Функция, которая ждёт завершения процесса бота, получившего сигнал остановки,
+    не дольше timeout секунд, после чего завершает процесс принудительно.
+    Повторный сигнал процессу не отправляется: он уже выполняет плавную остановку.
+
+    Args:
+        process (subprocess.Popen): Принимает процесс бота
+        timeout (float): Принимает время ожидания завершения процесса
+
+    Returns (int): код завершения процесса
+    """
+
+    try:
+        return process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        logger.error('Процесс бота (pid {}) не остановился за {:.0f} с и завершён принудительно'.format(
+            process.pid, timeout))
+        process.kill()
+        return process.wait()
+
+
+def run_bot(command: str = EXECUTE_CMD) -> int:
+    """
+    Функция, которая запускает один процесс бота и ждёт его завершения.
+    Если ожидание прервано (SIGTERM или [Ctrl] + C), процесс бота останавливается плавно.
+
+    Args:
+        command (str): Принимает команду запуска бота
+
+    Returns (int): код завершения процесса бота
+    """
+
+    process = subprocess.Popen(shlex.split(command))
+    try:
+        return process.wait()
+    finally:
+        if process.poll() is None:
+            logger.info('Остановка процесса бота (pid {})...'.format(process.pid))
+            process.terminate()
+            wait_process(process)
+
+
+class WorkerProcess:
+    """
+    Процесс бота и поток, который по порядку передаёт ему обновления
+    POST-запросами на http://127.0.0.1:port + WEBHOOK_PATH/WEBHOOK_SECRET.
+    """
+
+    # Процесс, проработавший меньше этого времени (в секундах), считается упавшим при запуске:
+    # пауза перед его перезапуском удваивается (до MAX_RESTART_DELAY)
+    MIN_UPTIME = 10
+    MAX_RESTART_DELAY = 60
+
+    def __init__(self, index: int, port: int, command: str = EXECUTE_CMD,
+                 queue_size: int = UPDATE_QUEUE_SIZE) -> None:
+        self.index = index
+        self.port = port
+        self.command = command
+        self.url = with_secret('http://127.0.0.1:{}{}'.format(port, WEBHOOK_PATH))
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.process: subprocess.Popen | None = None
+        self.started = 0.0
+        self.restart_delay = 1.0
+        self.restart_at = 0.0
+        # Счётчики нагрузки: передано обновлений, суммарное время передачи, ошибки, перезапуски
+        self.forwarded = 0
+        self.forward_time = 0.0
+        self.errors = 0
+        self.restarts = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._forward, name='Forward-{}'.format(index), daemon=True)
+
+    def start(self) -> None:
+        """
+        Запускает процесс бота в режиме локального webhook на своём порту.
+        """
+
+        # Секрет webhook (в том числе созданный случайным) общий для супервизора и процессов бота
+        env = dict(os.environ, BOT_MODE='webhook', WEBHOOK_LISTEN='127.0.0.1', WEBHOOK_PORT=str(self.port),
+                   WEBHOOK_URL='', WEBHOOK_SECRET=WEBHOOK_SECRET, WORKER_INDEX=str(self.index))
+        self.process = subprocess.Popen(shlex.split(self.command), env=env)
+        self.started = time.monotonic()
+        if not self._thread.is_alive():
+            self._thread.start()
+        logger.info('Процесс бота {} запущен (pid {}, порт {})'.format(self.index, self.process.pid, self.port))
+
+    def check(self) -> None:
+        """
+        Перезапускает процесс бота, если он завершился (с паузой, которая
+        растёт, пока процесс падает сразу после запуска).
+        """
+
+        if self.process is None or self.process.poll() is None:
+            return
+
+        now = time.monotonic()
+        if not self.restart_at:
+            if now - self.started < self.MIN_UPTIME:
+                self.restart_delay = min(self.restart_delay * 2, self.MAX_RESTART_DELAY)
+            else:
+                self.restart_delay = 1.0
+            self.restart_at = now + self.restart_delay
+            logger.error('Процесс бота {} завершился с кодом {}, перезапуск через {:.0f} с'.format(
+                self.index, self.process.returncode, self.restart_delay))
+        elif now >= self.restart_at:
+            self.restart_at = 0.0
+            self.restarts += 1
+            self.start()
+
+    def drain(self, timeout: float) -> bool:
+        """
+        Ждёт передачи процессу бота всех обновлений из очереди.
+
+        Args:
+            timeout (float): Принимает время ожидания в секундах
+
+        Returns (bool): True, если все обновления переданы
+        """
+
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            if self.process is None or self.process.poll() is not None:
+                # Процесс бота завершился и при остановке супервизора не перезапускается
+                break
+            time.sleep(0.05)
+        return not self.queue.unfinished_tasks
+
+    def terminate(self) -> None:
+        """
+        Останавливает передачу обновлений и отправляет процессу бота сигнал плавной остановки.
+        """
+
+        self._stop_event.set()
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, timeout: float = SHUTDOWN_TIMEOUT + STOP_GRACE) -> None:
+        """
+        Ждёт завершения процесса бота после terminate().
+
+        Args:
+            timeout (float): Принимает время ожидания завершения процесса до его принудительной остановки
+        """
+
+        if self.process is not None:
+            wait_process(self.process, timeout)
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT + STOP_GRACE) -> None:
+        """
+        Останавливает передачу обновлений и завершает процесс бота.
+
+        Args:
+            timeout (float): Принимает время ожидания завершения процесса до его принудительной остановки
+        """
+
+        self.terminate()
+        self.wait(timeout)
+
+    def _forward(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                update = self.queue.get(timeout=1)
+            except queue.Empty:
+                continue
+
+            data = json.dumps(update).encode('utf-8')
+            # Пока процесс бота недоступен (например, перезапускается), обновление ждёт в очереди
+            while not self._stop_event.is_set():
+                request = urllib.request.Request(self.url, data=data, headers={'Content-Type': 'application/json'})
+                start = time.perf_counter()
+                try:
+                    with urllib.request.urlopen(request, timeout=10):
+                        pass
+                except urllib.error.HTTPError as error:
+                    if error.code == 503:
+                        # Процесс бота останавливается: обновление передаётся после его перезапуска
+                        time.sleep(0.5)
+                        continue
+                    self.errors += 1
+                    logger.error('Процесс бота {} отклонил обновление {}: {}'.format(self.index,
+                                                                                   update['update_id'], error))
+                    break
+                except OSError:
+                    time.sleep(0.5)
+                    continue
+                self.forwarded += 1
+                self.forward_time += time.perf_counter() - start
+                break
+            self.queue.task_done()
+
+
+class FrontHandler(WebhookHandler):
+    """
+    Обработчик webhook супервизора: обновление не разбирается,
+    а передаётся процессу бота в исходном виде.
+    """
+
+    def decode(self, data: Any) -> dict[str, Any]:
+        if not isinstance(data, dict) or 'update_id' not in data:
+            raise ValueError('Обновление без update_id')
+        return data
+
+
+class Supervisor:
+    """
+    Супервизор workers процессов бота.
+    Обновление чата chat_id передаётся процессу с номером chat_id % workers.
+    """
+
+    def __init__(self, workers: int = BOT_WORKERS, base_port: int = WORKER_BASE_PORT,
+                 command: str = EXECUTE_CMD, report_interval: int = SUPERVISOR_REPORT_INTERVAL) -> None:
+        self.workers = [WorkerProcess(index, base_port + index, command) for index in range(workers)]
+        self.report_interval = report_interval
+        self._stop_event = threading.Event()
+        self._reported = (time.monotonic(), [0] * workers)
+        # update_id, начиная с которого обновления ещё не поставлены в очереди процессов (режим long polling)
+        self.offset: int | None = None
+
+    def dispatch(self, update: dict[str, Any]) -> None:
+        """
+        Ставит обновление в очередь процесса, обрабатывающего его чат
+        (если очередь заполнена, ждёт освобождения места).
+
+        Args:
+            update (dict): Принимает обновление Telegram в формате JSON
+        """
+
+        self.workers[get_raw_chat_id(update) % len(self.workers)].queue.put(update)
+
+    @property
+    def accepting(self) -> bool:
+        """
+        Принимает ли супервизор новые обновления (False после начала остановки).
+        """
+
+        return not self._stop_event.is_set()
+
+    def metrics(self) -> list[dict[str, Any]]:
+        """
+        Возвращает нагрузку каждого процесса бота: pid, работает ли процесс,
+        кол-во переданных обновлений, длину очереди, среднее время передачи
+        обновления (мс), кол-во ошибок и перезапусков.
+        """
+
+        return [{'worker': worker.index,
+                 'pid': worker.process.pid if worker.process else None,
+                 'alive': worker.process is not None and worker.process.poll() is None,
+                 'forwarded': worker.forwarded,
+                 'queued': worker.queue.qsize(),
+                 'avg_forward_ms': worker.forward_time / worker.forwarded * 1000 if worker.forwarded else 0.0,
+                 'errors': worker.errors,
+                 'restarts': worker.restarts} for worker in self.workers]
+
+    def report(self) -> None:
+        """
+        Выводит в лог нагрузку каждого процесса бота с момента предыдущего отчёта.
+        """
+
+        now = time.monotonic()
+        last_time, last_forwarded = self._reported
+        elapsed = max(now - last_time, 1e-9)
+        for metrics, previous in zip(self.metrics(), last_forwarded):
+            logger.info('Процесс бота {worker} (pid {pid}, {state}): {rate:.1f} обновл./с, в очереди {queued}, '
+                        'передача {avg_forward_ms:.1f} мс, ошибок {errors}, перезапусков {restarts}'.format(
+                            rate=(metrics['forwarded'] - previous) / elapsed,
+                            state='работает' if metrics['alive'] else 'остановлен',
+                            **metrics))
+        self._reported = (now, [worker.forwarded for worker in self.workers])
+
+    def run(self) -> None:
+        """
+        Запускает процессы бота и получение обновлений до остановки супервизора.
+        """
+
+        for worker in self.workers:
+            worker.start()
+        threading.Thread(target=self._monitor, name='Monitor', daemon=True).start()
+
+        # Обновления от Telegram получает супервизор, поэтому адрес Telegram Bot API - тот же, что у процессов бота
+        apihelper.API_URL = TELEGRAM_API_URL.rstrip('/') + '/bot{0}/{1}'
+        bot = TeleBot(BOT_TOKEN, threaded=False)
+        logger.info('Супервизор запущен, процессов бота: {}'.format(len(self.workers)))
+        try:
+            if BOT_MODE == 'webhook':
+                self._run_webhook(bot)
+            else:
+                # getUpdates не работает, пока в Telegram зарегистрирован webhook
+                bot.remove_webhook()
+                self._polling(bot)
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = SHUTDOWN_TIMEOUT) -> None:
+        """
+        Останавливает получение обновлений и перезапуск процессов, передаёт процессам
+        обновления из очередей и плавно останавливает все процессы бота одновременно.
+
+        Args:
+            timeout (float): Принимает общее время остановки до принудительного завершения процессов
+        """
+
+        self._stop_event.set()
+        deadline = time.monotonic() + timeout
+        drained = True
+        for worker in self.workers:
+            if not worker.drain(max(deadline - time.monotonic(), 0)):
+                drained = False
+                logger.warning('Процессу бота {} не переданы обновления из очереди: {}'.format(
+                    worker.index, worker.queue.qsize()))
+
+        if drained and self.offset is not None:
+            try:
+                # Обновления с update_id < offset считаются полученными
+                apihelper.get_updates(BOT_TOKEN, offset=self.offset, limit=1, timeout=0, long_polling_timeout=0)
+            except Exception as error:
+                logger.error('Ошибка подтверждения обновлений: {}'.format(error))
+
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.wait(max(deadline - time.monotonic(), 0) + STOP_GRACE)
+        logger.info('Супервизор остановлен')
+
+    def _monitor(self) -> None:
+        next_report = time.monotonic() + self.report_interval
+        while not self._stop_event.wait(1):
+            for worker in self.workers:
+                worker.check()
+            if time.monotonic() >= next_report:
+                self.report()
+                next_report += self.report_interval
+
+    def _polling(self, bot: TeleBot, timeout: int = 20, long_polling_timeout: int = 20) -> None:
+        while not self._stop_event.is_set():
+            try:
+                # Обновления запрашиваются в формате JSON: процессам бота они передаются без разбора
+                updates = apihelper.get_updates(bot.token, offset=self.offset, timeout=timeout,
+                                                long_polling_timeout=long_polling_timeout)
+            except Exception as error:
+                logger.error('Ошибка получения обновлений: {}'.format(error))
+                time.sleep(3)
+                continue
+
+            for update in updates:
+                self.dispatch(update)
+                self.offset = update['update_id'] + 1
+
+    def _run_webhook(self, bot: TeleBot) -> None:
+        server = WebhookServer(self, handler=FrontHandler)
+        if WEBHOOK_URL:
+            bot.set_webhook(url=with_secret(WEBHOOK_URL))
+
+        logger.info('Webhook-сервер супервизора запущен на {}:{}{}'.format(*server.server_address[:2],
+                                                                         with_secret(WEBHOOK_PATH, '<секрет>')))
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
@@ -0,0 +1,130 @@
+"""
+Тесты выбора размера фотографий SizeNegotiator с загрузчиком-заглушкой вместо HEAD-запросов.
+
+Запуск из папки проекта:  python -m pytest tests
+"""
+
+import threading
+
+from photo_sizes import MAX_PHOTO_BYTES, HeadResult, SizeNegotiator, base_url
+
+
+TEMPLATE = 'http://photos.test/hotels/1/1_{size}.jpg'
+
+OK = (200, 'image/jpeg', 1024)
+NOT_FOUND = (404, 'text/html', None)
+
+
+class FakeFetcher:
+    """
+    Загрузчик-заглушка: ответ на HEAD-запрос по размеру фотографии
+    (исключение в ответах выбрасывается, как ошибка запроса). Запоминает запрошенные адреса.
+    """
+
+    def __init__(self, responses: dict[str, HeadResult | Exception], default: HeadResult = NOT_FOUND) -> None:
+        self.responses = responses
+        self.default = default
+        self.urls: list[str] = list()
+        self._lock = threading.Lock()
+
+    def __call__(self, url: str) -> HeadResult:
+        with self._lock:
+            self.urls.append(url)
+        size = url.rsplit('_', 1)[1].split('.', 1)[0]
+        response = self.responses.get(size, self.default)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_negotiator(fetcher: FakeFetcher) -> SizeNegotiator:
+    # Один поток проверки: проверки выполняются по очереди, и settle дожидается всех начатых
+    return SizeNegotiator(fetcher=fetcher, workers=1, cache_size=16)
+
+
+def settle(negotiator: SizeNegotiator) -> None:
+    """
+    Ждёт завершения проверок меньших размеров, которые sizes уже не ждёт.
+    """
+
+    negotiator._executor.submit(lambda: None).result()
+
+
+def test_largest_acceptable_size() -> None:
+    negotiator = make_negotiator(FakeFetcher({'w': NOT_FOUND, 'z': OK, 'y': OK}))
+
+    assert negotiator.resolve([TEMPLATE]) == [TEMPLATE.replace('{size}', 'z')]
+
+
+def test_too_large_photo_is_skipped() -> None:
+    negotiator = make_negotiator(FakeFetcher({'w': (200, 'image/jpeg', MAX_PHOTO_BYTES + 1), 'z': OK}))
+
+    assert negotiator.sizes([TEMPLATE]) == {TEMPLATE: 'z'}
+
+
+def test_cache_hit_makes_no_requests() -> None:
+    fetcher = FakeFetcher({'w': OK})
+    negotiator = make_negotiator(fetcher)
+    negotiator.sizes([TEMPLATE])
+    settle(negotiator)
+    requests = len(fetcher.urls)
+
+    assert negotiator.sizes([TEMPLATE]) == {TEMPLATE: 'w'}
+    settle(negotiator)
+    assert len(fetcher.urls) == requests
+
+
+def test_forget_invalidates() -> None:
+    fetcher = FakeFetcher({'w': OK})
+    negotiator = make_negotiator(fetcher)
+    (url,) = negotiator.resolve([TEMPLATE])
+    settle(negotiator)
+
+    negotiator.forget([url])
+    fetcher.responses = {'w': NOT_FOUND, 'z': OK}
+
+    assert negotiator.resolve([TEMPLATE]) == [TEMPLATE.replace('{size}', 'z')]
+
+
+def test_forget_with_long_extension_and_query() -> None:
+    template = 'http://photos.test/hotels/1/1_{size}.webp?impolicy=fcrop&q=high'
+    fetcher = FakeFetcher({'w': OK})
+    negotiator = make_negotiator(fetcher)
+    (url,) = negotiator.resolve([template])
+
+    assert base_url(url) == template
+    negotiator.forget([url])
+    assert negotiator.cache.get(template) is None
+
+
+def test_transient_errors_are_not_cached() -> None:
+    """
+    Ошибка запроса не считается отказом Telegram: фотография не пропадает из следующих поисков.
+    """
+
+    fetcher = FakeFetcher({size: TimeoutError('timeout') for size in 'wzydn_'})
+    negotiator = make_negotiator(fetcher)
+
+    assert negotiator.resolve([TEMPLATE]) == []
+    settle(negotiator)
+    assert negotiator.cache.get(TEMPLATE) is None
+
+    fetcher.responses = {'w': OK}
+    assert negotiator.resolve([TEMPLATE]) == [TEMPLATE.replace('{size}', 'w')]
+
+
+def test_error_on_larger_size_does_not_pin_smaller() -> None:
+    """
+    Если проверка большего размера не удалась, меньший размер используется, но не запоминается.
+    """
+
+    fetcher = FakeFetcher({'w': ConnectionResetError('reset'), 'z': OK})
+    negotiator = make_negotiator(fetcher)
+
+    assert negotiator.sizes([TEMPLATE]) == {TEMPLATE: 'z'}
+    settle(negotiator)
+    assert negotiator.cache.get(TEMPLATE) is None
+
+    fetcher.responses = {'w': OK}
+    assert negotiator.sizes([TEMPLATE]) == {TEMPLATE: 'w'}
+    assert negotiator.cache.get(TEMPLATE) == 'w'
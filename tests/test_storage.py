@@ -0,0 +1,139 @@
+"""
+Тесты LRU-кэша пользователей CachedStorage поверх хранилища в памяти MemoryStorage.
+
+Запуск из папки проекта:  python -m pytest tests
+"""
+
+from typing import Any
+
+from storage import CachedStorage, MemoryStorage, DEFAULT_USER_SETTINGS
+
+
+JOIN_DATE = '2022-04-15 00:00:00'
+
+
+class CountingStorage(MemoryStorage):
+    """
+    MemoryStorage, которое считает чтения строк (обращения к "БД").
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.user_reads = 0
+        self.session_reads = 0
+
+    def get_user(self, user_id: int) -> dict[str, Any] | None:
+        self.user_reads += 1
+        return super().get_user(user_id)
+
+    def get_session(self, user_id: int) -> dict[str, Any] | None:
+        self.session_reads += 1
+        return super().get_session(user_id)
+
+
+def make_storage(maxsize: int = 16, users: int = 1) -> tuple[CachedStorage, CountingStorage]:
+    backend = CountingStorage()
+    storage = CachedStorage(backend, maxsize=maxsize)
+    for user_id in range(1, users + 1):
+        storage.add_user(user_id, 'Имя', 'Фамилия', JOIN_DATE)
+    return storage, backend
+
+
+def test_write_through_updates_backend_and_cache() -> None:
+    """
+    Запись сначала попадает в хранилище, а затем в строку в кэше: повторное чтение не обращается к хранилищу.
+    """
+
+    storage, backend = make_storage()
+    storage.get_user(1)
+
+    storage.update_user(1, language='en_US', lang_flag=True)
+    storage.update_current_session(1, hotels_count=5)
+    storage.update_current_session(1, needed_photo=True)
+
+    assert backend.get_user(1)['language'] == 'en_US'
+    assert backend.get_session(1)['hotels_count'] == 5
+    reads = backend.user_reads, backend.session_reads
+    assert storage.get_user(1)['language'] == 'en_US'
+    assert storage.get_session(1)['hotels_count'] == 5
+    assert storage.get_session(1)['needed_photo'] is True
+    assert (backend.user_reads, backend.session_reads) == reads
+
+
+def test_cached_rows_are_copies() -> None:
+    """
+    Изменение возвращённой строки не меняет строку в кэше.
+    """
+
+    storage, _ = make_storage()
+    storage.get_user(1)['language'] = 'en_US'
+
+    assert storage.get_user(1)['language'] == DEFAULT_USER_SETTINGS['language']
+
+
+def test_lru_eviction() -> None:
+    """
+    При переполнении вытесняется давно не использовавшийся пользователь, а недавний остаётся в кэше.
+    """
+
+    storage, backend = make_storage(maxsize=2, users=3)
+    storage.get_user(1)
+    storage.get_user(2)
+    storage.get_user(1)
+    storage.get_user(3)
+    assert len(storage) == 2
+
+    reads = backend.user_reads
+    storage.get_user(1)
+    assert backend.user_reads == reads
+
+    storage.get_user(2)
+    assert backend.user_reads == reads + 1
+
+
+def test_reset_user_then_get_user() -> None:
+    """
+    После /reset (reset_user) чтение из кэша возвращает настройки по умолчанию и пустую сессию поиска.
+    """
+
+    storage, backend = make_storage()
+    storage.update_user(1, language='en_US', lang_flag=True, currency='USD', cur_flag=True)
+    storage.update_current_session(1, city_name='Paris', hotels_count=5)
+    assert storage.get_user(1)['currency'] == 'USD'
+    old_session = storage.get_session(1)
+
+    storage.reset_user(1)
+
+    user = storage.get_user(1)
+    assert {field: user[field] for field in DEFAULT_USER_SETTINGS} == DEFAULT_USER_SETTINGS
+    session = storage.get_session(1)
+    assert session['id'] != old_session['id']
+    assert session['city_name'] is None and session['hotels_count'] is None
+    assert storage.get_user(1) == backend.get_user(1)
+    assert storage.get_session(1) == backend.get_session(1)
+
+
+def test_stale_read_is_not_cached() -> None:
+    """
+    Строка, прочитанная из хранилища во время чужой записи, возвращается, но не попадает в кэш.
+    """
+
+    class RacingStorage(CountingStorage):
+        storage: CachedStorage | None = None
+
+        def get_user(self, user_id: int) -> dict[str, Any] | None:
+            row = super().get_user(user_id)
+            if self.storage is not None:
+                # Другой поток записывает строку, пока эта ещё не положена в кэш
+                storage, self.storage = self.storage, None
+                storage.update_user(user_id, currency='USD')
+            return row
+
+    backend = RacingStorage()
+    storage = CachedStorage(backend, maxsize=16)
+    storage.add_user(1, 'Имя', 'Фамилия', JOIN_DATE)
+    backend.storage = storage
+
+    assert storage.get_user(1)['currency'] == DEFAULT_USER_SETTINGS['currency']
+    assert storage.get_user(1)['currency'] == 'USD'
+    assert backend.user_reads == 2
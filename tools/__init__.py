@@ -0,0 +1,5 @@
+__all__ = [
+    'hotels_stub',
+    'load_test',
+    'post_updates'
+]
@@ -0,0 +1,522 @@
+"""
+Локальный тестовый сервер Hotels API (вместо hotels4.p.rapidapi.com).
+Отвечает на запросы locations/v2/search, properties/list и properties/get-hotel-photos
+правдоподобными данными в формате Hotels API и отдаёт сами фотографии отелей
+(HEAD и GET), поэтому бот проходит весь сценарий поиска без подключения к интернету.
+Данные зависят только от параметров запроса и --seed и одинаковы при каждом запуске.
+Задержка ответов (распределение), доля ошибок и размер ответов настраиваются, что
+позволяет воспроизводимо измерять производительность бота. По [Ctrl] + C сервер
+выводит статистику запросов.
+
+Запуск из папки проекта:  python -m tools.hotels_stub [--port 8090] [--latency lognormal:150,0.5]
+                           [--latency photos=uniform:50,300] [--error-rate 0.02] [--padding 2000]
+В .env бота:  HOTELS_API_URL = http://127.0.0.1:8090
+"""
+
+import argparse
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+import zlib
+
+
+# Задержка ответа: функция rng -> задержка в секундах
+Latency = Callable[[random.Random], float]
+
+# Распределения задержки ответа (параметры - в миллисекундах, кроме sigma логнормального)
+LATENCY_DISTRIBUTIONS = {'const': lambda rng, value: value,
+                         'uniform': lambda rng, low, high: rng.uniform(low, high),
+                         'normal': lambda rng, mean, stddev: max(rng.gauss(mean, stddev), 0),
+                         'exp': lambda rng, mean: rng.expovariate(1 / mean),
+                         'lognormal': lambda rng, median, sigma: rng.lognormvariate(math.log(median), sigma)
+                         }
+
+# Виды запросов, для которых задаются задержка и ошибки
+ENDPOINTS = {'/locations/v2/search': 'locations',
+             '/properties/list': 'properties',
+             '/properties/get-hotel-photos': 'photos'
+             }
+IMAGES = 'images'
+
+# Размер фотографии каждого варианта размера (байт): самый большой вариант больше
+# лимита Telegram (5 Мб) и отклоняется при выборе размера (см. photo_sizes.py)
+IMAGE_BYTES = {'w': 6_000_000, 'z': 1_200_000, 'y': 400_000, 'd': 150_000, 'n': 60_000, '_': 20_000}
+
+# Известные города: название, регион, страна, широта, долгота
+CITIES = {'москва': ('Москва', 'Московская область', 'Россия', 55.7558, 37.6173),
+          'санкт-петербург': ('Санкт-Петербург', 'Ленинградская область', 'Россия', 59.9343, 30.3351),
+          'париж': ('Париж', 'Иль-де-Франс', 'Франция', 48.8566, 2.3522),
+          'лондон': ('Лондон', 'Англия', 'Великобритания', 51.5072, -0.1276),
+          'рим': ('Рим', 'Лацио', 'Италия', 41.9028, 12.4964),
+          'берлин': ('Берлин', 'Берлин', 'Германия', 52.5200, 13.4050),
+          'барселона': ('Барселона', 'Каталония', 'Испания', 41.3874, 2.1686),
+          'стамбул': ('Стамбул', 'Стамбул', 'Турция', 41.0082, 28.9784),
+          'new york': ('New York', 'New York', 'USA', 40.7128, -74.0060),
+          'paris': ('Paris', 'Ile-de-France', 'France', 48.8566, 2.3522),
+          'london': ('London', 'England', 'United Kingdom', 51.5072, -0.1276)
+          }
+
+# Части названий отелей и улиц
+HOTEL_WORDS = ('Гранд', 'Парк', 'Сити', 'Ройал', 'Плаза', 'Центральный', 'Бутик', 'Резиденс', 'Палас', 'Старый город',
+               'Вокзальный', 'Ривьера', 'Империал', 'Классик', 'Модерн', 'Панорама')
+HOTEL_KINDS = ('Отель', 'Гостиница', 'Апарт-отель', 'Хостел', 'Гостевой дом')
+STREETS = ('Центральная', 'Садовая', 'Речная', 'Вокзальная', 'Парковая', 'Лесная', 'Морская', 'Тверская', 'Новая')
+LANDMARKS = ('Аэропорт', 'Вокзал', 'Музей', 'Набережная', 'Собор', 'Парк')
+
+
+def parse_latency(spec: str) -> Latency:
+    """
+    Функция, которая разбирает описание распределения задержки ответа:
+    "const:50", "uniform:20,200", "normal:100,30", "exp:80", "lognormal:120,0.5".
+
+    Args:
+        spec (str): Принимает описание распределения (параметры - в миллисекундах)
+
+    Returns (Latency): функция rng -> задержка в секундах
+    """
+
+    name, _, params = spec.partition(':')
+    distribution = LATENCY_DISTRIBUTIONS.get(name)
+    if distribution is None:
+        raise argparse.ArgumentTypeError('Неизвестное распределение задержки "{}", доступны: {}'.format(
+            name, ', '.join(LATENCY_DISTRIBUTIONS)))
+
+    try:
+        values = [float(value) for value in params.split(',')] if params else list()
+        distribution(random.Random(0), *values)
+    except (TypeError, ValueError, ZeroDivisionError):
+        raise argparse.ArgumentTypeError('Неверные параметры распределения задержки "{}"'.format(spec))
+
+    return lambda rng: distribution(rng, *values) / 1000
+
+
+def parse_endpoint_latency(spec: str) -> tuple[str | None, Latency]:
+    """
+    Функция, которая разбирает аргумент --latency: "[вид запроса=]распределение"
+    (без вида запроса распределение задаётся для всех запросов).
+    """
+
+    endpoint, _, distribution = spec.rpartition('=')
+    if endpoint and endpoint not in (*ENDPOINTS.values(), IMAGES):
+        raise argparse.ArgumentTypeError('Неизвестный вид запроса "{}", доступны: {}'.format(
+            endpoint, ', '.join((*ENDPOINTS.values(), IMAGES))))
+
+    return endpoint or None, parse_latency(distribution)
+
+
+def fixture_rng(seed: int, *key: Any) -> random.Random:
+    """
+    Функция, которая возвращает генератор случайных чисел для данных ответа,
+    зависящий только от seed и ключа (города, отеля), но не от порядка запросов.
+    """
+
+    return random.Random(':'.join(map(str, (seed, *key))))
+
+
+def destination_id(name: str) -> str:
+    """
+    Функция, которая возвращает постоянный id города (destinationId) по его названию.
+    """
+
+    return str(zlib.crc32(name.lower().encode('utf-8')) % 10_000_000 + 1_000_000)
+
+
+def filler(rng: random.Random, size: int) -> str:
+    """
+    Функция, которая возвращает текст заданного размера (описание отеля,
+    которым ответ дополняется до размера реальных ответов Hotels API).
+    """
+
+    words = list()
+    length = 0
+    while length < size:
+        words.append(rng.choice(HOTEL_WORDS).lower())
+        length += len(words[-1]) + 1
+    return ' '.join(words)[:size]
+
+
+class Fixtures:
+    """
+    Данные ответов тестового сервера: города, отели и фотографии.
+
+    Args:
+        seed (int): Принимает начальное значение генератора данных
+        hotels (int): Принимает кол-во отелей в каждом городе
+        photos (int): Принимает кол-во фотографий каждого отеля
+        padding (int): Принимает размер описания каждого отеля и фотографии (символов)
+    """
+
+    def __init__(self, seed: int = 0, hotels: int = 60, photos: int = 20, padding: int = 0) -> None:
+        self.seed = seed
+        self.hotels = hotels
+        self.photos = photos
+        self.padding = padding
+
+    def locations(self, query: str) -> dict[str, Any]:
+        """
+        Возвращает ответ locations/v2/search: известный город или город с названием
+        из запроса и пригород (для запроса без букв - пустой список городов).
+        """
+
+        query = ' '.join(query.lower().split())
+        if not re.search(r'[^\W\d_]', query):
+            entities = list()
+        else:
+            name, region, country, lat, lon = CITIES.get(query) or (query.title(), 'Регион', 'Страна', 0, 0)
+            entities = [{'geoId': destination_id(name), 'destinationId': destination_id(name),
+                         'landmarkCityDestinationId': None, 'type': 'CITY', 'redirectPage': 'DEFAULT_PAGE', 'latitude': lat, 'longitude': lon,
+                         'searchDetail': None, 'name': name,
+                         'caption': "<span class='highlighted'>{}</span>, {}, {}".format(name, region, country)},
+                        {'geoId': destination_id(name + ' пригород'),
+                         'destinationId': destination_id(name + ' пригород'), 'landmarkCityDestinationId': None,
+                         'type': 'CITY', 'redirectPage': 'DEFAULT_PAGE', 'latitude': lat + 0.1,
+                         'longitude': lon + 0.1, 'searchDetail': None, 'name': name + ' (пригород)',
+                         'caption': "<span class='highlighted'>{}</span> (пригород), {}, {}".format(name, region,
+                                                                                                 country)}]
+
+        return {'term': query, 'moresuggestions': len(entities), 'autoSuggestInstance': None,
+                'trackingID': 'stub', 'misspellingfallback': False,
+                'suggestions': [{'group': 'CITY_GROUP', 'entities': entities},
+                                {'group': 'HOTEL_GROUP', 'entities': list()},
+                                {'group': 'LANDMARK_GROUP', 'entities': list()},
+                                {'group': 'TRANSPORT_GROUP', 'entities': list()}],
+                'geocodingResults': None}
+
+    def city_hotels(self, city_id: str, currency: str, locale: str) -> list[dict[str, Any]]:
+        """
+        Возвращает все отели города (в порядке удалённости от центра).
+        """
+
+        rng = fixture_rng(self.seed, 'city', city_id)
+        unit = 'км' if locale.startswith('ru') else 'km'
+        rate = {'RUB': 75, 'EUR': 0.95, 'USD': 1}.get(currency, 1)
+        hotels = list()
+        for index in range(self.hotels):
+            hotel_id = int(city_id) * 1000 + index
+            distance = 0.2 + index * 0.35 + rng.random() * 0.3
+            price = int(rng.lognormvariate(math.log(90), 0.5) * rate)
+            hotel = {
+                'id': hotel_id,
+                'name': '{} {} {}'.format(rng.choice(HOTEL_KINDS), rng.choice(HOTEL_WORDS), index + 1),
+                'starRating': rng.choice((1, 2, 2.5, 3, 3.5, 4, 4.5, 5)),
+                'urls': dict(),
+                'address': {'streetAddress': 'ул. {}, {}'.format(rng.choice(STREETS), rng.randint(1, 120)),
+                            'extendedAddress': '', 'locality': 'Город {}'.format(city_id),
+                            'postalCode': str(rng.randint(100000, 999999)), 'region': 'Регион',
+                            'countryName': 'Страна', 'countryCode': 'XX', 'obfuscate': False},
+                'guestReviews': {'unformattedRating': round(rng.uniform(6, 9.8), 1), 'rating': '',
+                                 'total': rng.randint(5, 3000), 'scale': 10},
+                'landmarks': [{'label': 'Центр города', 'distance': '{:.1f} {}'.format(distance, unit).replace(
+                                  '.', ',' if unit == 'км' else '.')},
+                              {'label': rng.choice(LANDMARKS), 'distance': '{:.1f} {}'.format(
+                                  rng.uniform(0.5, 25), unit).replace('.', ',' if unit == 'км' else '.')}],
+                'ratePlan': {'price': {'current': '{:,} {}'.format(price, currency), 'exactCurrent': float(price)},
+                             'features': {'freeCancellation': rng.random() < 0.5, 'paymentPreference': False,
+                                          'noCCRequired': False}},
+                'neighbourhood': 'Район {}'.format(index % 7 + 1),
+                'deals': dict(),
+                'messaging': dict(),
+                'badging': dict(),
+                'pimmsAttributes': 'DoubleStamps',
+                'coordinate': {'lat': round(rng.uniform(-0.05, 0.05), 6), 'lon': round(rng.uniform(-0.05, 0.05), 6)},
+                'providerType': 'LOCAL',
+                'supplierHotelId': hotel_id + 7,
+                'isAlternative': False,
+                'optimizedThumbUrls': {'srpDesktop': 'https://exp.cdn-hotels.com/hotels/{}/t.jpg'.format(hotel_id)}
+            }
+            guest_rating = hotel['guestReviews']['unformattedRating']
+            hotel['guestReviews']['rating'] = str(guest_rating).replace('.', ',')
+            # Отели без цены (Hotels API иногда не возвращает предложение)
+            if rng.random() < 0.05:
+                del hotel['ratePlan']
+            if self.padding:
+                hotel['description'] = filler(rng, self.padding)
+            hotels.append(hotel)
+        return hotels
+
+    def properties(self, params: dict[str, str]) -> dict[str, Any]:
+        """
+        Возвращает ответ properties/list: страницу отелей города с сортировкой
+        sortOrder (PRICE, PRICE_HIGHEST_FIRST, DISTANCE_FROM_LANDMARK) и фильтром по цене.
+        """
+
+        currency = params.get('currency', 'USD')
+        hotels = self.city_hotels(params.get('destinationId', '0'), currency, params.get('locale', 'en_US'))
+
+        def price(hotel: dict) -> float:
+            return hotel['ratePlan']['price']['exactCurrent'] if 'ratePlan' in hotel else math.inf
+
+        if 'priceMin' in params or 'priceMax' in params:
+            low, high = float(params.get('priceMin', 0)), float(params.get('priceMax', math.inf))
+            hotels = [hotel for hotel in hotels if low <= price(hotel) <= high]
+
+        sort_order = params.get('sortOrder', 'PRICE')
+        if sort_order == 'PRICE':
+            hotels.sort(key=price)
+        elif sort_order == 'PRICE_HIGHEST_FIRST':
+            hotels.sort(key=lambda hotel: -price(hotel) if price(hotel) != math.inf else math.inf)
+
+        page_number, page_size = int(params.get('pageNumber', 1)), int(params.get('pageSize', 25))
+        results = hotels[(page_number - 1) * page_size:page_number * page_size]
+        has_next = page_number * page_size < len(hotels)
+
+        return {'result': 'OK', 'data': {'body': {
+            'header': 'Город {}'.format(params.get('destinationId')),
+            'query': {'destination': {'id': params.get('destinationId'), 'value': 'Город'}},
+            'searchResults': {'totalCount': len(hotels), 'results': results,
+                              'pagination': {'currentPage': page_number, 'pageGroup': 'EXPEDIA_IN_POLYGON',
+                                             'nextPageStartIndex': page_number * page_size if has_next else None,
+                                             'nextPageNumber': page_number + 1 if has_next else None,
+                                             'nextPageGroup': 'EXPEDIA_IN_POLYGON' if has_next else None}},
+            'sortResults': {'options': list(), 'distanceOptionLandmarkId': 0},
+            'filters': {'applied': False},
+            'pointOfSale': {'currency': {'code': currency, 'symbol': currency}}}},
+            'common': {'pointOfSale': {'numberSeparators': ',.'}}}
+
+    def hotel_photos(self, hotel_id: str, base_url: str) -> dict[str, Any]:
+        """
+        Возвращает ответ properties/get-hotel-photos: адреса фотографий отеля
+        на этом же сервере с шаблоном размера {size}.
+        """
+
+        rng = fixture_rng(self.seed, 'photos', hotel_id)
+        images = list()
+        for index in range(self.photos):
+            image = {'baseUrl': '{}/images/{}/{}_{{size}}.jpg'.format(base_url, hotel_id, index),
+                     'imageId': rng.randint(10 ** 8, 10 ** 9), 'mediaGUID': None,
+                     'sizes': [{'type': position, 'suffix': suffix} for position, suffix in enumerate(IMAGE_BYTES)],
+                     'trackingDetails': None}
+            if self.padding:
+                image['caption'] = filler(rng, self.padding)
+            images.append(image)
+
+        return {'hotelId': int(hotel_id) if hotel_id.isdigit() else hotel_id, 'hotelImages': images,
+                'roomImages': list(), 'featuredImageTrackingDetails': None, 'propertyImageTrackingDetails': None}
+
+
+class Faults:
+    """
+    Внедрение сбоев: доли ответов с ошибкой (случайный код из codes), с телом без
+    нужных ключей и "зависших" ответов (ответ через hang секунд - дольше таймаута клиента).
+    """
+
+    def __init__(self, error_rate: float = 0.0, codes: tuple[int, ...] = (429, 500, 503), malformed_rate: float = 0.0,
+                 hang_rate: float = 0.0, hang: float = 15.0) -> None:
+        self.error_rate = error_rate
+        self.codes = codes
+        self.malformed_rate = malformed_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+
+    def pick(self, rng: random.Random) -> str | None:
+        """
+        Возвращает сбой для очередного ответа: 'error', 'malformed', 'hang' или None.
+        """
+
+        value = rng.random()
+        for fault, rate in (('error', self.error_rate), ('malformed', self.malformed_rate), ('hang', self.hang_rate)):
+            if value < rate:
+                return fault
+            value -= rate
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов тестового сервера Hotels API.
+    """
+
+    server: 'HotelsStubServer'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        self.respond(head=False)
+
+    def do_HEAD(self) -> None:
+        self.respond(head=True)
+
+    def respond(self, head: bool) -> None:
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path) or (IMAGES if url.path.startswith('/images/') else None)
+        if endpoint is None:
+            self.send_body(404, {'message': 'Endpoint {} does not exist'.format(url.path)}, head)
+            return
+
+        server = self.server
+        rng = server.request_rng()
+        time.sleep(server.latency(endpoint)(rng))
+
+        fault = server.faults.pick(rng)
+        server.count(endpoint, fault)
+        if fault == 'error':
+            code = rng.choice(server.faults.codes)
+            self.send_body(code, {'message': 'Too many requests' if code == 429 else 'Internal server error'}, head)
+            return
+        if fault == 'hang':
+            time.sleep(server.faults.hang)
+        if fault == 'malformed':
+            self.send_body(200, {'result': 'OK', 'data': dict()}, head)
+            return
+
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        if endpoint == 'locations':
+            self.send_body(200, server.fixtures.locations(params.get('query', '')), head)
+        elif endpoint == 'properties':
+            self.send_body(200, server.fixtures.properties(params), head)
+        elif endpoint == 'photos':
+            base_url = 'http://{}'.format(self.headers.get('Host') or '{}:{}'.format(*server.server_address[:2]))
+            self.send_body(200, server.fixtures.hotel_photos(params.get('id', '0'), base_url), head)
+        else:
+            self.send_image(url.path, head)
+
+    def send_body(self, status: int, payload: dict[str, Any], head: bool) -> None:
+        # Ответ в компактном JSON, как у Hotels API (разбор ответов в commands/ на это рассчитан)
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.server.count_bytes(len(body))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def send_image(self, path: str, head: bool) -> None:
+        match = re.fullmatch(r'/images/\w+/\d+_(.)\.jpg', path)
+        if match is None or match.group(1) not in IMAGE_BYTES:
+            self.send_body(404, {'message': 'Image not found'}, head)
+            return
+
+        length = IMAGE_BYTES[match.group(1)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+        if not head:
+            self.wfile.write(b'\xff\xd8\xff\xe0' + bytes(length - 6) + b'\xff\xd9')
+
+    def log_message(self, format: str, *args) -> None:
+        # Каждый запрос не логируется, чтобы не засорять вывод
+        pass
+
+
+class HotelsStubServer(ThreadingHTTPServer):
+    """
+    Многопоточный тестовый сервер Hotels API со статистикой запросов.
+
+    Args:
+        address (tuple): Принимает адрес и порт сервера
+        fixtures (Fixtures): Принимает данные ответов
+        latency (dict): Принимает задержку ответов {вид запроса или None (все запросы): Latency}
+        faults (Faults): Принимает настройки внедрения сбоев
+        seed (int): Принимает начальное значение генератора задержек и сбоев
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], fixtures: Fixtures | None = None,
+                 latency: dict[str | None, Latency] | None = None, faults: Faults | None = None,
+                 seed: int = 0) -> None:
+        super().__init__(address, StubHandler)
+        self.fixtures = fixtures or Fixtures(seed=seed)
+        self.latencies = latency or dict()
+        self.faults = faults or Faults()
+        self.seed = seed
+        self.requests = Counter()
+        self.injected = Counter()
+        self.bytes_sent = 0
+        self._request_ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def request_rng(self) -> random.Random:
+        """
+        Возвращает генератор задержки и сбоев очередного запроса: при одном и том же
+        seed N-й запрос получает одну и ту же задержку и один и тот же сбой.
+        """
+
+        return random.Random('{}:{}'.format(self.seed, next(self._request_ids)))
+
+    def latency(self, endpoint: str) -> Latency:
+        return self.latencies.get(endpoint) or self.latencies.get(None) or (lambda rng: 0.0)
+
+    def count(self, endpoint: str, fault: str | None) -> None:
+        with self._lock:
+            self.requests[endpoint] += 1
+            if fault is not None:
+                self.injected[fault] += 1
+
+    def count_bytes(self, size: int) -> None:
+        with self._lock:
+            self.bytes_sent += size
+
+    def metrics(self) -> dict[str, Any]:
+        """
+        Возвращает статистику: кол-во запросов каждого вида, кол-во внедрённых сбоев
+        каждого вида и объём отправленных JSON-ответов (байт).
+        """
+
+        with self._lock:
+            return {'requests': dict(self.requests), 'faults': dict(self.injected), 'json_bytes': self.bytes_sent}
+
+    def start(self) -> threading.Thread:
+        """
+        Запускает сервер в фоновом потоке (например, внутри бенчмарка) и возвращает поток.
+        """
+
+        thread = threading.Thread(target=self.serve_forever, name='HotelsStub', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный тестовый сервер Hotels API')
+    parser.add_argument('--listen', default='127.0.0.1', help='Адрес сервера')
+    parser.add_argument('--port', type=int, default=8090, help='Порт сервера')
+    parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора данных, задержек и сбоев')
+    parser.add_argument('--latency', type=parse_endpoint_latency, action='append', default=list(),
+                        metavar='[ВИД=]РАСПРЕДЕЛЕНИЕ',
+                        help='Задержка ответа, мс: const:50, uniform:20,200, normal:100,30, exp:80, lognormal:120,0.5; '
+                             'вид запроса: {} (по умолчанию - все)'.format(', '.join((*ENDPOINTS.values(), IMAGES))))
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Доля ответов с ошибкой')
+    parser.add_argument('--error-codes', default='429,500,503', help='HTTP-коды ошибок (через запятую)')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Доля ответов 200 без нужных ключей')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='Доля ответов с задержкой --hang')
+    parser.add_argument('--hang', type=float, default=15.0, help='Задержка "зависшего" ответа, с')
+    parser.add_argument('--hotels', type=int, default=60, help='Кол-во отелей в каждом городе')
+    parser.add_argument('--photos', type=int, default=20, help='Кол-во фотографий каждого отеля')
+    parser.add_argument('--padding', type=int, default=0,
+                        help='Размер описания каждого отеля и фотографии, символов (увеличивает размер ответов)')
+    args = parser.parse_args()
+
+    server = HotelsStubServer(
+        (args.listen, args.port),
+        fixtures=Fixtures(seed=args.seed, hotels=args.hotels, photos=args.photos, padding=args.padding),
+        latency=dict(args.latency),
+        faults=Faults(error_rate=args.error_rate, codes=tuple(int(code) for code in args.error_codes.split(',')),
+                      malformed_rate=args.malformed_rate, hang_rate=args.hang_rate, hang=args.hang),
+        seed=args.seed)
+
+    print('Тестовый сервер Hotels API: {}  (в .env бота: HOTELS_API_URL = {})'.format(server.url, server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.metrics(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
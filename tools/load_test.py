@@ -0,0 +1,621 @@
+"""
+Нагрузочный тест бота: виртуальные пользователи одновременно проходят диалоги
+/lowprice, /highprice, /bestdeal и /history от начала до конца.
+Бот (besthoteloffers_bot.py) запускается в дочернем процессе и вместо Telegram
+работает с локальным тестовым сервером Telegram Bot API: сервер выдаёт боту
+обновления пользователей (getUpdates или POST-запросы на webhook бота) и записывает
+все вызовы бота (sendMessage, editMessageText, sendMediaGroup и т.д.). Каждый
+пользователь ждёт ответа бота на каждый шаг диалога и нажимает кнопки из его
+клавиатур, как настоящий пользователь. Hotels API заменяет tools/hotels_stub.py.
+Выводятся пропускная способность и время ответа бота (p50, p95, p99) по шагам диалога.
+
+Запуск из папки проекта:  python -m tools.load_test [-u 50] [-r 2] [--scenarios lowprice,bestdeal,history]
+                           [--mode webhook] [--workers 4] [--think exp:500] [--hotels-latency lognormal:150,0.5]
+                           [--no-send-limits]
+Лимиты очереди отправки (SEND_GLOBAL_RATE, SEND_CHAT_RATE) действуют и в тесте, как при работе с Telegram:
+при --no-send-limits время шагов показывает только обработку обновлений ботом.
+"""
+
+import argparse
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+import zlib
+
+from commands.calendar import MyStyleCalendar
+from config import WEBHOOK_PATH, WEBHOOK_SECRET
+from router import SEPARATOR, callback_data
+from tools.hotels_stub import CITIES, Fixtures, HotelsStubServer, Latency, parse_latency
+from tools.post_updates import post
+from webhook import with_secret
+
+
+# Вызов бота: {'method': метод Bot API, 'params': параметры, 'message_id': id сообщения, 'time': время вызова}
+BotCall = dict[str, Any]
+
+# Тексты бота, которые означают, что диалог прерван (ошибка ввода или неожиданное состояние диалога)
+FAILURE_MARKERS = ('попробуешь заново', 'попробуешь ещё раз', 'Я тебя не понял')
+
+# Текст бота, когда поиск не нашёл отелей (диалог завершён, но без результата)
+NOTHING_FOUND_MARKER = 'ничего подходящего не нашёл'
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'BestHotelOffers', 'username': 'best_hotel_offers_bot'}
+
+
+def percentile(values: list[float], share: float) -> float:
+    """
+    Функция, которая возвращает перцентиль (share - от 0 до 100) списка значений
+    методом ближайшего ранга.
+    """
+
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(math.ceil(share / 100 * len(ordered)) - 1, 0))]
+
+
+def free_port() -> int:
+    """
+    Функция, которая возвращает свободный локальный порт.
+    """
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def port_open(port: int) -> bool:
+    """
+    Функция, которая возвращает True, если локальный порт принимает соединения.
+    """
+
+    try:
+        socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+    except OSError:
+        return False
+    return True
+
+
+def buttons(call: BotCall) -> list[str]:
+    """
+    Функция, которая возвращает callback_data всех кнопок клавиатуры сообщения бота.
+    """
+
+    markup = call['params'].get('reply_markup')
+    if not markup:
+        return list()
+    markup = json.loads(markup) if isinstance(markup, str) else markup
+    return [button['callback_data'] for row in markup.get('inline_keyboard', list()) for button in row
+            if 'callback_data' in button]
+
+
+def has_keyboard(prefix: str) -> Callable[[BotCall], bool]:
+    """
+    Функция, которая возвращает условие "сообщение бота с кнопками маршрута prefix" (router.py).
+    """
+
+    return lambda call: any(data.partition(SEPARATOR)[0] == prefix for data in buttons(call))
+
+
+def has_text(text: str) -> Callable[[BotCall], bool]:
+    """
+    Функция, которая возвращает условие "сообщение бота содержит текст".
+    """
+
+    return lambda call: text in call['params'].get('text', '')
+
+
+def search_finished(call: BotCall) -> bool:
+    # Поиск завершён: отправлено завершающее сообщение (MarkdownV2) или сообщение "ничего не нашёл"
+    return (call['method'] == 'sendMessage' and call['params'].get('parse_mode') == 'MarkdownV2'
+            or NOTHING_FOUND_MARKER in call['params'].get('text', ''))
+
+
+class StepFailed(Exception):
+    """
+    Исключение: бот не ответил на шаг диалога или прервал диалог.
+    """
+
+
+class TelegramStub(ThreadingHTTPServer):
+    """
+    Локальный тестовый сервер Telegram Bot API: очередь обновлений для getUpdates
+    и журнал вызовов бота по чатам.
+
+    Args:
+        address (tuple): Принимает адрес и порт сервера
+        latency (Latency): Принимает задержку ответа на вызовы бота (кроме getUpdates)
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: tuple[str, int], latency: Latency | None = None) -> None:
+        super().__init__(address, TelegramStubHandler)
+        self.latency = latency or (lambda rng: 0.0)
+        self.rng = random.Random(0)
+        self.updates: list[dict[str, Any]] = list()
+        self.update_ids = itertools.count(1)
+        self.calls: dict[int, list[BotCall]] = defaultdict(list)
+        self.message_ids: dict[int, itertools.count] = defaultdict(lambda: itertools.count(1))
+        self.methods = Counter()
+        self.polled = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name='TelegramStub', daemon=True)
+        thread.start()
+        return thread
+
+    def new_update(self, **content: Any) -> dict[str, Any]:
+        """
+        Возвращает новое обновление с очередным update_id.
+        """
+
+        return {'update_id': next(self.update_ids), **content}
+
+    def push(self, update: dict[str, Any]) -> None:
+        """
+        Добавляет обновление в очередь getUpdates.
+        """
+
+        with self._changed:
+            self.updates.append(update)
+            self._changed.notify_all()
+
+    def get_updates(self, offset: int, limit: int, timeout: float) -> list[dict[str, Any]]:
+        """
+        Возвращает обновления с update_id >= offset (как getUpdates: обновления меньше offset
+        подтверждены и удаляются), ожидая их не дольше timeout секунд.
+        """
+
+        self.polled.set()
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+            while not self.updates and self._changed.wait(max(deadline - time.monotonic(), 0)):
+                pass
+            return sorted(self.updates, key=lambda update: update['update_id'])[:limit]
+
+    def record(self, method: str, params: dict[str, Any]) -> Any:
+        """
+        Записывает вызов бота в журнал его чата и возвращает ответ Bot API.
+        """
+
+        chat_id = int(params.get('chat_id', 0) or 0)
+        now = time.perf_counter()
+        with self._changed:
+            self.methods[method] += 1
+            if method in ('sendMessage', 'sendMediaGroup'):
+                messages = [self.message(chat_id, next(self.message_ids[chat_id]), params, media)
+                            for media in (json.loads(params['media']) if method == 'sendMediaGroup' else [None])]
+                message_id = messages[0]['message_id']
+                result = messages if method == 'sendMediaGroup' else messages[0]
+            elif method in ('editMessageText', 'editMessageReplyMarkup'):
+                message_id = int(params.get('message_id', 0))
+                result = self.message(chat_id, message_id, params)
+            elif method == 'getMe':
+                message_id, result = None, BOT_USER
+            else:
+                message_id, result = None, True
+
+            if chat_id:
+                self.calls[chat_id].append({'method': method, 'params': params, 'message_id': message_id,
+                                            'time': now})
+                self._changed.notify_all()
+        return result
+
+    @staticmethod
+    def message(chat_id: int, message_id: int, params: dict[str, Any], media: dict | None = None) -> dict[str, Any]:
+        message = {'message_id': message_id, 'date': int(time.time()), 'from': BOT_USER,
+                   'chat': {'id': chat_id, 'type': 'private'}}
+        if media is None:
+            message['text'] = params.get('text', '')
+        else:
+            # file_id зависит от адреса фотографии, как у Telegram для одного и того же файла
+            file_id = 'stub{}'.format(zlib.crc32(str(media.get('media')).encode('utf-8')))
+            message['photo'] = [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1000, 'height': 750}]
+        return message
+
+    def wait_call(self, chat_id: int, cursor: int, condition: Callable[[BotCall], bool],
+                  timeout: float) -> tuple[BotCall, int]:
+        """
+        Ждёт вызова бота в чате, который удовлетворяет условию (начиная с позиции cursor журнала чата).
+        Если раньше бот прервал диалог (см. FAILURE_MARKERS), вызывается StepFailed.
+
+        Returns (tuple): вызов бота и позиция журнала после него
+        """
+
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                calls = self.calls[chat_id]
+                for index in range(cursor, len(calls)):
+                    if condition(calls[index]):
+                        return calls[index], index + 1
+                    text = calls[index]['params'].get('text', '')
+                    if any(marker in text for marker in FAILURE_MARKERS):
+                        raise StepFailed('Бот прервал диалог: {}'.format(' '.join(text.split())[:80]))
+                cursor = len(calls)
+                if not self._changed.wait(max(deadline - time.monotonic(), 0)) and time.monotonic() >= deadline:
+                    raise StepFailed('Бот не ответил за {:.0f} с'.format(timeout))
+
+    def cursor(self, chat_id: int) -> int:
+        with self._changed:
+            return len(self.calls[chat_id])
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик запросов к тестовому серверу Telegram Bot API: /bot<токен>/<метод>.
+    """
+
+    server: TelegramStub
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self) -> None:
+        self.respond()
+
+    def do_POST(self) -> None:
+        self.respond()
+
+    def respond(self) -> None:
+        url = urlsplit(self.path)
+        method = url.path.rstrip('/').rpartition('/')[2]
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        # telebot передаёт параметры в строке запроса, но принимается и тело запроса (форма или JSON)
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        content_type = self.headers.get('Content-Type', '')
+        if body and content_type.startswith('application/json'):
+            params.update(json.loads(body))
+        elif body and content_type.startswith('application/x-www-form-urlencoded'):
+            params.update({name: values[-1] for name, values in parse_qs(body.decode('utf-8')).items()})
+
+        if method == 'getUpdates':
+            result = self.server.get_updates(offset=int(params.get('offset', 0)), limit=int(params.get('limit', 100)),
+                                             timeout=float(params.get('timeout', 0)))
+        else:
+            time.sleep(self.server.latency(self.server.rng))
+            result = self.server.record(method, params)
+
+        payload = json.dumps({'ok': True, 'result': result}, ensure_ascii=False).encode('utf-8')
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except ConnectionError:
+            # Бот остановлен, не дождавшись ответа на getUpdates
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:
+        # Каждый запрос не логируется, чтобы не засорять вывод
+        pass
+
+
+class Results:
+    """
+    Время ответа бота по шагам диалога и счётчики диалогов (общие для всех пользователей).
+    """
+
+    def __init__(self) -> None:
+        self.steps: dict[str, list[float]] = defaultdict(list)
+        self.errors = Counter()
+        self.dialogs = Counter()
+        self.failures = Counter()
+        # Причины прерванных диалогов
+        self.reasons = Counter()
+        # Кол-во доставленных обновлений (updates) и поисков без результата (empty)
+        self.totals = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, step: str, latency: float | None) -> None:
+        with self._lock:
+            if latency is None:
+                self.errors[step] += 1
+                self.steps.setdefault(step, list())
+            else:
+                self.steps[step].append(latency)
+
+    def count(self, counter: str, name: str) -> None:
+        with self._lock:
+            getattr(self, counter)[name] += 1
+
+
+class VirtualUser:
+    """
+    Виртуальный пользователь: отправляет боту сообщения и нажатия на кнопки
+    и ждёт ответа бота на каждый шаг диалога.
+
+    Args:
+        index (int): Принимает номер пользователя (id чата - 1000000 + номер)
+        stub (TelegramStub): Принимает тестовый сервер Telegram Bot API
+        deliver (Callable): Принимает функцию доставки обновления боту
+        results (Results): Принимает общие результаты теста
+        args (argparse.Namespace): Принимает параметры теста
+    """
+
+    def __init__(self, index: int, stub: TelegramStub, deliver: Callable[[dict], None], results: Results,
+                 args: argparse.Namespace) -> None:
+        self.chat_id = 1_000_000 + index
+        self.user = {'id': self.chat_id, 'is_bot': False, 'first_name': 'Пользователь', 'last_name': str(index),
+                     'language_code': 'ru'}
+        self.stub = stub
+        self.deliver = deliver
+        self.results = results
+        self.args = args
+        self.rng = random.Random('{}:{}'.format(args.seed, index))
+        self.cursor = 0
+        self.last: BotCall | None = None
+
+    def say(self, text: str) -> dict[str, Any]:
+        message = {'message_id': self.rng.randint(1, 10 ** 9), 'date': int(time.time()),
+                   'chat': {'id': self.chat_id, 'type': 'private'}, 'from': self.user, 'text': text}
+        if text.startswith('/'):
+            message['entities'] = [{'offset': 0, 'length': len(text), 'type': 'bot_command'}]
+        return self.stub.new_update(message=message)
+
+    def click(self, data: str) -> dict[str, Any]:
+        message = {'message_id': self.last['message_id'], 'date': int(time.time()), 'from': BOT_USER,
+                   'chat': {'id': self.chat_id, 'type': 'private'}, 'text': self.last['params'].get('text', '')}
+        return self.stub.new_update(callback_query={'id': str(self.rng.randint(1, 10 ** 9)), 'from': self.user,
+                                                    'chat_instance': str(self.chat_id), 'data': data,
+                                                    'message': message})
+
+    def step(self, name: str, update: dict[str, Any], condition: Callable[[BotCall], bool]) -> BotCall:
+        """
+        Выполняет шаг диалога: доставляет обновление боту и ждёт его ответа.
+        Время шага - от доставки обновления до вызова бота, который удовлетворяет условию.
+        """
+
+        time.sleep(self.args.think(self.rng))
+        start = time.perf_counter()
+        self.deliver(update)
+        self.results.count('totals', 'updates')
+        try:
+            call, self.cursor = self.stub.wait_call(self.chat_id, self.cursor, condition, self.args.step_timeout)
+        except StepFailed:
+            self.results.add(name, None)
+            raise
+        self.results.add(name, (call['time'] - start) * 1000)
+        self.last = call
+        return call
+
+    def choose_date(self, name: str, calendar_id: int, condition: Callable[[BotCall], bool], day: int = 0) -> None:
+        """
+        Выбирает дату в календаре из последнего сообщения бота: год, месяц и день
+        (день - day-й доступный для выбора), пока бот не ответит вызовом, который удовлетворяет условию.
+        """
+
+        prefix = MyStyleCalendar.prefix(calendar_id)
+        while True:
+            # Кнопки выбора: "cal1:<мин. дата>:cbcal_1_s_<шаг>_<год>_<месяц>_<день>"
+            choices = [data for data in buttons(self.last) if data.rpartition(SEPARATOR)[2].split('_')[2:3] == ['s']]
+            if not choices:
+                raise StepFailed('В календаре нет доступных дат')
+            is_day = choices[0].rpartition(SEPARATOR)[2].split('_')[3] == 'd'
+            call = self.step(name, self.click(choices[min(day, len(choices) - 1)] if is_day else choices[0]),
+                             lambda bot_call: has_keyboard(prefix)(bot_call) or condition(bot_call))
+            if not has_keyboard(prefix)(call):
+                return
+
+    def search(self, command: str) -> None:
+        """
+        Диалог поиска отелей (/lowprice, /highprice или /bestdeal) от команды до вывода отелей.
+        """
+
+        self.step('команда', self.say(command), has_text('В какой город'))
+        self.step('город', self.say(self.rng.choice([city[0] for city in CITIES.values()])), has_keyboard('city'))
+        city = [data for data in buttons(self.last) if data.startswith(callback_data('city', ''))][0]
+        if command == '/bestdeal':
+            self.step('выбор города', self.click(city), has_text('диапазон стоимости'))
+            self.step('цены', self.say('{} {}'.format(self.rng.choice((500, 1000, 2000)),
+                                                      self.rng.choice((15000, 30000, 60000)))), has_text('Как далеко'))
+            self.step('расстояние', self.say('0 {}'.format(self.rng.choice((3, 5, 10)))),
+                      has_keyboard(MyStyleCalendar.prefix(calendar_id=1)))
+        else:
+            self.step('выбор города', self.click(city), has_keyboard(MyStyleCalendar.prefix(calendar_id=1)))
+
+        self.choose_date('календарь заезда', calendar_id=1, condition=has_keyboard(MyStyleCalendar.prefix(2)))
+        self.choose_date('календарь выезда', calendar_id=2, condition=has_text('Сколько отелей'),
+                         day=self.rng.randint(1, 3))
+
+        self.step('кол-во отелей', self.say(str(self.args.hotels)), has_keyboard('photo'))
+        if self.args.photos:
+            self.step('фотографии', self.click(callback_data('photo', 'yes')), has_text('Сколько фотографий'))
+            call = self.step('поиск', self.say(str(self.args.photos)), search_finished)
+        else:
+            call = self.step('поиск', self.click(callback_data('photo', 'no')), search_finished)
+        if NOTHING_FOUND_MARKER in call['params'].get('text', ''):
+            self.results.count('totals', 'empty')
+
+    def history(self, command: str) -> None:
+        """
+        Диалог вывода истории поиска: команда /history и кнопка "Последний поиск".
+        """
+
+        self.step('команда', self.say(command), has_keyboard('hist'))
+        self.step('история', self.click(callback_data('hist', 'last')),
+                  lambda call: call['method'] == 'sendMessage')
+
+    def run(self, scenarios: list[str]) -> None:
+        """
+        Проходит диалоги по очереди: сначала /start, затем каждый сценарий args.rounds раз.
+        Если шаг диалога не удался, пользователь переходит к следующему диалогу.
+        """
+
+        try:
+            self.step('start', self.say('/start'), has_text('Выбери команду'))
+        except StepFailed as error:
+            self.results.count('failures', '/start')
+            self.results.count('reasons', str(error))
+            return
+
+        for scenario in scenarios * self.args.rounds:
+            command = '/' + scenario
+            start = time.perf_counter()
+            try:
+                if scenario == 'history':
+                    self.history(command)
+                else:
+                    self.search(command)
+            except StepFailed as error:
+                self.results.count('failures', command)
+                self.results.count('reasons', str(error))
+                # Ответы бота на прерванный диалог пропускаются
+                self.cursor = self.stub.cursor(self.chat_id)
+            else:
+                self.results.count('dialogs', command)
+                self.results.add('{} (весь диалог)'.format(command), (time.perf_counter() - start) * 1000)
+
+
+def start_bot(args: argparse.Namespace, env: dict[str, str], log_path: str) -> subprocess.Popen:
+    """
+    Функция, которая запускает бота (или супервизор main.py при --workers > 1) в дочернем процессе.
+    """
+
+    command = [sys.executable, args.bot]
+    if args.workers > 1:
+        env.update(BOT_WORKERS=str(args.workers), EXECUTE_CMD='{} {}'.format(sys.executable, args.bot),
+                   WORKER_BASE_PORT=str(free_port()))
+        command = [sys.executable, 'main.py']
+
+    with open(log_path, 'w') as log:
+        return subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def report(results: Results, stub: TelegramStub, users: int, elapsed: float) -> None:
+    """
+    Функция, которая выводит пропускную способность и время ответа бота по шагам диалога.
+    """
+
+    dialogs = sum(results.dialogs.values())
+    print('Пользователей: {}, диалогов завершено: {}, прервано: {}, поисков без результата: {}'.format(
+        users, dialogs, sum(results.failures.values()), results.totals['empty']))
+    print('Время: {:.1f} с; {:.2f} диалога/с, {:.1f} обновлений/с, {:.1f} вызовов Bot API/с'.format(
+        elapsed, dialogs / elapsed, results.totals['updates'] / elapsed, sum(stub.methods.values()) / elapsed))
+    print()
+    print('{:<32}{:>8}{:>8}{:>10}{:>10}{:>10}'.format('Шаг диалога, мс', 'кол-во', 'ошибок', 'p50', 'p95', 'p99'))
+    for step, latencies in results.steps.items():
+        if latencies:
+            print('{:<32}{:>8}{:>8}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+                step, len(latencies), results.errors[step], percentile(latencies, 50), percentile(latencies, 95),
+                percentile(latencies, 99)))
+        else:
+            print('{:<32}{:>8}{:>8}{:>10}{:>10}{:>10}'.format(step, 0, results.errors[step], '-', '-', '-'))
+    for reason, count in results.reasons.most_common(5):
+        print('Прервано {} раз: {}'.format(count, reason))
+    print()
+    print('Вызовы Bot API: ' + ', '.join('{} {}'.format(method, count) for method, count in stub.methods.most_common()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест бота с виртуальными пользователями')
+    parser.add_argument('-u', '--users', type=int, default=20, help='Кол-во одновременных пользователей')
+    parser.add_argument('-r', '--rounds', type=int, default=1, help='Кол-во повторов сценариев каждым пользователем')
+    parser.add_argument('--scenarios', default='lowprice,highprice,bestdeal,history',
+                        help='Сценарии каждого пользователя по порядку: lowprice, highprice, bestdeal, history')
+    parser.add_argument('--ramp-up', type=float, default=1.0, help='Время, за которое стартуют все пользователи, с')
+    parser.add_argument('--think', type=parse_latency, default=parse_latency('const:0'),
+                        help='Пауза пользователя перед каждым шагом (распределение, как в tools.hotels_stub), мс')
+    parser.add_argument('--hotels', type=int, default=5, help='Кол-во отелей в каждом поиске')
+    parser.add_argument('--photos', type=int, default=2, help='Кол-во фотографий каждого отеля (0 - без фотографий)')
+    parser.add_argument('--step-timeout', type=float, default=60, help='Максимальное время ответа на шаг диалога, с')
+    parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора случайных чисел')
+    parser.add_argument('--bot', default='besthoteloffers_bot.py', help='Скрипт бота')
+    parser.add_argument('--mode', choices=('polling', 'webhook'), default='polling',
+                        help='Получение обновлений ботом: getUpdates или POST-запросы на webhook')
+    parser.add_argument('--workers', type=int, default=1, help='Кол-во процессов бота (> 1 - через main.py)')
+    parser.add_argument('--no-send-limits', action='store_true',
+                        help='Снять лимиты очереди отправки (SEND_*), чтобы измерять только обработку обновлений')
+    parser.add_argument('--api-latency', type=parse_latency, default=parse_latency('const:0'),
+                        help='Задержка ответа тестового сервера Telegram Bot API (распределение), мс')
+    parser.add_argument('--hotels-url', default='',
+                        help='Адрес Hotels API (по умолчанию запускается встроенный tools.hotels_stub)')
+    parser.add_argument('--hotels-latency', type=parse_latency, default=parse_latency('const:0'),
+                        help='Задержка ответа встроенного tools.hotels_stub (распределение), мс')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - {'lowprice', 'highprice', 'bestdeal', 'history'}
+    if unknown:
+        parser.error('Неизвестные сценарии: {}'.format(', '.join(sorted(unknown))))
+
+    stub = TelegramStub(('127.0.0.1', free_port()), latency=args.api_latency)
+    stub.start()
+    hotels_url = args.hotels_url
+    if not hotels_url:
+        hotels = HotelsStubServer(('127.0.0.1', free_port()), fixtures=Fixtures(seed=args.seed),
+                                  latency={None: args.hotels_latency}, seed=args.seed)
+        hotels.start()
+        hotels_url = hotels.url
+
+    webhook_port = free_port()
+    webhook_url = with_secret('http://127.0.0.1:{}{}'.format(webhook_port, WEBHOOK_PATH))
+
+    def deliver(update: dict[str, Any]) -> None:
+        if args.mode == 'polling':
+            stub.push(update)
+            return
+        # Пока бот останавливает приём обновлений или его очередь переполнена, он отвечает 503 - как Telegram,
+        # обновление отправляется повторно
+        while post(webhook_url, update)[1] != 200:
+            time.sleep(0.05)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, TELEGRAM_API_URL=stub.url, HOTELS_API_URL=hotels_url, BOT_MODE=args.mode,
+                   WEBHOOK_LISTEN='127.0.0.1', WEBHOOK_PORT=str(webhook_port), WEBHOOK_URL='',
+                   WEBHOOK_SECRET=WEBHOOK_SECRET, DATABASE=os.path.join(tmp_dir, 'load_test.sqlite'), BOT_WORKERS='1',
+                   WORKER_INDEX='0', STATE_SNAPSHOT='')
+        if args.no_send_limits:
+            env.update(SEND_GLOBAL_RATE='100000', SEND_CHAT_RATE='100000', SEND_CHAT_BURST='100000')
+        log_path = os.path.join(tmp_dir, 'bot.log')
+        process = start_bot(args, env, log_path)
+        try:
+            # Бот готов, когда запросил обновления (polling) или открыл порт webhook
+            deadline = time.monotonic() + 30
+            while not (stub.polled.wait(0.05) if args.mode == 'polling' else port_open(webhook_port)):
+                if process.poll() is not None or time.monotonic() > deadline:
+                    with open(log_path) as log:
+                        sys.exit('Бот не запустился:\n' + log.read()[-2000:])
+
+            results = Results()
+            users = [VirtualUser(index, stub, deliver, results, args) for index in range(args.users)]
+            threads = [threading.Thread(target=user.run, args=(scenarios,), name='User-{}'.format(index), daemon=True)
+                       for index, user in enumerate(users)]
+
+            start = time.perf_counter()
+            for index, thread in enumerate(threads):
+                thread.start()
+                time.sleep(args.ramp_up / len(threads))
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    report(results, stub, args.users, elapsed)
+
+
+if __name__ == '__main__':
+    main()
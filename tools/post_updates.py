@@ -0,0 +1,132 @@
+"""
+Тестовый клиент режима webhook.
+Отправляет записанные обновления Telegram (файл JSON Lines, одно обновление
+в строке) POST-запросами на локальный webhook-сервер бота и выводит
+пропускную способность и время ответа сервера. Позволяет нагрузочно
+тестировать бота без подключения к Telegram.
+
+Запуск из папки проекта:  python -m tools.post_updates tools/updates.example.jsonl [-u 50] [-r 10] [-c 8]
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import json
+import time
+from typing import Any
+import urllib.error
+import urllib.request
+
+from config import WEBHOOK_PORT, WEBHOOK_PATH
+from webhook import with_secret
+
+
+def load_updates(path: str) -> list[dict[str, Any]]:
+    """
+    Функция, которая читает записанные обновления из файла JSON Lines.
+
+    Args:
+        path (str): Принимает путь к файлу
+
+    Returns (list): список обновлений в виде словарей
+    """
+
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def shift_ids(value: Any, offset: int) -> Any:
+    """
+    Функция, которая сдвигает id всех чатов и пользователей в обновлении,
+    чтобы одно записанное обновление имитировало разных пользователей.
+
+    Args:
+        value (Any): Принимает обновление или его часть
+        offset (int): Принимает величину сдвига id
+
+    Returns (Any): обновление со сдвинутыми id
+    """
+
+    if isinstance(value, dict):
+        return {key: (item + offset if key == 'id' and isinstance(item, int) and not value.get('is_bot')
+                      and ('type' in value or 'first_name' in value) else shift_ids(item, offset))
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [shift_ids(item, offset) for item in value]
+    return value
+
+
+def build_updates(updates: list[dict[str, Any]], users: int, repeat: int) -> list[dict[str, Any]]:
+    """
+    Функция, которая размножает обновления для заданного кол-ва пользователей
+    и повторов и присваивает им последовательные update_id. Обновления
+    одного пользователя идут в исходном порядке.
+
+    Args:
+        updates (list): Принимает записанные обновления
+        users (int): Принимает кол-во имитируемых пользователей
+        repeat (int): Принимает кол-во повторов записи для каждого пользователя
+
+    Returns (list): список обновлений для отправки
+    """
+
+    update_ids = itertools.count(1)
+    result = list()
+    for _ in range(repeat):
+        for update in updates:
+            for user in range(users):
+                result.append({**shift_ids(update, user), 'update_id': next(update_ids)})
+    return result
+
+
+def post(url: str, update: dict[str, Any]) -> tuple[float, int]:
+    """
+    Функция, которая отправляет одно обновление на webhook-сервер.
+
+    Args:
+        url (str): Принимает адрес webhook-сервера
+        update (dict): Принимает обновление
+
+    Returns (tuple): время ответа (с) и HTTP-статус ответа (0 - ошибка соединения)
+    """
+
+    request = urllib.request.Request(url, data=json.dumps(update).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except OSError:
+        status = 0
+    return time.perf_counter() - start, status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', help='Файл с записанными обновлениями (JSON Lines)')
+    parser.add_argument('--url', default=with_secret('http://127.0.0.1:{}{}'.format(WEBHOOK_PORT, WEBHOOK_PATH)),
+                        help='Адрес webhook-сервера бота (по умолчанию - с секретом WEBHOOK_SECRET из .env)')
+    parser.add_argument('-u', '--users', type=int, default=1, help='Кол-во имитируемых пользователей')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='Кол-во повторов записи')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='Кол-во одновременных запросов')
+    args = parser.parse_args()
+
+    updates = build_updates(load_updates(args.file), args.users, args.repeat)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda update: post(args.url, update), updates))
+    total = time.perf_counter() - start
+
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(status != 200 for _, status in results)
+    print('Отправлено обновлений: {}, ошибок: {}'.format(len(results), errors))
+    print('Время: {:.2f} с, {:.1f} обновлений/с'.format(total, len(results) / total))
+    print('Время ответа, мс: p50 {:.2f}, p95 {:.2f}, макс. {:.2f}'.format(
+        latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)], latencies[-1]))
+
+
+if __name__ == '__main__':
+    main()
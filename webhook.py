@@ -0,0 +1,127 @@
+"""
+Модуль режима webhook.
+Содержит лёгкий HTTP-сервер, который принимает обновления Telegram
+POST-запросами и передаёт их диспетчеру обновлений (dispatcher.py),
+то есть тем же обработчикам, что и в режиме long polling.
+"""
+
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from typing import Any
+
+from loguru import logger
+from telebot import TeleBot
+from telebot.types import Update
+
+from config import WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET
+from dispatcher import Dispatcher
+
+
+def with_secret(address: str, secret: str = WEBHOOK_SECRET) -> str:
+    """
+    Функция, которая добавляет к пути или адресу webhook секретную часть.
+    Telegram (pyTelegramBotAPI 4.4.0 не передаёт в setWebhook secret_token) знает секрет
+    только из зарегистрированного адреса, поэтому обновления, отправленные на другой адрес, отклоняются.
+
+    Args:
+        address (str): Принимает путь (WEBHOOK_PATH) или адрес (WEBHOOK_URL) webhook
+        secret (str): Принимает секрет webhook
+
+    Returns (str): путь или адрес с секретом
+    """
+
+    return '{}/{}'.format(address.rstrip('/'), secret)
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP-запросов: POST-запрос на WEBHOOK_PATH/WEBHOOK_SECRET с обновлением
+    в формате JSON ставится в очередь диспетчера, ответ 200 отправляется
+    сразу, не дожидаясь обработки обновления. Запросы на другие адреса получают ответ 403.
+    """
+
+    server: 'WebhookServer'
+
+    def do_POST(self) -> None:
+        # Сравнение за постоянное время, чтобы секрет нельзя было подобрать по времени ответа
+        if not hmac.compare_digest(self.path.encode('utf-8', 'replace'), self.server.path.encode('utf-8')):
+            self.send_error(403)
+            return
+
+        if not self.server.dispatcher.accepting:
+            # Бот останавливается: Telegram повторит обновление позже
+            self.send_error(503)
+            return
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            update = self.decode(json.loads(self.rfile.read(length)))
+        except (ValueError, KeyError, TypeError) as error:
+            logger.error('Некорректное обновление: {}'.format(error))
+            self.send_error(400)
+            return
+
+        self.server.dispatcher.dispatch(update)
+
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def decode(self, data: Any) -> Any:
+        """
+        Преобразует тело запроса в обновление, которое передаётся диспетчеру.
+        """
+
+        return Update.de_json(data)
+
+    def log_message(self, format: str, *args) -> None:
+        # Каждый запрос не логируется, чтобы не засорять лог
+        pass
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Многопоточный HTTP-сервер, принимающий обновления Telegram.
+    """
+
+    daemon_threads = True
+    # Очередь входящих соединений: при значении по умолчанию (5) часть соединений
+    # при всплеске обновлений отклоняется и переподключается с задержкой в 1 с
+    request_queue_size = 128
+
+    def __init__(self, dispatcher: Dispatcher, listen: str = WEBHOOK_LISTEN, port: int = WEBHOOK_PORT,
+                 path: str = with_secret(WEBHOOK_PATH), handler: type[WebhookHandler] = WebhookHandler) -> None:
+        super().__init__((listen, port), handler)
+        self.dispatcher = dispatcher
+        self.path = path
+
+
+def run_webhook(bot: TeleBot, dispatcher: Dispatcher, url: str = WEBHOOK_URL) -> None:
+    """
+    Функция, которая регистрирует webhook в Telegram (если задан публичный
+    адрес url) и запускает HTTP-сервер до остановки процесса. Обновления,
+    принятые до остановки, обрабатывает диспетчер: его останавливает вызывающий
+    код (см. shutdown.GracefulShutdown), ограничивая время обработки.
+    Без url сервер принимает обновления только локально (например, от tools/post_updates.py).
+
+    Args:
+        bot (TeleBot): Принимает объект бота
+        dispatcher (Dispatcher): Принимает диспетчер обновлений
+        url (str): Принимает публичный адрес webhook (HTTPS), по которому Telegram отправляет обновления
+    """
+
+    server = WebhookServer(dispatcher)
+
+    if url:
+        bot.set_webhook(url=with_secret(url))
+
+    dispatcher.start()
+    # Секрет в лог не записывается
+    logger.info('Webhook-сервер запущен на {}:{}{}'.format(*server.server_address[:2],
+                                                           with_secret(WEBHOOK_PATH, '<секрет>')))
+    try:
+        server.serve_forever()
+    finally:
+        dispatcher.stop_intake()
+        server.server_close()